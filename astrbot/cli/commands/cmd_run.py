@@ -13,13 +13,17 @@ from ..utils import check_dashboard, check_astrbot_root, get_astrbot_root
 
 async def run_astrbot(astrbot_root: Path):
     """运行 AstrBot"""
-    from astrbot.core import logger, LogManager, LogBroker, db_helper
+    from astrbot.core import logger, LogManager, LogBroker, db_helper, astrbot_config
     from astrbot.core.initial_loader import InitialLoader
 
     await check_dashboard(astrbot_root / "data")
 
     log_broker = LogBroker()
-    LogManager.set_queue_handler(logger, log_broker)
+    LogManager.set_queue_handler(
+        logger,
+        log_broker,
+        use_listener=astrbot_config.get("log_in_background", True),
+    )
     db = db_helper
 
     core_lifecycle = InitialLoader(db, log_broker)
@@ -12,7 +12,7 @@ DB_PATH = os.path.join(get_astrbot_data_path(), "data_v3.db")
 DEFAULT_CONFIG = {
     "config_version": 2,
     "platform_settings": {
-        "plugin_enable":[],
+        "plugin_enable": [],
         "unique_session": False,
         "rate_limit": {
             "time": 60,
@@ -45,6 +45,12 @@ DEFAULT_CONFIG = {
         "friend_message_needs_wake_prefix": False,
         "ignore_bot_self_message": False,
         "ignore_at_all": False,
+        "dispatcher": {
+            "max_concurrency": 0,
+            "session_ordering": False,
+            "max_pending": 1000,
+            "overload_strategy": "stall",  # stall, discard_new, discard_oldest
+        },
     },
     "provider": [],
     "provider_settings": {
@@ -59,9 +65,12 @@ DEFAULT_CONFIG = {
         "prompt_prefix": "",
         "max_context_length": -1,
         "dequeue_context_length": 1,
+        "max_context_tokens": 0,
         "streaming_response": False,
         "streaming_segmented": False,
         "separate_provider": False,
+        "tool_call_max_concurrency": 4,
+        "tool_call_timeout": 60,
     },
     "provider_stt_settings": {
         "enable": False,
@@ -73,6 +82,14 @@ DEFAULT_CONFIG = {
         "dual_output": False,
         "use_file_service": False,
     },
+    "provider_cache_settings": {
+        "enable": False,
+        "ttl": 3600,
+        "max_entries": 1000,
+        "disk_cache": True,
+        "embedding": True,
+        "deterministic_only": True,
+    },
     "provider_ltm_settings": {
         "group_icl_enable": False,
         "group_message_max_cnt": 300,
@@ -98,6 +115,8 @@ DEFAULT_CONFIG = {
     "t2i_strategy": "remote",
     "t2i_endpoint": "",
     "t2i_use_file_service": False,
+    "t2i_local_workers": 2,
+    "media_cache_size": 512,
     "http_proxy": "",
     "dashboard": {
         "enable": True,
@@ -110,8 +129,11 @@ DEFAULT_CONFIG = {
     "platform": [],
     "wake_prefix": ["/"],
     "log_level": "INFO",
+    "log_in_background": True,
+    "latency_tracing": False,
     "pip_install_arg": "",
     "pypi_index_url": "https://mirrors.aliyun.com/pypi/simple/",
+    "shared_preferences_backend": "json",
     "knowledge_db": {},
     "persona": [],
     "timezone": "",
@@ -153,6 +175,7 @@ CONFIG_METADATA_2 = {
                         "ws_reverse_host": "0.0.0.0",
                         "ws_reverse_port": 6199,
                         "ws_reverse_token": "",
+                        "cache_ttl": 600,
                     },
                     "微信个人号(Gewechat)": {
                         "id": "gwchat",
@@ -363,6 +386,11 @@ CONFIG_METADATA_2 = {
                         "type": "string",
                         "hint": "aiocqhttp 适配器的反向 Websocket Token。未设置则不启用 Token 验证。",
                     },
+                    "cache_ttl": {
+                        "description": "群成员昵称和引用消息的缓存时间",
+                        "type": "int",
+                        "hint": "aiocqhttp 适配器缓存 @ 的用户昵称和被引用的消息的秒数，缓存期间不再向协议端查询。为 0 时不缓存。",
+                    },
                     "lark_bot_name": {
                         "description": "飞书机器人的名字",
                         "type": "string",
@@ -451,6 +479,33 @@ CONFIG_METADATA_2 = {
                         "type": "bool",
                         "hint": "启用后，机器人会忽略 @ 全体成员 的消息事件。",
                     },
+                    "dispatcher": {
+                        "description": "消息事件调度",
+                        "type": "object",
+                        "items": {
+                            "max_concurrency": {
+                                "description": "最大并发处理数",
+                                "type": "int",
+                                "hint": "同时处理的消息事件的最大数量。为 0 时不限制。",
+                            },
+                            "session_ordering": {
+                                "description": "会话内顺序处理",
+                                "type": "bool",
+                                "hint": "启用后，同一会话的消息将按顺序逐条处理，不同会话之间仍然并行处理。",
+                            },
+                            "max_pending": {
+                                "description": "最大等待处理数",
+                                "type": "int",
+                                "hint": "等待处理的消息事件的最大数量。为 0 时不限制。",
+                            },
+                            "overload_strategy": {
+                                "description": "过载策略",
+                                "type": "string",
+                                "options": ["stall", "discard_new", "discard_oldest"],
+                                "hint": "等待处理的消息事件达到上限时的处理策略。stall 为等待，discard_new 为丢弃新消息，discard_oldest 为丢弃最早的消息。",
+                            },
+                        },
+                    },
                     "segmented_reply": {
                         "description": "分段回复",
                         "type": "object",
@@ -985,6 +1040,7 @@ CONFIG_METADATA_2 = {
                         "embedding_api_base": "",
                         "embedding_model": "",
                         "embedding_dimensions": 1536,
+                        "embedding_batch_size": 256,
                         "timeout": 20,
                     },
                     "Gemini Embedding": {
@@ -996,6 +1052,7 @@ CONFIG_METADATA_2 = {
                         "embedding_api_base": "",
                         "embedding_model": "gemini-embedding-exp-03-07",
                         "embedding_dimensions": 768,
+                        "embedding_batch_size": 100,
                         "timeout": 20,
                     },
                 },
@@ -1129,6 +1186,11 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "嵌入向量的维度。根据模型不同，可能需要调整，请参考具体模型的文档。此配置项请务必填写正确，否则将导致向量数据库无法正常工作。",
                     },
+                    "embedding_batch_size": {
+                        "description": "单次请求的最大文本数",
+                        "type": "int",
+                        "hint": "批量导入文档时，每次请求嵌入接口发送的最大文本数量。请不要超过服务商的限制。",
+                    },
                     "embedding_model": {
                         "description": "嵌入模型",
                         "type": "string",
@@ -1539,6 +1601,11 @@ CONFIG_METADATA_2 = {
                         "items": {"type": "string"},
                         "hint": "API Key 列表。填写好后输入回车即可添加 API Key。支持多个 API Key。",
                     },
+                    "key_rpm": {
+                        "description": "每个 Key 每分钟最大请求数",
+                        "type": "int",
+                        "hint": "配置多个 API Key 时，请求会分配给当前并发数最少的 Key，被限流(429)的 Key 会暂时停用。此项限制每个 Key 每分钟的请求数，超出时等待或使用其他 Key。0 为不限制。",
+                    },
                     "api_base": {
                         "description": "API Base URL",
                         "type": "string",
@@ -1685,6 +1752,11 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "超出 最多携带对话数量(条) 时，丢弃多少条记录，用户和AI的一轮聊天记为 1 条。适宜的配置，可以提高超长上下文对话 deepseek 命中缓存效果，理想情况下计费将降低到1/3以下",
                     },
+                    "max_context_tokens": {
+                        "description": "上下文最大 token 数",
+                        "type": "int",
+                        "hint": "请求 LLM 前，如果系统提示词、工具、上下文和本次消息的 token 总数(包括模型配置中为输出预留的 max_tokens)超过该值，将从最早的记录开始丢弃上下文，避免超出模型的上下文窗口。建议设为模型上下文窗口大小。OpenAI 提供商在安装了 tiktoken 时精确计算，其余情况估算。0 表示不限制。",
+                    },
                     "streaming_response": {
                         "description": "启用流式回复",
                         "type": "bool",
@@ -1695,6 +1767,16 @@ CONFIG_METADATA_2 = {
                         "type": "bool",
                         "hint": "启用后，若平台不支持流式回复，会分段输出。目前仅支持 aiocqhttp 和 gewechat 两个平台，不支持或无需使用流式分段输出的平台会静默忽略此选项",
                     },
+                    "tool_call_max_concurrency": {
+                        "description": "函数调用最大并发数",
+                        "type": "int",
+                        "hint": "LLM 一次返回多个函数调用时，最多同时执行的函数调用数量。设为 1 时逐个执行。",
+                    },
+                    "tool_call_timeout": {
+                        "description": "函数调用超时时间(秒)",
+                        "type": "int",
+                        "hint": "单个函数调用的最长执行时间，超时后将向 LLM 返回超时错误。0 为不限制。",
+                    },
                 },
             },
             "persona": {
@@ -1782,6 +1864,43 @@ CONFIG_METADATA_2 = {
                     },
                 },
             },
+            "provider_cache_settings": {
+                "description": "提供商响应缓存",
+                "type": "object",
+                "items": {
+                    "enable": {
+                        "description": "启用响应缓存",
+                        "type": "bool",
+                        "hint": "启用后，上下文、工具和参数完全相同的大语言模型请求会直接返回之前的结果，不再请求提供商。适合问答类场景。流式输出不经过缓存。只对 OpenAI、Gemini、Anthropic、智谱等无状态的提供商生效，Dify 等在服务端保存会话的提供商不缓存。重启后生效。",
+                        "obvious_hint": True,
+                    },
+                    "ttl": {
+                        "description": "缓存有效期",
+                        "type": "int",
+                        "hint": "单位为秒。",
+                    },
+                    "max_entries": {
+                        "description": "内存缓存条数",
+                        "type": "int",
+                        "hint": "内存中最多缓存的响应条数，超出后淘汰最久未使用的。",
+                    },
+                    "disk_cache": {
+                        "description": "磁盘缓存",
+                        "type": "bool",
+                        "hint": "启用后，缓存同时保存到 data/provider_cache.db，重启后仍然有效。",
+                    },
+                    "embedding": {
+                        "description": "缓存文本向量",
+                        "type": "bool",
+                        "hint": "启用后，嵌入提供商对相同文本的向量请求也会被缓存，例如知识库中重复的查询。",
+                    },
+                    "deterministic_only": {
+                        "description": "只缓存确定性请求",
+                        "type": "bool",
+                        "hint": "启用后，只缓存 temperature 为 0 的大语言模型请求。关闭后，即使 temperature 不为 0 也会返回缓存的回复。",
+                    },
+                },
+            },
             "provider_ltm_settings": {
                 "description": "聊天记忆增强(Beta)",
                 "type": "object",
@@ -1904,6 +2023,16 @@ CONFIG_METADATA_2 = {
                 "hint": "控制台输出日志的级别。",
                 "options": ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
             },
+            "log_in_background": {
+                "description": "在后台线程中输出日志",
+                "type": "bool",
+                "hint": "启用后，日志的格式化、控制台输出和推送到管理面板都在后台线程中进行，不会阻塞消息处理。重启后生效。",
+            },
+            "latency_tracing": {
+                "description": "耗时追踪",
+                "type": "bool",
+                "hint": "启用后，将统计消息管道各阶段、插件处理函数和 LLM 请求的耗时分布(p50/p95/p99)，可在 /api/stat/latency 查看，或通过 /api/stat/metrics 以 Prometheus 格式采集。会带来少量额外开销。",
+            },
             "t2i_strategy": {
                 "description": "文本转图像渲染源",
                 "type": "string",
@@ -1920,6 +2049,16 @@ CONFIG_METADATA_2 = {
                 "type": "bool",
                 "hint": "当 t2i_strategy 为 local 并且配置 callback_api_base 时生效。是否使用文件服务提供文件。",
             },
+            "media_cache_size": {
+                "description": "媒体缓存大小(MB)",
+                "type": "int",
+                "hint": "消息中的网络图片、语音等文件下载后按内容保存在 data/media_cache 中，相同的链接和内容只下载、保存一次。超出此大小时删除最久未使用的文件。",
+            },
+            "t2i_local_workers": {
+                "description": "本地文本转图像渲染进程数",
+                "type": "int",
+                "hint": "使用 PIL 本地渲染时，渲染在独立的进程中进行，不会阻塞消息处理。为 0 时在线程中渲染。相同文本的渲染结果会被缓存。重启后生效。",
+            },
             "pip_install_arg": {
                 "description": "pip 安装参数",
                 "type": "string",
@@ -1930,6 +2069,12 @@ CONFIG_METADATA_2 = {
                 "type": "string",
                 "hint": "安装 Python 依赖时请求的 PyPI 软件仓库地址。默认为 https://mirrors.aliyun.com/pypi/simple/",
             },
+            "shared_preferences_backend": {
+                "description": "偏好设置存储方式",
+                "type": "string",
+                "hint": "会话当前对话、插件启用状态等偏好设置的存储方式。`json` 为存储到 data/shared_preferences.json，`sqlite` 为存储到 data/shared_preferences.db，只写入发生变更的项，适合会话数量较多的情况。首次切换到 sqlite 时会自动导入 JSON 文件中的数据。重启后生效。",
+                "options": ["json", "sqlite"],
+            },
         },
     },
 }
@@ -3,40 +3,288 @@ AstrBot 会话-对话管理器, 维护两个本地存储, 其中一个是 json 
 
 在 AstrBot 中, 会话和对话是独立的, 会话用于标记对话窗口, 例如群聊"123456789"可以建立一个会话,
 在一个会话中可以建立多个对话, 并且支持对话的切换和删除
+
+对话会被缓存在内存中(LRU), 缓存中保存的是已经解析好的对话历史。更新对话历史时只修改缓存并标记为脏,
+由后台任务定期批量写回数据库(write-behind), 因此热点会话不需要每条消息都解析、序列化完整的对话历史。
+
+数据库中对话历史按消息逐条存储, 只追加。上下文被截断时只会后移上下文的起始序号, 被截断的消息仍然保留在数据库中。
+
+会话当前的对话 ID 在 shared_preferences 中按会话分别保存为 session_conversation:{unified_msg_origin},
+切换对话时只写入该会话的一个键。
 """
 
 import uuid
 import json
+import time
 import asyncio
-from astrbot.core import sp
-from typing import Dict, List
+from collections import OrderedDict
+from astrbot.core import sp, logger
+from typing import Dict, List, Optional, Tuple
 from astrbot.core.db import BaseDatabase
 from astrbot.core.db.po import Conversation
 
+SESSION_CONVERSATION_PREFIX = "session_conversation:"
+LEGACY_SESSION_CONVERSATION_KEY = "session_conversation"
+
+
+class _CacheEntry:
+    """对话缓存项"""
+
+    __slots__ = (
+        "conversation",
+        "history",
+        "history_str",
+        "offset",
+        "persisted",
+        "version",
+        "flushed",
+        "rewrites",
+    )
+
+    def __init__(self, conversation: Conversation, history: List[Dict]):
+        self.conversation = conversation
+        """对话的元信息(标题、Persona 等)"""
+        self.history = history
+        """解析后的对话历史(当前上下文)"""
+        self.history_str: Optional[str] = conversation.history
+        """对话历史的 JSON 字符串, 为 None 表示需要重新序列化"""
+        self.offset = conversation.context_offset
+        """history 中第一条消息在对话中的序号"""
+        self.persisted = self.offset + len(history)
+        """数据库中序号在 [offset, persisted) 范围内的消息与 history 一致"""
+        self.version = 0
+        self.flushed = 0
+        """已经写回数据库的版本"""
+        self.rewrites = 0
+        """对话历史被整体改写的次数"""
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.flushed
+
+    def dumps(self) -> str:
+        if self.history_str is None:
+            self.history_str = json.dumps(self.history)
+        return self.history_str
+
+    def update(self, history: List[Dict]):
+        shift = _find_shift(self.history, history)
+        if shift is None:
+            # 不是追加, 需要重写整个上下文
+            self.persisted = self.offset
+            self.rewrites += 1
+        else:
+            # 上下文被截断了 shift 条消息, 其余为追加的消息
+            self.offset += shift
+        self.history = list(history)
+        self.history_str = None
+        self.conversation.updated_at = int(time.time())
+        self.version += 1
+
+
+def _find_shift(old: List[Dict], new: List[Dict]) -> Optional[int]:
+    """如果 new 由 old 去掉前 k 条消息再追加若干条消息得到, 返回 k, 否则返回 None"""
+    n = len(old)
+    if not new:
+        # 清空了上下文
+        return n
+    for k in range(max(n - len(new), 0), n):
+        if old[k] == new[0] and old[k:] == new[: n - k]:
+            return k
+    return 0 if n == 0 else None
+
+
+class CachedConversation(Conversation):
+    """从对话缓存中取出的对话。history 字段在第一次访问时才序列化"""
+
+    def __init__(self, entry: _CacheEntry):
+        conv = entry.conversation
+        self._entry = entry
+        self._history = None
+        self.user_id = conv.user_id
+        self.cid = conv.cid
+        self.created_at = conv.created_at
+        self.updated_at = conv.updated_at
+        self.title = conv.title
+        self.persona_id = conv.persona_id
+
+    @property
+    def history(self) -> str:
+        if self._history is None:
+            self._history = self._entry.dumps()
+        return self._history
+
+    @history.setter
+    def history(self, value: str):
+        self._history = value
+
+    def get_history(self) -> List[Dict]:
+        """获取解析后的对话历史。history 字段没有被修改过时直接复制缓存中的对话历史, 不需要 json.loads"""
+        if self._history is not None:
+            return json.loads(self._history)
+        return _copy_history(self._entry.history)
+
+
+def _copy_history(history: List[Dict]) -> List[Dict]:
+    # 复制每一条记录, 避免调用方(例如插件)原地修改污染缓存
+    return [dict(record) for record in history]
+
 
 class ConversationManager:
     """负责管理会话与 LLM 的对话，某个会话当前正在用哪个对话。"""
 
     def __init__(self, db_helper: BaseDatabase):
         # session_conversations 字典记录会话ID-对话ID 映射关系
-        self.session_conversations: Dict[str, str] = sp.get("session_conversation", {})
+        self.session_conversations: Dict[str, str] = self._load_session_conversations()
         self.db = db_helper
-        self.save_interval = 60  # 每 60 秒保存一次
+        self.cache_size = 1000  # 最多缓存的对话数
+        self.flush_interval = 5  # 每 5 秒将有变更的对话写回数据库
+        self.flush_threshold = 200  # 有变更的对话达到该数量时立即写回
+        self._cache: OrderedDict[Tuple[str, str], _CacheEntry] = OrderedDict()
+        self._evicted: Dict[Tuple[str, str], _CacheEntry] = {}
+        """被淘汰出缓存但还未写回数据库的对话"""
+        self._dirty_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_event = asyncio.Event()
         self._start_periodic_save()
 
     def _start_periodic_save(self):
         """启动定时保存任务"""
-        asyncio.create_task(self._periodic_save())
-
-    async def _periodic_save(self):
-        """定时保存会话对话映射关系到存储中"""
+        asyncio.create_task(self._periodic_flush())
+
+    @staticmethod
+    def _load_session_conversations() -> Dict[str, str]:
+        """加载会话-对话映射关系。旧版本将整个映射保存在一个键中, 首次加载时拆分为每个会话一个键"""
+        legacy = sp.get(LEGACY_SESSION_CONVERSATION_KEY)
+        if isinstance(legacy, dict):
+            for umo, cid in legacy.items():
+                sp.put(SESSION_CONVERSATION_PREFIX + umo, cid)
+            sp.remove(LEGACY_SESSION_CONVERSATION_KEY)
+        return {
+            key[len(SESSION_CONVERSATION_PREFIX) :]: cid
+            for key, cid in sp.items(SESSION_CONVERSATION_PREFIX)
+        }
+
+    def _set_session_conversation(self, unified_msg_origin: str, conversation_id: str):
+        """设置会话当前的对话, 只写入该会话的键。conversation_id 为 None 时删除"""
+        key = SESSION_CONVERSATION_PREFIX + unified_msg_origin
+        if conversation_id is None:
+            self.session_conversations.pop(unified_msg_origin, None)
+            sp.remove(key)
+        else:
+            self.session_conversations[unified_msg_origin] = conversation_id
+            sp.put(key, conversation_id)
+
+    async def _periodic_flush(self):
+        """定时将有变更的对话批量写回数据库"""
         while True:
-            await asyncio.sleep(self.save_interval)
-            self._save_to_storage()
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"写回对话数据失败: {e}")
+
+    async def flush(self, unified_msg_origin: str = None, conversation_id: str = None):
+        """将有变更的对话写回数据库。指定了 unified_msg_origin 和 conversation_id 时只写回该对话
 
-    def _save_to_storage(self):
-        """保存会话对话映射关系到存储中"""
-        sp.put("session_conversation", self.session_conversations)
+        Args:
+            unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
+            conversation_id (str): 对话 ID, 是 uuid 格式的字符串
+        """
+        async with self._flush_lock:
+            if unified_msg_origin and conversation_id:
+                key = (unified_msg_origin, conversation_id)
+                entry = self._cache.get(key) or self._evicted.get(key)
+                entries = [(key, entry)] if entry and entry.dirty else []
+            else:
+                entries = [
+                    (key, entry) for key, entry in self._cache.items() if entry.dirty
+                ]
+                entries.extend(self._evicted.items())
+            if not entries:
+                return
+
+            changes = []
+            snapshots = []
+            for (umo, cid), entry in entries:
+                # 只序列化还没有写入数据库的消息
+                start = max(entry.persisted, entry.offset)
+                messages = [
+                    json.dumps(message)
+                    for message in entry.history[start - entry.offset :]
+                ]
+                changes.append((umo, cid, entry.offset, start, messages))
+                snapshots.append(
+                    (entry.version, entry.rewrites, entry.offset + len(entry.history))
+                )
+            await self.db.run(self.db.write_conversation_messages, changes)
+
+            for ((umo, cid), entry), (version, rewrites, end) in zip(
+                entries, snapshots
+            ):
+                entry.flushed = version
+                if entry.rewrites == rewrites:
+                    entry.persisted = end
+                if not entry.dirty:
+                    self._evicted.pop((umo, cid), None)
+            self._dirty_count = len(self._evicted) + sum(
+                1 for entry in self._cache.values() if entry.dirty
+            )
+
+    async def _get_entry(
+        self, unified_msg_origin: str, conversation_id: str
+    ) -> Optional[_CacheEntry]:
+        """获取对话的缓存项, 不在缓存中时从数据库加载"""
+        key = (unified_msg_origin, conversation_id)
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            return entry
+        entry = self._evicted.pop(key, None)
+        if entry is None:
+            conversation = await self.db.run(
+                self.db.get_conversation_by_user_id, unified_msg_origin, conversation_id
+            )
+            if not conversation:
+                return None
+            if key in self._cache:
+                # 等待加载期间已经被其他协程加载
+                return await self._get_entry(unified_msg_origin, conversation_id)
+            entry = _CacheEntry(conversation, json.loads(conversation.history))
+        self._put_entry(key, entry)
+        return entry
+
+    def _put_entry(self, key: Tuple[str, str], entry: _CacheEntry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            old_key, old_entry = self._cache.popitem(last=False)
+            if old_entry.dirty:
+                self._evicted[old_key] = old_entry
+
+    async def invalidate(
+        self, unified_msg_origin: str, conversation_id: str, discard: bool = False
+    ):
+        """将对话移出缓存。用于绕过 ConversationManager 直接修改数据库中的对话时保证一致性
+
+        Args:
+            unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
+            conversation_id (str): 对话 ID, 是 uuid 格式的字符串
+            discard (bool): 为 True 时丢弃未写回的变更, 否则先写回再移出
+        """
+        key = (unified_msg_origin, conversation_id)
+        if not discard:
+            await self.flush(unified_msg_origin, conversation_id)
+        entry = self._cache.pop(key, None) or self._evicted.pop(key, None)
+        if entry and entry.dirty:
+            self._dirty_count -= 1
+            entry.flushed = entry.version
 
     async def new_conversation(self, unified_msg_origin: str) -> str:
         """新建对话，并将当前会话的对话转移到新对话
@@ -47,9 +295,18 @@ class ConversationManager:
             conversation_id (str): 对话 ID, 是 uuid 格式的字符串
         """
         conversation_id = str(uuid.uuid4())
-        self.db.new_conversation(user_id=unified_msg_origin, cid=conversation_id)
-        self.session_conversations[unified_msg_origin] = conversation_id
-        sp.put("session_conversation", self.session_conversations)
+        await self.db.run(
+            self.db.new_conversation, user_id=unified_msg_origin, cid=conversation_id
+        )
+        now = int(time.time())
+        self._put_entry(
+            (unified_msg_origin, conversation_id),
+            _CacheEntry(
+                Conversation(unified_msg_origin, conversation_id, "[]", now, now),
+                [],
+            ),
+        )
+        self._set_session_conversation(unified_msg_origin, conversation_id)
         return conversation_id
 
     async def switch_conversation(self, unified_msg_origin: str, conversation_id: str):
@@ -59,8 +316,7 @@ class ConversationManager:
             unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
             conversation_id (str): 对话 ID, 是 uuid 格式的字符串
         """
-        self.session_conversations[unified_msg_origin] = conversation_id
-        sp.put("session_conversation", self.session_conversations)
+        self._set_session_conversation(unified_msg_origin, conversation_id)
 
     async def delete_conversation(
         self, unified_msg_origin: str, conversation_id: str = None
@@ -73,9 +329,13 @@ class ConversationManager:
         """
         conversation_id = self.session_conversations.get(unified_msg_origin)
         if conversation_id:
-            self.db.delete_conversation(user_id=unified_msg_origin, cid=conversation_id)
-            del self.session_conversations[unified_msg_origin]
-            sp.put("session_conversation", self.session_conversations)
+            await self.invalidate(unified_msg_origin, conversation_id, discard=True)
+            await self.db.run(
+                self.db.delete_conversation,
+                user_id=unified_msg_origin,
+                cid=conversation_id,
+            )
+            self._set_session_conversation(unified_msg_origin, None)
 
     async def get_curr_conversation_id(self, unified_msg_origin: str) -> str:
         """获取会话当前的对话 ID
@@ -98,7 +358,26 @@ class ConversationManager:
         Returns:
             conversation (Conversation): 对话对象
         """
-        return self.db.get_conversation_by_user_id(unified_msg_origin, conversation_id)
+        entry = await self._get_entry(unified_msg_origin, conversation_id)
+        if entry is None:
+            return None
+        return CachedConversation(entry)
+
+    async def get_conversation_history(
+        self, unified_msg_origin: str, conversation_id: str
+    ) -> Optional[List[Dict]]:
+        """获取会话的对话历史。直接返回缓存中已经解析好的对话历史的副本, 不需要再次 json.loads
+
+        Args:
+            unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
+            conversation_id (str): 对话 ID, 是 uuid 格式的字符串
+        Returns:
+            history (List[Dict]): 对话历史记录, 对话不存在时返回 None
+        """
+        entry = await self._get_entry(unified_msg_origin, conversation_id)
+        if entry is None:
+            return None
+        return _copy_history(entry.history)
 
     async def get_conversations(self, unified_msg_origin: str) -> List[Conversation]:
         """获取会话的所有对话
@@ -108,7 +387,15 @@ class ConversationManager:
         Returns:
             conversations (List[Conversation]): 对话对象列表
         """
-        return self.db.get_conversations(unified_msg_origin)
+        conversations = await self.db.run(self.db.get_conversations, unified_msg_origin)
+        # 以缓存中的数据为准, 缓存中可能有还没有写回数据库的变更
+        for conversation in conversations:
+            key = (unified_msg_origin, conversation.cid)
+            entry = self._cache.get(key) or self._evicted.get(key)
+            if entry:
+                conversation.updated_at = entry.conversation.updated_at
+        conversations.sort(key=lambda c: c.updated_at, reverse=True)
+        return conversations
 
     async def update_conversation(
         self, unified_msg_origin: str, conversation_id: str, history: List[Dict]
@@ -120,12 +407,17 @@ class ConversationManager:
             conversation_id (str): 对话 ID, 是 uuid 格式的字符串
             history (List[Dict]): 对话历史记录, 是一个字典列表, 每个字典包含 role 和 content 字段
         """
-        if conversation_id:
-            self.db.update_conversation(
-                user_id=unified_msg_origin,
-                cid=conversation_id,
-                history=json.dumps(history),
-            )
+        if not conversation_id:
+            return
+        entry = await self._get_entry(unified_msg_origin, conversation_id)
+        if entry is None:
+            return
+        # 只更新缓存, 由后台任务写回数据库。写回时只会追加新的消息
+        if not entry.dirty:
+            self._dirty_count += 1
+        entry.update(history)
+        if self._dirty_count >= self.flush_threshold:
+            self._flush_event.set()
 
     async def update_conversation_title(self, unified_msg_origin: str, title: str):
         """更新会话的对话标题
@@ -136,9 +428,16 @@ class ConversationManager:
         """
         conversation_id = self.session_conversations.get(unified_msg_origin)
         if conversation_id:
-            self.db.update_conversation_title(
-                user_id=unified_msg_origin, cid=conversation_id, title=title
+            await self.db.run(
+                self.db.update_conversation_title,
+                user_id=unified_msg_origin,
+                cid=conversation_id,
+                title=title,
             )
+            key = (unified_msg_origin, conversation_id)
+            entry = self._cache.get(key) or self._evicted.get(key)
+            if entry:
+                entry.conversation.title = title
 
     async def update_conversation_persona_id(
         self, unified_msg_origin: str, persona_id: str
@@ -151,9 +450,16 @@ class ConversationManager:
         """
         conversation_id = self.session_conversations.get(unified_msg_origin)
         if conversation_id:
-            self.db.update_conversation_persona_id(
-                user_id=unified_msg_origin, cid=conversation_id, persona_id=persona_id
+            await self.db.run(
+                self.db.update_conversation_persona_id,
+                user_id=unified_msg_origin,
+                cid=conversation_id,
+                persona_id=persona_id,
             )
+            key = (unified_msg_origin, conversation_id)
+            entry = self._cache.get(key) or self._evicted.get(key)
+            if entry:
+                entry.conversation.persona_id = persona_id
 
     async def get_human_readable_context(
         self, unified_msg_origin, conversation_id, page=1, page_size=10
@@ -166,8 +472,9 @@ class ConversationManager:
             page (int): 页码
             page_size (int): 每页大小
         """
-        conversation = await self.get_conversation(unified_msg_origin, conversation_id)
-        history = json.loads(conversation.history)
+        history = await self.get_conversation_history(
+            unified_msg_origin, conversation_id
+        )
 
         contexts = []
         temp_contexts = []
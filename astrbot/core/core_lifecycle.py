@@ -26,11 +26,15 @@ from astrbot.core.provider.manager import ProviderManager
 from astrbot.core import LogBroker
 from astrbot.core.db import BaseDatabase
 from astrbot.core.updator import AstrBotUpdator
-from astrbot.core import logger
+from astrbot.core import logger, sp, html_renderer
 from astrbot.core.config.default import VERSION
 from astrbot.core.conversation_mgr import ConversationManager
 from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star_handler import star_map
+from astrbot.core.utils.tracing import tracer
+from astrbot.core.utils.io import temp_file_janitor
+from astrbot.core.utils.media_cache import media_cache
+from astrbot.core.stats_service import stats_service
 
 
 class AstrBotCoreLifecycle:
@@ -63,6 +67,13 @@ class AstrBotCoreLifecycle:
         else:
             logger.setLevel(self.astrbot_config["log_level"])  # 设置日志级别
 
+        # 耗时追踪
+        tracer.enabled = self.astrbot_config.get("latency_tracing", False)
+
+        media_cache.max_bytes = (
+            self.astrbot_config.get("media_cache_size", 512) * 1024 * 1024
+        )
+
         # 初始化事件队列
         self.event_queue = Queue()
 
@@ -104,11 +115,16 @@ class AstrBotCoreLifecycle:
         self.astrbot_updator = AstrBotUpdator()
 
         # 初始化事件总线
-        self.event_bus = EventBus(self.event_queue, self.pipeline_scheduler)
+        self.event_bus = EventBus(
+            self.event_queue, self.pipeline_scheduler, self.astrbot_config
+        )
 
         # 记录启动时间
         self.start_time = int(time.time())
 
+        # 初始化管理面板统计数据
+        await stats_service.initialize(self.db)
+
         # 初始化当前任务列表
         self.curr_tasks: List[asyncio.Task] = []
 
@@ -127,12 +143,15 @@ class AstrBotCoreLifecycle:
             self.event_bus.dispatch(), name="event_bus"
         )
 
+        # 定期清理临时文件
+        janitor_task = asyncio.create_task(temp_file_janitor(), name="temp_janitor")
+
         # 把插件中注册的所有协程函数注册到事件总线中并执行
         extra_tasks = []
         for task in self.star_context._register_tasks:
             extra_tasks.append(asyncio.create_task(task, name=task.__name__))
 
-        tasks_ = [event_bus_task, *extra_tasks]
+        tasks_ = [event_bus_task, janitor_task, *extra_tasks]
         for task in tasks_:
             self.curr_tasks.append(
                 asyncio.create_task(self._task_wrapper(task), name=task.get_name())
@@ -195,6 +214,12 @@ class AstrBotCoreLifecycle:
 
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        await self.conversation_manager.flush()
+        await self.db.run(self.db.flush_metrics)
+        await asyncio.to_thread(sp.flush)
+        html_renderer.local_strategy.terminate()
+        await media_cache.close()
+        stats_service.stop()
         self.dashboard_shutdown_event.set()
 
         # 再次遍历curr_tasks等待每个任务真正结束
@@ -210,6 +235,9 @@ class AstrBotCoreLifecycle:
         """重启 AstrBot 核心生命周期管理类, 终止各个管理器并重新加载平台实例"""
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        await self.conversation_manager.flush()
+        await self.db.run(self.db.flush_metrics)
+        await asyncio.to_thread(sp.flush)
         self.dashboard_shutdown_event.set()
         threading.Thread(
             target=self.astrbot_updator._reboot, name="restart", daemon=True
@@ -1,8 +1,12 @@
 import abc
+import asyncio
+import functools
 from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
 from astrbot.core.db.po import Stats, LLMHistory, ATRIVision, Conversation
 
+T = TypeVar("T")
+
 
 @dataclass
 class BaseDatabase(abc.ABC):
@@ -10,9 +14,22 @@ class BaseDatabase(abc.ABC):
     数据库基类
     """
 
+    executor = None
+    """执行 run() 的线程池(concurrent.futures.Executor), 为 None 时使用事件循环默认的线程池"""
+
     def __init__(self) -> None:
         pass
 
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行同步的数据库方法, 不阻塞事件循环。
+
+        Example:
+            conversation = await db.run(db.get_conversation_by_user_id, user_id, cid)
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
     def insert_base_metrics(self, metrics: dict):
         """插入基础指标数据"""
         self.insert_platform_metrics(metrics["platform_stats"])
@@ -40,6 +57,10 @@ class BaseDatabase(abc.ABC):
         """插入 LLM 指标数据"""
         raise NotImplementedError
 
+    def flush_metrics(self):
+        """将缓冲在内存中的指标数据写入数据库"""
+        pass
+
     @abc.abstractmethod
     def update_llm_history(self, session_id: str, content: str, provider_type: str):
         """更新 LLM 历史记录。当不存在 session_id 时插入"""
@@ -103,6 +124,31 @@ class BaseDatabase(abc.ABC):
         """更新 Conversation"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_conversation_messages(
+        self, user_id: str, cid: str, start_seq: int = 0, limit: int = None
+    ) -> List[str]:
+        """按序号顺序获取 Conversation 中序号不小于 start_seq 的消息(JSON 字符串)。limit 不为空时只返回最后 limit 条"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def append_conversation_messages(self, user_id: str, cid: str, messages: List[str]):
+        """在 Conversation 的末尾追加消息(JSON 字符串), 不需要读取已有的对话历史"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def write_conversation_messages(
+        self, changes: List[Tuple[str, str, int, int, List[str]]]
+    ):
+        """批量写入 Conversation 的对话历史变更
+
+        Args:
+            changes: (user_id, cid, context_offset, start_seq, messages) 列表。
+                删除序号不小于 start_seq 的消息, 然后从 start_seq 开始依次写入 messages(JSON 字符串),
+                并将当前上下文的起始序号更新为 context_offset。只追加消息时 start_seq 即为已有消息的数量。
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def delete_conversation(self, user_id: str, cid: str):
         """删除 Conversation"""
@@ -87,3 +87,5 @@ class Conversation:
     updated_at: int = 0
     title: str = ""
     persona_id: str = ""
+    context_offset: int = 0
+    """当前上下文的第一条消息在对话中的序号。之前的消息已经被截断, 不再作为上下文, 但仍然保存在数据库中"""
@@ -1,15 +1,45 @@
 import sqlite3
 import os
+import json
 import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from astrbot.core.db.po import Platform, Stats, LLMHistory, ATRIVision, Conversation
 from . import BaseDatabase
-from typing import Tuple, List, Dict, Any
+from .sqlite_migrations import migrate
+from typing import Callable, Tuple, List, Dict, Any
+from astrbot.core.log import LogManager
+
+logger = LogManager.GetLogger(log_name="astrbot")
+
+
+def _log_write_error(future: Future):
+    if future.exception() is not None:
+        logger.error(f"数据库写入失败: {future.exception()}")
 
 
 class SQLiteDatabase(BaseDatabase):
+    metrics_flush_interval = 10
+    """内存中累计的指标计数写入数据库的间隔(秒)"""
+    metrics_minute_retention = 2 * 86400
+    """按分钟聚合的指标的保留时长(秒), 更早的数据会被合并到按小时聚合的表中"""
+    metrics_hour_retention = 365 * 86400
+    """按小时聚合的指标的保留时长(秒)"""
+
     def __init__(self, db_path: str) -> None:
         super().__init__()
         self.db_path = db_path
+        self._metrics: Dict[Tuple[str, str, int], int] = {}
+        """还未写入数据库的指标计数, (类型, 名称, 分钟) -> 计数"""
+        self._metrics_lock = threading.Lock()
+        self._last_compact = 0.0
+        self._local = threading.local()
+        """每个线程各自的读连接"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="astrbot_db_reader"
+        )
+        self._write_queue: "queue.Queue[Tuple[Callable, Future]]" = queue.Queue()
 
         with open(
             os.path.dirname(__file__) + "/sqlite_init.sql", "r", encoding="utf-8"
@@ -18,93 +48,211 @@ class SQLiteDatabase(BaseDatabase):
 
         # 初始化数据库
         self.conn = self._get_conn(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._local.conn = self.conn
         c = self.conn.cursor()
         c.executescript(sql)
         self.conn.commit()
+        c.close()
 
-        # 检查 webchat_conversation 的 title 字段是否存在
-        c.execute(
-            """
-            PRAGMA table_info(webchat_conversation)
-            """
-        )
-        res = c.fetchall()
-        has_title = False
-        has_persona_id = False
-        for row in res:
-            if row[1] == "title":
-                has_title = True
-            if row[1] == "persona_id":
-                has_persona_id = True
-        if not has_title:
-            c.execute(
-                """
-                ALTER TABLE webchat_conversation ADD COLUMN title TEXT;
-                """
-            )
-            self.conn.commit()
-        if not has_persona_id:
-            c.execute(
-                """
-                ALTER TABLE webchat_conversation ADD COLUMN persona_id TEXT;
-                """
-            )
-            self.conn.commit()
+        # 升级数据库结构
+        migrate(self.conn)
 
-        c.close()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="astrbot_db_writer", daemon=True
+        )
+        self._writer.start()
 
     def _get_conn(self, db_path: str) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, cached_statements=256)
         conn.text_factory = str
+        # WAL 模式下读写互不阻塞, synchronous=NORMAL 时提交不需要每次都等待刷盘
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
         return conn
 
-    def _exec_sql(self, sql: str, params: Tuple = None):
-        conn = self.conn
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            conn = self._get_conn(self.db_path)
+    def _reader(self) -> sqlite3.Connection:
+        """获取当前线程的读连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._get_conn(self.db_path)
+        return conn
+
+    def _write(self, fn: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """在写线程中执行写操作, 并等待其提交。
+
+        所有的写操作都由同一个写线程执行, 同时提交的多个写操作会合并在一个事务中提交。
+        """
+        if threading.current_thread() is self._writer:
+            return fn(self._writer_conn.cursor())
+        future = Future()
+        self._write_queue.put((fn, future))
+        return future.result()
+
+    def _write_loop(self):
+        conn = self._writer_conn = self._get_conn(self.db_path)
+        conn.isolation_level = None  # 手动管理事务
+        next_flush = time.monotonic() + self.metrics_flush_interval
+        while True:
+            batch = []
+            try:
+                batch.append(
+                    self._write_queue.get(timeout=max(next_flush - time.monotonic(), 0))
+                )
+            except queue.Empty:
+                pass
+            while len(batch) < 256:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if time.monotonic() >= next_flush:
+                # 定时将内存中的指标计数写入数据库
+                future = Future()
+                future.add_done_callback(_log_write_error)
+                batch.append((self._flush_metrics, future))
+                next_flush = time.monotonic() + self.metrics_flush_interval
+
             c = conn.cursor()
+            results = []
+            try:
+                c.execute("BEGIN IMMEDIATE")
+                for fn, future in batch:
+                    # 每个写操作使用一个保存点, 一个操作失败不影响同一批次的其他操作
+                    c.execute("SAVEPOINT w")
+                    try:
+                        results.append((future, fn(c), None))
+                        c.execute("RELEASE w")
+                    except Exception as e:
+                        c.execute("ROLLBACK TO w")
+                        c.execute("RELEASE w")
+                        results.append((future, None, e))
+                c.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                c.close()
+
+            for future, result, exc in results:
+                if exc is not None:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
 
+    def _exec_sql(self, sql: str, params: Tuple = None):
         if params:
-            c.execute(sql, params)
-            c.close()
+            self._write(lambda c: c.execute(sql, params))
         else:
-            c.execute(sql)
-            c.close()
-
-        conn.commit()
+            self._write(lambda c: c.execute(sql))
 
     def insert_platform_metrics(self, metrics: dict):
-        for k, v in metrics.items():
-            self._exec_sql(
-                """
-                INSERT INTO platform(name, count, timestamp) VALUES (?, ?, ?)
-                """,
-                (k, v, int(time.time())),
-            )
+        self._count_metrics("platform", metrics)
 
     def insert_plugin_metrics(self, metrics: dict):
         pass
 
     def insert_command_metrics(self, metrics: dict):
-        for k, v in metrics.items():
-            self._exec_sql(
+        self._count_metrics("command", metrics)
+
+    def insert_llm_metrics(self, metrics: dict):
+        self._count_metrics("llm", metrics)
+
+    def _count_metrics(self, kind: str, metrics: dict):
+        """在内存中累计指标计数, 由写线程定时写入按分钟聚合的表"""
+        bucket = int(time.time()) // 60 * 60
+        with self._metrics_lock:
+            for name, count in metrics.items():
+                key = (kind, name, bucket)
+                self._metrics[key] = self._metrics.get(key, 0) + count
+
+    def _pending_metrics(self, kind: str) -> List[Tuple[str, int, int]]:
+        """获取还未写入数据库的指标计数, (名称, 计数, 分钟)"""
+        with self._metrics_lock:
+            return [
+                (name, count, bucket)
+                for (k, name, bucket), count in self._metrics.items()
+                if k == kind
+            ]
+
+    def flush_metrics(self):
+        self._write(self._flush_metrics)
+
+    def _flush_metrics(self, c: sqlite3.Cursor):
+        with self._metrics_lock:
+            pending, self._metrics = self._metrics, {}
+        if pending:
+            totals: Dict[Tuple[str, str], int] = {}
+            for (kind, name, _), count in pending.items():
+                totals[(kind, name)] = totals.get((kind, name), 0) + count
+            c.executemany(
                 """
-                INSERT INTO command(name, count, timestamp) VALUES (?, ?, ?)
+                INSERT INTO metrics_minute(kind, name, bucket, count) VALUES (?, ?, ?, ?)
+                ON CONFLICT(kind, bucket, name) DO UPDATE SET count = count + excluded.count
                 """,
-                (k, v, int(time.time())),
+                [
+                    (kind, name, bucket, count)
+                    for (kind, name, bucket), count in pending.items()
+                ],
             )
-
-    def insert_llm_metrics(self, metrics: dict):
-        for k, v in metrics.items():
-            self._exec_sql(
+            c.executemany(
                 """
-                INSERT INTO llm(name, count, timestamp) VALUES (?, ?, ?)
+                INSERT INTO metrics_total(kind, name, count) VALUES (?, ?, ?)
+                ON CONFLICT(kind, name) DO UPDATE SET count = count + excluded.count
                 """,
-                (k, v, int(time.time())),
+                [(kind, name, count) for (kind, name), count in totals.items()],
             )
 
+        now = time.time()
+        if now - self._last_compact >= 3600:
+            self._compact_metrics(c, int(now))
+            self._last_compact = now
+
+    def _compact_metrics(self, c: sqlite3.Cursor, now: int):
+        """将过期的按分钟聚合的指标合并到按小时聚合的表中, 并删除过期的按小时聚合的指标"""
+        cutoff = (now - self.metrics_minute_retention) // 3600 * 3600
+        c.execute(
+            """
+            INSERT INTO metrics_hour(kind, name, bucket, count)
+            SELECT kind, name, bucket / 3600 * 3600 AS b, SUM(count) FROM metrics_minute
+            WHERE bucket < ? GROUP BY kind, name, b
+            ON CONFLICT(kind, bucket, name) DO UPDATE SET count = count + excluded.count
+            """,
+            (cutoff,),
+        )
+        c.execute("DELETE FROM metrics_minute WHERE bucket < ?", (cutoff,))
+        c.execute(
+            "DELETE FROM metrics_hour WHERE bucket < ?",
+            (now - self.metrics_hour_retention,),
+        )
+
+    def _query_metrics(
+        self, kind: str, offset_sec: int, grouped: bool = False
+    ) -> List[Tuple[str, int, int]]:
+        """获取 offset_sec 秒前到现在的指标, 按时间排序的 (名称, 计数, 时间) 列表。
+
+        grouped 为 True 时按名称合并, 时间为最后一次计数的时间。
+        """
+        start = int(time.time()) - offset_sec
+        # 分钟表和小时表中的数据在时间上不重叠
+        sql = """
+            SELECT name, count, bucket FROM metrics_hour WHERE kind = ? AND bucket > ?
+            UNION ALL
+            SELECT name, count, bucket FROM metrics_minute WHERE kind = ? AND bucket >= ?
+        """
+        if grouped:
+            sql = f"SELECT name, SUM(count), MAX(bucket) FROM ({sql}) GROUP BY name"
+        c = self._reader().cursor()
+        c.execute(sql, (kind, start - 3600, kind, start))
+        rows = c.fetchall()
+        c.close()
+        rows.extend(row for row in self._pending_metrics(kind) if row[2] >= start)
+        rows.sort(key=lambda row: row[2])
+        return rows
+
     def update_llm_history(self, session_id: str, content: str, provider_type: str):
         res = self.get_llm_history(session_id, provider_type)
         if res:
@@ -125,10 +273,7 @@ class SQLiteDatabase(BaseDatabase):
     def get_llm_history(
         self, session_id: str = None, provider_type: str = None
     ) -> Tuple:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         conditions = []
         params = []
@@ -156,97 +301,43 @@ class SQLiteDatabase(BaseDatabase):
 
     def get_base_stats(self, offset_sec: int = 86400) -> Stats:
         """获取 offset_sec 秒前到现在的基础统计数据"""
-        where_clause = f" WHERE timestamp >= {int(time.time()) - offset_sec}"
-
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
-
-        c.execute(
-            """
-            SELECT * FROM platform
-            """
-            + where_clause
-        )
-
-        platform = []
-        for row in c.fetchall():
-            platform.append(Platform(*row))
-
-        # c.execute(
-        #     '''
-        #     SELECT * FROM command
-        #     ''' + where_clause
-        # )
-
-        # command = []
-        # for row in c.fetchall():
-        #     command.append(Command(*row))
-
-        # c.execute(
-        #     '''
-        #     SELECT * FROM llm
-        #     ''' + where_clause
-        # )
-
-        # llm = []
-        # for row in c.fetchall():
-        #     llm.append(Provider(*row))
-
-        c.close()
-
+        platform = [
+            Platform(*row) for row in self._query_metrics("platform", offset_sec)
+        ]
         return Stats(platform, [], [])
 
     def get_total_message_count(self) -> int:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         c.execute(
             """
-            SELECT SUM(count) FROM platform
+            SELECT SUM(count) FROM metrics_total WHERE kind = 'platform'
             """
         )
         res = c.fetchone()
         c.close()
-        return res[0]
+        return (res[0] or 0) + sum(row[1] for row in self._pending_metrics("platform"))
 
     def get_grouped_base_stats(self, offset_sec: int = 86400) -> Stats:
         """获取 offset_sec 秒前到现在的基础统计数据(合并)"""
-        where_clause = f" WHERE timestamp >= {int(time.time()) - offset_sec}"
-
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
-
-        c.execute(
-            """
-            SELECT name, SUM(count), timestamp FROM platform
-            """
-            + where_clause
-            + " GROUP BY name"
-        )
-
-        platform = []
-        for row in c.fetchall():
-            platform.append(Platform(*row))
-
-        c.close()
-
-        return Stats(platform, [], [])
+        grouped: Dict[str, Platform] = {}
+        for name, count, timestamp in self._query_metrics(
+            "platform", offset_sec, grouped=True
+        ):
+            # 合并还未写入数据库的计数
+            if name in grouped:
+                grouped[name].count += count
+                grouped[name].timestamp = timestamp
+            else:
+                grouped[name] = Platform(name, count, timestamp)
+        return Stats(list(grouped.values()), [], [])
 
     def get_conversation_by_user_id(self, user_id: str, cid: str) -> Conversation:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         c.execute(
             """
-            SELECT * FROM webchat_conversation WHERE user_id = ? AND cid = ?
+            SELECT user_id, cid, created_at, updated_at, title, persona_id, context_offset FROM webchat_conversation WHERE user_id = ? AND cid = ?
             """,
             (user_id, cid),
         )
@@ -257,24 +348,59 @@ class SQLiteDatabase(BaseDatabase):
         if not res:
             return
 
-        return Conversation(*res)
+        user_id, cid, created_at, updated_at, title, persona_id, context_offset = res
+        context_offset = context_offset or 0
+        messages = self.get_conversation_messages(user_id, cid, context_offset)
+        # 消息本身就是 JSON 字符串, 直接拼接, 不需要再解析一次
+        history = "[" + ",".join(messages) + "]"
+        return Conversation(
+            user_id,
+            cid,
+            history,
+            created_at,
+            updated_at,
+            title,
+            persona_id,
+            context_offset,
+        )
+
+    def get_conversation_messages(
+        self, user_id: str, cid: str, start_seq: int = 0, limit: int = None
+    ) -> List[str]:
+        c = self._reader().cursor()
+
+        if limit is None:
+            c.execute(
+                """
+                SELECT content FROM webchat_conversation_message WHERE user_id = ? AND cid = ? AND seq >= ? ORDER BY seq
+                """,
+                (user_id, cid, start_seq),
+            )
+            res = c.fetchall()
+        else:
+            c.execute(
+                """
+                SELECT content FROM webchat_conversation_message WHERE user_id = ? AND cid = ? AND seq >= ? ORDER BY seq DESC LIMIT ?
+                """,
+                (user_id, cid, start_seq, limit),
+            )
+            res = c.fetchall()
+            res.reverse()
+        c.close()
+        return [row[0] for row in res]
 
     def new_conversation(self, user_id: str, cid: str):
-        history = "[]"
         updated_at = int(time.time())
         created_at = updated_at
         self._exec_sql(
             """
-            INSERT INTO webchat_conversation(user_id, cid, history, updated_at, created_at) VALUES (?, ?, ?, ?, ?)
+            INSERT INTO webchat_conversation(user_id, cid, history, updated_at, created_at, context_offset) VALUES (?, ?, NULL, ?, ?, 0)
             """,
-            (user_id, cid, history, updated_at, created_at),
+            (user_id, cid, updated_at, created_at),
         )
 
     def get_conversations(self, user_id: str) -> Tuple:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         c.execute(
             """
@@ -298,13 +424,125 @@ class SQLiteDatabase(BaseDatabase):
         return conversations
 
     def update_conversation(self, user_id: str, cid: str, history: str):
-        """更新对话，并且同时更新时间"""
+        """更新对话，并且同时更新时间
+
+        只会写入与已存储的历史记录不同的部分, 追加消息时不会重写整个对话历史。
+        """
+        messages = [json.dumps(message) for message in json.loads(history)]
+
+        def update(c: sqlite3.Cursor):
+            c.execute(
+                """
+                SELECT context_offset FROM webchat_conversation WHERE user_id = ? AND cid = ?
+                """,
+                (user_id, cid),
+            )
+            res = c.fetchone()
+            if not res:
+                return
+            context_offset = res[0] or 0
+            c.execute(
+                """
+                SELECT content FROM webchat_conversation_message WHERE user_id = ? AND cid = ? AND seq >= ? ORDER BY seq
+                """,
+                (user_id, cid, context_offset),
+            )
+            stored = [row[0] for row in c.fetchall()]
+            # 跳过相同的前缀
+            same = 0
+            for old, new in zip(stored, messages):
+                if old != new:
+                    break
+                same += 1
+            self._write_conversation_messages(
+                c,
+                user_id,
+                cid,
+                context_offset,
+                context_offset + same,
+                messages[same:],
+                int(time.time()),
+            )
+
+        self._write(update)
+
+    def append_conversation_messages(self, user_id: str, cid: str, messages: List[str]):
         updated_at = int(time.time())
-        self._exec_sql(
+
+        def append(c: sqlite3.Cursor):
+            c.execute(
+                """
+                UPDATE webchat_conversation SET updated_at = ? WHERE user_id = ? AND cid = ?
+                """,
+                (updated_at, user_id, cid),
+            )
+            if c.rowcount == 0:
+                # 对话不存在或已被删除
+                return
+            c.execute(
+                """
+                SELECT COALESCE(MAX(seq) + 1, 0) FROM webchat_conversation_message WHERE user_id = ? AND cid = ?
+                """,
+                (user_id, cid),
+            )
+            start_seq = c.fetchone()[0]
+            c.executemany(
+                """
+                INSERT INTO webchat_conversation_message(user_id, cid, seq, content) VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (user_id, cid, start_seq + i, message)
+                    for i, message in enumerate(messages)
+                ],
+            )
+
+        self._write(append)
+
+    def write_conversation_messages(
+        self, changes: List[Tuple[str, str, int, int, List[str]]]
+    ):
+        """批量写入对话历史的变更，在同一个事务中提交"""
+        updated_at = int(time.time())
+
+        def write(c: sqlite3.Cursor):
+            for user_id, cid, context_offset, start_seq, messages in changes:
+                self._write_conversation_messages(
+                    c, user_id, cid, context_offset, start_seq, messages, updated_at
+                )
+
+        self._write(write)
+
+    def _write_conversation_messages(
+        self,
+        c: sqlite3.Cursor,
+        user_id: str,
+        cid: str,
+        context_offset: int,
+        start_seq: int,
+        messages: List[str],
+        updated_at: int,
+    ):
+        # 追加时 start_seq 之后没有消息, 这条 DELETE 只是一次主键范围查询
+        c.execute(
+            """
+            DELETE FROM webchat_conversation_message WHERE user_id = ? AND cid = ? AND seq >= ?
+            """,
+            (user_id, cid, start_seq),
+        )
+        c.executemany(
             """
-            UPDATE webchat_conversation SET history = ?, updated_at = ? WHERE user_id = ? AND cid = ?
+            INSERT INTO webchat_conversation_message(user_id, cid, seq, content) VALUES (?, ?, ?, ?)
             """,
-            (history, updated_at, user_id, cid),
+            [
+                (user_id, cid, start_seq + i, message)
+                for i, message in enumerate(messages)
+            ],
+        )
+        c.execute(
+            """
+            UPDATE webchat_conversation SET context_offset = ?, updated_at = ? WHERE user_id = ? AND cid = ?
+            """,
+            (context_offset, updated_at, user_id, cid),
         )
 
     def update_conversation_title(self, user_id: str, cid: str, title: str):
@@ -324,12 +562,21 @@ class SQLiteDatabase(BaseDatabase):
         )
 
     def delete_conversation(self, user_id: str, cid: str):
-        self._exec_sql(
-            """
-            DELETE FROM webchat_conversation WHERE user_id = ? AND cid = ?
-            """,
-            (user_id, cid),
-        )
+        def delete(c: sqlite3.Cursor):
+            c.execute(
+                """
+                DELETE FROM webchat_conversation WHERE user_id = ? AND cid = ?
+                """,
+                (user_id, cid),
+            )
+            c.execute(
+                """
+                DELETE FROM webchat_conversation_message WHERE user_id = ? AND cid = ?
+                """,
+                (user_id, cid),
+            )
+
+        self._write(delete)
 
     def insert_atri_vision_data(self, vision: ATRIVision):
         ts = int(time.time())
@@ -352,10 +599,7 @@ class SQLiteDatabase(BaseDatabase):
         )
 
     def get_atri_vision_data(self) -> Tuple:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         c.execute(
             """
@@ -373,10 +617,7 @@ class SQLiteDatabase(BaseDatabase):
     def get_atri_vision_data_by_path_or_id(
         self, url_or_path: str, id: str
     ) -> ATRIVision:
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         c.execute(
             """
@@ -395,10 +636,7 @@ class SQLiteDatabase(BaseDatabase):
         self, page: int = 1, page_size: int = 20
     ) -> Tuple[List[Dict[str, Any]], int]:
         """获取所有对话，支持分页，按更新时间降序排序"""
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         try:
             # 获取总记录数
@@ -461,10 +699,7 @@ class SQLiteDatabase(BaseDatabase):
         exclude_platforms: List[str] = None,
     ) -> Tuple[List[Dict[str, Any]], int]:
         """获取筛选后的对话列表"""
-        try:
-            c = self.conn.cursor()
-        except sqlite3.ProgrammingError:
-            c = self._get_conn(self.db_path).cursor()
+        c = self._reader().cursor()
 
         try:
             # 构建查询条件
@@ -495,7 +730,9 @@ class SQLiteDatabase(BaseDatabase):
             if search_query:
                 search_query = search_query.encode("unicode_escape").decode("utf-8")
                 where_clauses.append(
-                    "(title LIKE ? OR user_id LIKE ? OR cid LIKE ? OR history LIKE ?)"
+                    "(title LIKE ? OR user_id LIKE ? OR cid LIKE ? OR EXISTS ("
+                    "SELECT 1 FROM webchat_conversation_message m WHERE m.user_id = webchat_conversation.user_id "
+                    "AND m.cid = webchat_conversation.cid AND m.content LIKE ?))"
                 )
                 search_param = f"%{search_query}%"
                 params.extend([search_param, search_param, search_param, search_param])
@@ -44,7 +44,17 @@ CREATE TABLE IF NOT EXISTS webchat_conversation(
     created_at INTEGER,
     updated_at INTEGER,
     title TEXT,
-    persona_id TEXT
+    persona_id TEXT,
+    context_offset INTEGER DEFAULT 0 -- 当前上下文的第一条消息的序号, 之前的消息已不再作为上下文
+);
+
+-- 对话历史, 每条消息一行, 只追加
+CREATE TABLE IF NOT EXISTS webchat_conversation_message(
+    user_id TEXT NOT NULL, -- 会话 id
+    cid TEXT NOT NULL, -- 对话 id
+    seq INTEGER NOT NULL, -- 消息在对话中的序号
+    content TEXT, -- JSON 格式的消息
+    PRIMARY KEY (user_id, cid, seq)
 );
 
 PRAGMA encoding = 'UTF-8';
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+SQLite 数据库的版本化迁移
+
+数据库的结构版本记录在 `PRAGMA user_version` 中。sqlite_init.sql 只负责创建表, 之后的所有结构变更都以迁移的形式追加到 MIGRATIONS 末尾,
+启动时按版本号依次执行尚未执行的迁移, 每个迁移在一个事务中执行, 执行成功后更新版本号。
+
+迁移需要保证在新建的数据库上重复执行也是安全的(新建的数据库版本号为 0, 会执行所有迁移)。
+"""
+
+import json
+import sqlite3
+import time
+from typing import Callable, List, Tuple
+from astrbot.core.log import LogManager
+
+logger = LogManager.GetLogger(log_name="astrbot")
+
+
+def _columns(c: sqlite3.Cursor, table: str) -> List[str]:
+    c.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in c.fetchall()]
+
+
+def _add_conversation_columns(c: sqlite3.Cursor):
+    """为 webchat_conversation 添加 title, persona_id, context_offset 字段"""
+    columns = _columns(c, "webchat_conversation")
+    if "title" not in columns:
+        c.execute("ALTER TABLE webchat_conversation ADD COLUMN title TEXT")
+    if "persona_id" not in columns:
+        c.execute("ALTER TABLE webchat_conversation ADD COLUMN persona_id TEXT")
+    if "context_offset" not in columns:
+        c.execute(
+            "ALTER TABLE webchat_conversation ADD COLUMN context_offset INTEGER DEFAULT 0"
+        )
+
+
+def _split_conversation_history(c: sqlite3.Cursor):
+    """将 webchat_conversation.history 中以 JSON 字符串存储的对话历史迁移到 webchat_conversation_message 表。
+
+    迁移完成的对话的 history 字段会被置为 NULL。
+    """
+    c.execute(
+        """
+        SELECT user_id, cid, history FROM webchat_conversation WHERE history IS NOT NULL
+        """
+    )
+    rows = c.fetchall()
+    if not rows:
+        return
+    logger.info(f"正在迁移 {len(rows)} 个对话的历史记录到新的存储格式...")
+    for user_id, cid, history in rows:
+        try:
+            messages = json.loads(history) if history else []
+        except json.JSONDecodeError:
+            logger.warning(f"对话 {user_id}/{cid} 的历史记录不是合法的 JSON, 已跳过。")
+            messages = []
+        if not isinstance(messages, list):
+            messages = [messages]
+        c.execute(
+            """
+            DELETE FROM webchat_conversation_message WHERE user_id = ? AND cid = ?
+            """,
+            (user_id, cid),
+        )
+        c.executemany(
+            """
+            INSERT INTO webchat_conversation_message(user_id, cid, seq, content) VALUES (?, ?, ?, ?)
+            """,
+            [
+                (user_id, cid, seq, json.dumps(message))
+                for seq, message in enumerate(messages)
+            ],
+        )
+        c.execute(
+            """
+            UPDATE webchat_conversation SET history = NULL, context_offset = 0 WHERE user_id = ? AND cid = ?
+            """,
+            (user_id, cid),
+        )
+
+
+def _add_indexes(c: sqlite3.Cursor):
+    """为常用查询添加索引, 并为 webchat_conversation 添加 (user_id, cid) 唯一约束"""
+    # 同一个 (user_id, cid) 只保留最后写入的一行。旧版本中重复的行本来也无法被读取到
+    c.execute(
+        """
+        DELETE FROM webchat_conversation WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM webchat_conversation GROUP BY user_id, cid
+        )
+        """
+    )
+    # 删除不属于任何对话的消息
+    c.execute(
+        """
+        DELETE FROM webchat_conversation_message WHERE NOT EXISTS (
+            SELECT 1 FROM webchat_conversation c
+            WHERE c.user_id = webchat_conversation_message.user_id
+            AND c.cid = webchat_conversation_message.cid
+        )
+        """
+    )
+    for sql in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_webchat_conversation_user_cid ON webchat_conversation(user_id, cid)",
+        "CREATE INDEX IF NOT EXISTS idx_webchat_conversation_user_updated ON webchat_conversation(user_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_webchat_conversation_updated ON webchat_conversation(updated_at)",
+        # 统计查询按时间范围过滤后按 name 聚合。name 的取值很少, 有 ANALYZE 的统计信息时,
+        # 以 (name, timestamp) 开头的覆盖索引可以对每个 name 跳跃扫描时间范围, 按 name 的顺序输出, 不需要临时 B 树, 也不需要回表
+        "CREATE INDEX IF NOT EXISTS idx_platform_name_timestamp ON platform(name, timestamp, count)",
+        "CREATE INDEX IF NOT EXISTS idx_llm_name_timestamp ON llm(name, timestamp, count)",
+        "CREATE INDEX IF NOT EXISTS idx_command_name_timestamp ON command(name, timestamp, count)",
+        "CREATE INDEX IF NOT EXISTS idx_llm_history_session ON llm_history(session_id, provider_type)",
+        "CREATE INDEX IF NOT EXISTS idx_atri_vision_id ON atri_vision(id)",
+        "CREATE INDEX IF NOT EXISTS idx_atri_vision_url_or_path ON atri_vision(url_or_path)",
+        # 收集统计信息, 查询规划器据此选择跳跃扫描
+        "ANALYZE platform",
+        "ANALYZE llm",
+        "ANALYZE command",
+    ):
+        c.execute(sql)
+
+
+def _create_metric_rollups(c: sqlite3.Cursor):
+    """创建按分钟、按小时聚合的指标表, 并将 platform, llm, command 表中的原始数据聚合进去"""
+    for sql in (
+        """
+        CREATE TABLE IF NOT EXISTS metrics_minute(
+            kind VARCHAR(16) NOT NULL, -- platform, llm, command
+            name VARCHAR(32) NOT NULL,
+            bucket INTEGER NOT NULL, -- 所在分钟的起始时间戳
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, bucket, name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS metrics_hour(
+            kind VARCHAR(16) NOT NULL,
+            name VARCHAR(32) NOT NULL,
+            bucket INTEGER NOT NULL, -- 所在小时的起始时间戳
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, bucket, name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS metrics_total(
+            kind VARCHAR(16) NOT NULL,
+            name VARCHAR(32) NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, name)
+        )
+        """,
+    ):
+        c.execute(sql)
+
+    # 将原始数据聚合到最近两天的分钟表和更早的小时表中, 核对聚合后的计数与原始数据一致后清空原始表
+    cutoff = (int(time.time()) - 2 * 86400) // 3600 * 3600
+    for kind in ("platform", "llm", "command"):
+        c.execute(
+            f"SELECT COALESCE(SUM(count), 0) FROM {kind} WHERE name IS NOT NULL AND count IS NOT NULL"
+        )
+        raw = c.fetchone()[0]
+        before = _rollup_counts(c, kind)
+        for table, size, cond in (
+            ("metrics_minute", 60, "timestamp >= ?"),
+            ("metrics_hour", 3600, "timestamp < ?"),
+        ):
+            c.execute(
+                f"""
+                INSERT INTO {table}(kind, name, bucket, count)
+                SELECT ?, name, timestamp / {size} * {size} AS b, SUM(count) FROM {kind}
+                WHERE name IS NOT NULL AND count IS NOT NULL AND {cond} GROUP BY name, b
+                ON CONFLICT(kind, bucket, name) DO UPDATE SET count = count + excluded.count
+                """,
+                (kind, cutoff),
+            )
+        c.execute(
+            f"""
+            INSERT INTO metrics_total(kind, name, count)
+            SELECT ?, name, SUM(count) FROM {kind}
+            WHERE name IS NOT NULL AND count IS NOT NULL GROUP BY name
+            ON CONFLICT(kind, name) DO UPDATE SET count = count + excluded.count
+            """,
+            (kind,),
+        )
+        after = _rollup_counts(c, kind)
+        if any(a - b != raw for a, b in zip(after, before)):
+            # 抛出异常使迁移回滚, 原始数据保持不变
+            raise Exception(
+                f"{kind} 表的数据聚合后计数不一致: 原始数据 {raw}, 聚合表增加 {[a - b for a, b in zip(after, before)]}"
+            )
+        c.execute(f"DELETE FROM {kind}")
+        # 统计查询不再读取原始表, 删除原始表上的索引
+        c.execute(f"DROP INDEX IF EXISTS idx_{kind}_name_timestamp")
+
+
+def _rollup_counts(c: sqlite3.Cursor, kind: str) -> Tuple[int, int]:
+    """返回聚合表中 kind 的计数之和: (分钟表 + 小时表, 总计表)"""
+    c.execute(
+        """
+        SELECT
+            (SELECT COALESCE(SUM(count), 0) FROM metrics_minute WHERE kind = ?)
+            + (SELECT COALESCE(SUM(count), 0) FROM metrics_hour WHERE kind = ?),
+            (SELECT COALESCE(SUM(count), 0) FROM metrics_total WHERE kind = ?)
+        """,
+        (kind, kind, kind),
+    )
+    return c.fetchone()
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "添加对话标题、人格和上下文起始序号字段", _add_conversation_columns),
+    (2, "对话历史按消息逐条存储", _split_conversation_history),
+    (3, "添加索引", _add_indexes),
+    (4, "指标数据按分钟和小时聚合存储", _create_metric_rollups),
+]
+"""(版本号, 描述, 迁移函数)。只能在末尾追加, 版本号必须递增"""
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection):
+    """执行所有尚未执行的迁移"""
+    version = get_version(conn)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # 手动管理事务, 使 DDL 也在事务中执行
+    try:
+        for target, desc, fn in MIGRATIONS:
+            if target <= version:
+                continue
+            logger.info(f"正在升级数据库结构到版本 {target}: {desc}")
+            c = conn.cursor()
+            try:
+                c.execute("BEGIN")
+                fn(c)
+                c.execute(f"PRAGMA user_version = {target}")
+                c.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    c.execute("ROLLBACK")
+                raise
+            finally:
+                c.close()
+            version = target
+    finally:
+        conn.isolation_level = isolation_level
@@ -22,6 +22,19 @@ class BaseVecDB:
         """
         ...
 
+    async def insert_batch(
+        self, contents: list[str], metadatas: list[dict] = None, ids: list[str] = None
+    ) -> list[int]:
+        """
+        批量插入文本和其对应向量。默认逐条调用 insert。
+        """
+        metadatas = metadatas or [None] * len(contents)
+        ids = ids or [None] * len(contents)
+        return [
+            await self.insert(content, metadata, id)
+            for content, metadata, id in zip(contents, metadatas, ids)
+        ]
+
     @abc.abstractmethod
     async def retrieve(self, query: str, top_k: int = 5) -> list[Result]:
         """
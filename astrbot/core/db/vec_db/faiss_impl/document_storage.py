@@ -1,3 +1,4 @@
+import asyncio
 import aiosqlite
 import os
 
@@ -6,6 +7,8 @@ class DocumentStorage:
     def __init__(self, db_path: str):
         self.db_path = db_path
         self.connection = None
+        # Batch inserts share the connection; keep their transactions from interleaving.
+        self._insert_lock = asyncio.Lock()
         self.sqlite_init_path = os.path.join(
             os.path.dirname(__file__), "sqlite_init.sql"
         )
@@ -55,6 +58,33 @@ class DocumentStorage:
                 result.append(await self.tuple_to_dict(row))
         return result
 
+    async def insert_documents(
+        self, documents: list[tuple[str, str, str]]
+    ) -> list[int]:
+        """Insert documents in a single transaction.
+
+        Args:
+            documents (list[tuple[str, str, str]]): (doc_id, text, metadata json) of each document.
+
+        Returns:
+            list: The ids(primary key) of the inserted documents, in the same order.
+        """
+        ids = []
+        async with self._insert_lock, self.connection.cursor() as cursor:
+            try:
+                for document in documents:
+                    await cursor.execute(
+                        "INSERT INTO documents (doc_id, text, metadata) VALUES (?, ?, ?)",
+                        document,
+                    )
+                    # lastrowid is the id of the row this statement inserted.
+                    ids.append(cursor.lastrowid)
+            except BaseException:
+                await self.connection.rollback()
+                raise
+            await self.connection.commit()
+        return ids
+
     async def get_document_by_doc_id(self, doc_id: str):
         """Retrieve a document by its doc_id.
 
@@ -4,6 +4,7 @@ except ModuleNotFoundError:
     raise ImportError(
         "faiss 未安装。请使用 'pip install faiss-cpu' 或 'pip install faiss-gpu' 安装。"
     )
+import asyncio
 import os
 import numpy as np
 
@@ -19,6 +20,11 @@ class EmbeddingStorage:
             base_index = faiss.IndexFlatL2(dimension)
             self.index = faiss.IndexIDMap(base_index)
         self.storage = {}
+        self._lock = asyncio.Lock()
+        """保存索引时持有, 避免写入文件的同时修改索引或者并发写入同一个文件"""
+        self._version = 0
+        """索引被修改的次数"""
+        self._saved_version = 0
 
     async def insert(self, vector: np.ndarray, id: int):
         """插入向量
@@ -33,10 +39,39 @@ class EmbeddingStorage:
             raise ValueError(
                 f"向量维度不匹配, 期望: {self.dimension}, 实际: {vector.shape[0]}"
             )
-        self.index.add_with_ids(vector.reshape(1, -1), np.array([id]))
-        self.storage[id] = vector
+        async with self._lock:
+            self.index.add_with_ids(vector.reshape(1, -1), np.array([id]))
+            self.storage[id] = vector
+            self._version += 1
         await self.save_index()
 
+    async def insert_batch(
+        self, vectors: np.ndarray, ids: list[int], save: bool = True
+    ):
+        """批量插入向量, 只调用一次 add_with_ids
+
+        Args:
+            vectors (np.ndarray): 要插入的向量, 形状为 (n, dimension)
+            ids (list[int]): 向量的ID
+            save (bool): 是否在插入后保存索引。批量导入时可以设置为 False, 在导入完成后再调用 save_index
+        Raises:
+            ValueError: 如果向量的维度与存储的维度不匹配, 或者向量数量与ID数量不一致
+        """
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"向量维度不匹配, 期望: (n, {self.dimension}), 实际: {vectors.shape}"
+            )
+        if vectors.shape[0] != len(ids):
+            raise ValueError(
+                f"向量数量与ID数量不一致: {vectors.shape[0]} != {len(ids)}"
+            )
+        async with self._lock:
+            self.index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+            self.storage.update(zip(ids, vectors))
+            self._version += 1
+        if save:
+            await self.save_index()
+
     async def search(self, vector: np.ndarray, k: int) -> tuple:
         """搜索最相似的向量
 
@@ -51,9 +86,13 @@ class EmbeddingStorage:
         return distances, indices
 
     async def save_index(self):
-        """保存索引
+        """保存索引。写入整个索引文件的耗时与索引大小成正比, 在线程池中执行
 
-        Args:
-            path (str): 保存索引的路径
+        写入期间持有锁, 插入会等待写入完成。多个保存请求排队时, 后面的请求发现索引已经保存过最新的修改, 直接返回
         """
-        faiss.write_index(self.index, self.path)
+        async with self._lock:
+            version = self._version
+            if version == self._saved_version:
+                return
+            await asyncio.to_thread(faiss.write_index, self.index, self.path)
+            self._saved_version = version
@@ -52,6 +52,61 @@ class FaissVecDB(BaseVecDB):
             await self.embedding_storage.insert(vector, int_id)
             return int_id
 
+    async def insert_batch(
+        self,
+        contents: list[str],
+        metadatas: list[dict] = None,
+        ids: list[str] = None,
+        batch_size: int = None,
+    ) -> list[int]:
+        """
+        批量插入文本和其对应向量。
+
+        按嵌入提供商的单次请求上限分批获取向量, 每批文档在一个事务中写入, 向量一次性加入 FAISS,
+        全部插入完成后只保存一次索引。
+
+        Args:
+            contents (list[str]): 文本列表
+            metadatas (list[dict]): 每条文本的元数据
+            ids (list[str]): 每条文本的 ID, 默认使用 UUID
+            batch_size (int): 每批的文本数量, 默认为嵌入提供商的单次请求上限
+
+        Returns:
+            list[int]: 插入的文档在 FAISS 中的 ID
+        """
+        if not contents:
+            return []
+        metadatas = metadatas or [{}] * len(contents)
+        ids = ids or [str(uuid.uuid4()) for _ in contents]
+        if not len(contents) == len(metadatas) == len(ids):
+            raise ValueError("contents, metadatas 和 ids 的长度必须一致")
+        batch_size = batch_size or self.embedding_provider.get_batch_size()
+
+        int_ids = []
+        try:
+            for start in range(0, len(contents), batch_size):
+                end = start + batch_size
+                batch = contents[start:end]
+                vectors = await self.embedding_provider.get_embeddings(batch)
+                vectors = np.array(vectors, dtype=np.float32)
+                batch_ids = await self.document_storage.insert_documents(
+                    [
+                        (str_id, content, json.dumps(metadata or {}))
+                        for str_id, content, metadata in zip(
+                            ids[start:end], batch, metadatas[start:end]
+                        )
+                    ]
+                )
+                await self.embedding_storage.insert_batch(
+                    vectors, batch_ids, save=False
+                )
+                int_ids.extend(batch_ids)
+        finally:
+            # 中途失败时, 也保存已经写入数据库的文档的向量
+            if int_ids:
+                await self.embedding_storage.save_index()
+        return int_ids
+
     async def retrieve(
         self, query: str, k: int = 5, fetch_k: int = 20, metadata_filters: dict = None
     ) -> list[Result]:
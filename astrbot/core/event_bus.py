@@ -1,43 +1,259 @@
 """
 事件总线, 用于处理事件的分发和处理
 事件总线是一个异步队列, 用于接收各种消息事件, 并将其发送到Scheduler调度器进行处理
-其中包含了一个无限循环的调度函数, 用于从事件队列中获取新的事件, 并创建一个新的异步任务来执行管道调度器的处理逻辑
+其中包含了一个无限循环的调度函数, 用于从事件队列中获取新的事件, 并交给管道调度器处理
 
 class:
     EventBus: 事件总线, 用于处理事件的分发和处理
+    EventBusStats: 事件总线的运行计数器
 
 工作流程:
 1. 维护一个异步队列, 来接受各种消息事件
-2. 无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并创建一个新的异步任务来执行管道调度器的处理逻辑
+2. 无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并放入对应会话的通道(lane)
+3. 未设置最大并发数时, 每个通道由一个独立的异步任务执行; 设置后, 由固定数量的 worker 轮流执行各通道中的事件
+4. 开启会话顺序处理时, 同一会话(unified_msg_origin)的事件串行执行, 不同会话之间并行执行
+5. 等待中的事件数量达到上限时, 根据过载策略等待(stall)或丢弃事件(discard_new, discard_oldest)
 """
 
 import asyncio
+import itertools
+import time
+import traceback
 from asyncio import Queue
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Set
 from astrbot.core.pipeline.scheduler import PipelineScheduler
 from astrbot.core import logger
+from astrbot.core.utils.session_waiter import FILTERS, USER_SESSIONS
 from .platform import AstrMessageEvent
 
 
+@dataclass
+class EventBusStats:
+    """事件总线的运行计数器, 时间单位为秒"""
+
+    received: int = 0
+    """从事件队列中取出的事件数"""
+    processed: int = 0
+    """执行完毕的事件数(包括执行出错的事件)"""
+    failed: int = 0
+    """执行出错的事件数"""
+    dropped: int = 0
+    """因过载被丢弃的事件数"""
+    queue_wait_total: float = 0.0
+    queue_wait_max: float = 0.0
+    process_time_total: float = 0.0
+    process_time_max: float = 0.0
+
+
+class _Entry:
+    """通道中的一个待执行事件"""
+
+    __slots__ = ("event", "enqueued_at", "state")
+
+    PENDING = 0
+    RUNNING = 1
+    DROPPED = 2
+
+    def __init__(self, event: AstrMessageEvent):
+        self.event = event
+        self.enqueued_at = time.perf_counter()
+        self.state = _Entry.PENDING
+
+
 class EventBus:
     """事件总线: 用于处理事件的分发和处理
 
     维护一个异步队列, 来接受各种消息事件
     """
 
-    def __init__(self, event_queue: Queue, pipeline_scheduler: PipelineScheduler):
+    def __init__(
+        self,
+        event_queue: Queue,
+        pipeline_scheduler: PipelineScheduler,
+        astrbot_config: dict = None,
+    ):
         self.event_queue = event_queue  # 事件队列
         self.pipeline_scheduler = pipeline_scheduler  # 管道调度器
 
+        dispatcher_cfg = (
+            (astrbot_config or {}).get("platform_settings", {}).get("dispatcher", {})
+        )
+        self.max_concurrency: int = int(dispatcher_cfg.get("max_concurrency", 0))
+        """最大同时执行的事件数。<= 0 时不限制"""
+        self.session_ordering: bool = dispatcher_cfg.get("session_ordering", False)
+        """是否按会话串行执行事件"""
+        self.max_pending: int = int(dispatcher_cfg.get("max_pending", 1000))
+        """最大等待执行的事件数。<= 0 时不限制"""
+        self.overload_strategy: str = dispatcher_cfg.get("overload_strategy", "stall")
+        """等待执行的事件数达到上限时的策略: stall, discard_new, discard_oldest"""
+
+        self.stats = EventBusStats()
+        self._lanes: Dict[str, Deque[_Entry]] = {}
+        """会话通道。一个通道存在时, 代表它在就绪队列中或者正在被执行"""
+        self._ready: Queue = Queue()
+        """就绪的通道 key, 仅在限制最大并发数时使用"""
+        self._fifo: Deque[_Entry] = deque()
+        """所有事件的入队顺序, 用于 discard_oldest 策略"""
+        self._pending = 0
+        self._in_flight = 0
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+
     async def dispatch(self):
-        """无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并创建一个新的异步任务来执行管道调度器的处理逻辑"""
+        """无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并交给会话通道执行"""
+        workers = [
+            asyncio.create_task(self._worker(), name=f"event_bus_worker_{i}")
+            for i in range(self.max_concurrency)
+        ]
+        try:
+            while True:
+                event: AstrMessageEvent = (
+                    await self.event_queue.get()
+                )  # 从事件队列中获取新的事件
+                self.stats.received += 1
+                self._print_event(event)  # 打印日志
+                await self._enqueue(event)
+        finally:
+            for task in itertools.chain(workers, self._tasks):
+                task.cancel()
+
+    def get_stats(self) -> dict:
+        """获取事件总线的队列深度、延迟等统计信息"""
+        stats = self.stats
+        started = stats.processed + self._in_flight
+        return {
+            "max_concurrency": self.max_concurrency,
+            "session_ordering": self.session_ordering,
+            "max_pending": self.max_pending,
+            "overload_strategy": self.overload_strategy,
+            "event_queue_size": self.event_queue.qsize(),
+            "pending": self._pending,
+            "in_flight": self._in_flight,
+            "lanes": len(self._lanes),
+            "received": stats.received,
+            "processed": stats.processed,
+            "failed": stats.failed,
+            "dropped": stats.dropped,
+            "queue_wait_avg": stats.queue_wait_total / started if started else 0,
+            "queue_wait_max": stats.queue_wait_max,
+            "process_time_avg": (
+                stats.process_time_total / stats.processed if stats.processed else 0
+            ),
+            "process_time_max": stats.process_time_max,
+        }
+
+    def _lane_key(self, event: AstrMessageEvent) -> str:
+        """获取事件所属的通道。不按会话串行执行时, 每个事件独占一个通道"""
+        if not self.session_ordering or self._is_session_waiting(event):
+            return f"#{next(self._seq)}"
+        return event.unified_msg_origin
+
+    def _is_session_waiting(self, event: AstrMessageEvent) -> bool:
+        """该事件是否属于一个正在等待输入的会话(session_waiter)
+
+        等待输入的 handler 会占用通道, 因此这类事件需要绕过通道, 否则会死锁。
+        """
+        for session_filter in FILTERS:
+            if session_filter.filter(event) in USER_SESSIONS:
+                return True
+        return False
+
+    async def _enqueue(self, event: AstrMessageEvent):
+        """将事件放入会话通道, 在等待中的事件过多时执行过载策略"""
+        if self.max_pending > 0 and self._pending >= self.max_pending:
+            if self.overload_strategy == "discard_new":
+                self.stats.dropped += 1
+                logger.warning(f"事件总线过载, 丢弃事件: {event.unified_msg_origin}")
+                return
+            elif self.overload_strategy == "discard_oldest":
+                self._drop_oldest()
+            else:
+                while self._pending >= self.max_pending:
+                    self._has_space.clear()
+                    await self._has_space.wait()
+
+        entry = _Entry(event)
+        self._pending += 1
+        if self.overload_strategy == "discard_oldest":
+            self._fifo.append(entry)
+
+        key = self._lane_key(event)
+        lane = self._lanes.get(key)
+        if lane is not None:
+            # 通道正在执行或已就绪, 执行完当前事件后会继续执行
+            lane.append(entry)
+            return
+        self._lanes[key] = deque((entry,))
+        if self.max_concurrency > 0:
+            self._ready.put_nowait(key)
+        else:
+            task = asyncio.create_task(self._drain_lane(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _drop_oldest(self):
+        """丢弃最早进入的、尚未开始执行的事件"""
+        while self._fifo:
+            entry = self._fifo.popleft()
+            if entry.state == _Entry.PENDING:
+                entry.state = _Entry.DROPPED
+                self._pending -= 1
+                self.stats.dropped += 1
+                logger.warning(
+                    f"事件总线过载, 丢弃事件: {entry.event.unified_msg_origin}"
+                )
+                return
+
+    async def _worker(self):
+        """限制最大并发数时的 worker。每次从就绪通道中取出一个事件执行, 然后将通道放回队尾, 以保证会话之间的公平"""
         while True:
-            event: AstrMessageEvent = (
-                await self.event_queue.get()
-            )  # 从事件队列中获取新的事件
-            self._print_event(event)  # 打印日志
-            asyncio.create_task(
-                self.pipeline_scheduler.execute(event)
-            )  # 创建新的异步任务来执行管道调度器的处理逻辑
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            await self._process(lane.popleft())
+            if lane:
+                self._ready.put_nowait(key)
+            else:
+                del self._lanes[key]
+
+    async def _drain_lane(self, key: str):
+        """不限制最大并发数时, 依次执行一个通道中的所有事件"""
+        lane = self._lanes[key]
+        while lane:
+            await self._process(lane.popleft())
+        del self._lanes[key]
+
+    async def _process(self, entry: _Entry):
+        if entry.state == _Entry.DROPPED:
+            return
+        entry.state = _Entry.RUNNING
+        self._pending -= 1
+        if not self._has_space.is_set() and self._pending < self.max_pending:
+            self._has_space.set()
+        while self._fifo and self._fifo[0].state != _Entry.PENDING:
+            self._fifo.popleft()
+
+        stats = self.stats
+        start = time.perf_counter()
+        wait = start - entry.enqueued_at
+        stats.queue_wait_total += wait
+        stats.queue_wait_max = max(stats.queue_wait_max, wait)
+
+        self._in_flight += 1
+        try:
+            await self.pipeline_scheduler.execute(entry.event)
+        except Exception:
+            stats.failed += 1
+            logger.error(traceback.format_exc())
+        finally:
+            self._in_flight -= 1
+            stats.processed += 1
+            cost = time.perf_counter() - start
+            stats.process_time_total += cost
+            stats.process_time_max = max(stats.process_time_max, cost)
 
     def _print_event(self, event: AstrMessageEvent):
         """用于记录事件信息
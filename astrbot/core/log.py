@@ -12,23 +12,29 @@ class:
 
 function:
     is_plugin_path: 检查文件路径是否来自插件目录
+    get_plugin_name: 获取插件目录中的文件所属的插件名称
     get_short_level_name: 将日志级别名称转换为四个字母的缩写
 
 工作流程:
 1. 通过 LogManager.GetLogger() 获取日志器, 配置了控制台输出和多个格式化过滤器
-2. 通过 set_queue_handler() 设置日志处理器, 将日志消息发送到 LogBroker
+2. 通过 set_queue_handler() 设置日志处理器, 将日志消息发送到 LogBroker。
+   启用 use_listener 时, 日志器只将日志记录放入队列, 由后台线程中的 QueueListener 格式化、输出到控制台并发送到 LogBroker
 3. logBroker 维护一个订阅者列表, 负责将日志分发给所有订阅者
-4. 订阅者可以使用 register() 方法注册到 LogBroker, 订阅日志流
+4. 订阅者可以使用 register() 方法注册到 LogBroker, 订阅日志流。可以传入过滤函数, 只订阅需要的日志
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import colorlog
 import asyncio
 import os
 import sys
+import threading
 from collections import deque
 from asyncio import Queue
-from typing import List
+from typing import Callable, Dict, List, Optional
 
 # 日志缓存大小
 CACHED_SIZE = 200
@@ -60,6 +66,25 @@ def is_plugin_path(pathname):
     return ("data/plugins" in norm_path) or ("packages/" in norm_path)
 
 
+def get_plugin_name(pathname):
+    """获取插件目录中的文件所属的插件名称
+
+    Args:
+        pathname (str): 文件路径
+
+    Returns:
+        str: 插件名称, 即插件目录下的第一级文件夹名。如果路径不是来自插件目录，则返回 None
+    """
+    if not pathname:
+        return None
+
+    parts = os.path.normpath(pathname).replace("\\", "/").split("/")
+    for i, part in enumerate(parts[:-2]):
+        if part == "packages" or (part == "plugins" and i and parts[i - 1] == "data"):
+            return parts[i + 1]
+    return None
+
+
 def get_short_level_name(level_name):
     """将日志级别名称转换为四个字母的缩写
 
@@ -88,17 +113,32 @@ class LogBroker:
     def __init__(self):
         self.log_cache = deque(maxlen=CACHED_SIZE)  # 环形缓冲区, 保存最近的日志
         self.subscribers: List[Queue] = []  # 订阅者列表
+        self.filters: Dict[Queue, Callable[[dict], bool]] = {}  # 订阅者的过滤函数
+        self.dropped: Dict[Queue, int] = {}  # 订阅者的队列已满而丢弃的日志数
+        self._loop: asyncio.AbstractEventLoop = None  # 订阅者队列所属的事件循环
+        # 注册第一个订阅者之前, 日志由写日志的线程直接放入缓存, 与 register 读取缓存并发
+        self._cache_lock = threading.Lock()
 
-    def register(self) -> Queue:
+    def register(self, log_filter: Callable[[dict], bool] = None) -> Queue:
         """注册新的订阅者, 并给每个订阅者返回一个带有日志缓存的队列
 
+        Args:
+            log_filter (Callable[[dict], bool]): 过滤函数, 只有返回 True 的日志才会放入队列。为空时订阅所有日志
+
         Returns:
             Queue: 订阅者的队列, 可用于接收日志消息
         """
+        self._loop = asyncio.get_running_loop()
         q = Queue(maxsize=CACHED_SIZE + 10)
-        for log in self.log_cache:
-            q.put_nowait(log)
+        with self._cache_lock:
+            cached = list(self.log_cache)
+        for log in cached:
+            if log_filter is None or log_filter(log):
+                q.put_nowait(log)
         self.subscribers.append(q)
+        self.dropped[q] = 0
+        if log_filter is not None:
+            self.filters[q] = log_filter
         return q
 
     def unregister(self, q: Queue):
@@ -108,20 +148,44 @@ class LogBroker:
             q (Queue): 需要取消订阅的队列
         """
         self.subscribers.remove(q)
+        self.filters.pop(q, None)
+        self.dropped.pop(q, None)
 
     def publish(self, log_entry: dict):
-        """发布新日志到所有订阅者, 使用非阻塞方式投递, 避免一个订阅者阻塞整个系统
+        """发布新日志到所有订阅者, 使用非阻塞方式投递, 避免一个订阅者阻塞整个系统。
+        可以在任意线程中调用, 不在事件循环线程中时, 转交给事件循环投递
 
         Args:
             log_entry (dict): 日志消息, 包含日志级别和日志内容.
                 example: {"level": "INFO", "data": "This is a log message.", "time": "2023-10-01 12:00:00"}
         """
-        self.log_cache.append(log_entry)
+        loop = self._loop
+        if loop is not None:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                try:
+                    loop.call_soon_threadsafe(self._publish, log_entry)
+                except RuntimeError:
+                    # 事件循环已关闭
+                    with self._cache_lock:
+                        self.log_cache.append(log_entry)
+                return
+        self._publish(log_entry)
+
+    def _publish(self, log_entry: dict):
+        with self._cache_lock:
+            self.log_cache.append(log_entry)
         for q in self.subscribers:
+            log_filter = self.filters.get(q)
+            if log_filter is not None and not log_filter(log_entry):
+                continue
             try:
                 q.put_nowait(log_entry)
             except asyncio.QueueFull:
-                pass
+                self.dropped[q] = self.dropped.get(q, 0) + 1
 
 
 class LogQueueHandler(logging.Handler):
@@ -147,6 +211,7 @@ class LogQueueHandler(logging.Handler):
                 "level": record.levelname,
                 "time": record.asctime,
                 "data": log_entry,
+                "plugin": get_plugin_name(record.pathname),
             }
         )
 
@@ -227,12 +292,15 @@ class LogManager:
         return logger
 
     @classmethod
-    def set_queue_handler(cls, logger: logging.Logger, log_broker: LogBroker):
+    def set_queue_handler(
+        cls, logger: logging.Logger, log_broker: LogBroker, use_listener: bool = False
+    ):
         """设置队列处理器, 用于将日志消息发送到 LogBroker
 
         Args:
             logger (logging.Logger): 日志记录器
             log_broker (LogBroker): 日志代理类, 用于缓存和分发日志消息
+            use_listener (bool): 是否在后台线程中格式化和输出日志, 参见 start_listener()
         """
         handler = LogQueueHandler(log_broker)
         handler.setLevel(logging.DEBUG)
@@ -246,3 +314,38 @@ class LogManager:
                 )
             )
         logger.addHandler(handler)
+        if use_listener:
+            cls.start_listener(logger)
+
+    @classmethod
+    def start_listener(
+        cls, logger: logging.Logger
+    ) -> Optional[logging.handlers.QueueListener]:
+        """将日志记录器现有的处理器移动到后台线程中
+
+        日志记录器只保留一个 QueueHandler, 调用方的线程中只会合并日志消息的参数, 格式化、写入控制台和分发给 LogBroker
+        的订阅者都在 QueueListener 的线程中进行。进程退出时会输出队列中剩余的日志。
+        """
+        handlers = [
+            h
+            for h in logger.handlers
+            if not isinstance(h, logging.handlers.QueueHandler)
+        ]
+        if not handlers:
+            return None
+        q = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(
+            q, *handlers, respect_handler_level=True
+        )
+        for h in handlers:
+            logger.removeHandler(h)
+        logger.addHandler(logging.handlers.QueueHandler(q))
+        listener.start()
+
+        def stop():
+            # 监听器可能已被手动停止
+            if listener._thread is not None:
+                listener.stop()
+
+        atexit.register(stop)
+        return listener
@@ -35,6 +35,7 @@ from pydantic.v1 import BaseModel
 from astrbot.core import astrbot_config, file_token_service, logger
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 from astrbot.core.utils.io import download_file, download_image_by_url, file_to_base64
+from astrbot.core.utils.media_cache import media_cache
 
 
 class ComponentType(Enum):
@@ -179,10 +180,7 @@ class Record(BaseMessageComponent):
         elif self.file and self.file.startswith("base64://"):
             bs64_data = self.file.removeprefix("base64://")
             image_bytes = base64.b64decode(bs64_data)
-            temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-            file_path = os.path.join(temp_dir, f"{uuid.uuid4()}.jpg")
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
+            file_path = await media_cache.put_bytes(image_bytes, private=True)
             return os.path.abspath(file_path)
         elif os.path.exists(self.file):
             file_path = self.file
@@ -474,10 +472,7 @@ class Image(BaseMessageComponent):
         elif url and url.startswith("base64://"):
             bs64_data = url.removeprefix("base64://")
             image_bytes = base64.b64decode(bs64_data)
-            temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-            image_file_path = os.path.join(temp_dir, f"{uuid.uuid4()}.jpg")
-            with open(image_file_path, "wb") as f:
-                f.write(image_bytes)
+            image_file_path = await media_cache.put_bytes(image_bytes, private=True)
             return os.path.abspath(image_file_path)
         elif os.path.exists(url):
             image_file_path = url
@@ -18,6 +18,10 @@ class ContentSafetyCheckStage(Stage):
         config = ctx.astrbot_config["content_safety"]
         self.strategy_selector = StrategySelector(config)
 
+    def is_enabled(self, platform_name: str | None) -> bool:
+        # 没有启用任何内容安全策略时, 不需要检查
+        return len(self.strategy_selector.enabled_strategies) > 0
+
     async def process(
         self, event: AstrMessageEvent, check_text: str = None
     ) -> Union[None, AsyncGenerator[None, None]]:
@@ -43,7 +43,10 @@ class PlatformCompatibilityStage(Stage):
                 if handler.handler_module_path in star_map:
                     plugin_name = star_map[handler.handler_module_path].name
                 logger.debug(
-                    f"[PlatformCompatibilityStage] 插件 {plugin_name} 在平台 {platform_id} 未启用，标记处理器 {handler.handler_name} 为平台不兼容"
+                    "[PlatformCompatibilityStage] 插件 %s 在平台 %s 未启用，标记处理器 %s 为平台不兼容",
+                    plugin_name,
+                    platform_id,
+                    handler.handler_name,
                 )
                 # 设置处理器为平台不兼容状态
                 # TODO: 更好的标记方式
@@ -18,6 +18,12 @@ class PreProcessStage(Stage):
         self.stt_settings: dict = self.config.get("provider_stt_settings", {})
         self.platform_settings: dict = self.config.get("platform_settings", {})
 
+    def is_enabled(self, platform_name: str | None) -> bool:
+        # 没有配置路径映射且没有启用语音转文本时, 不需要预处理
+        return bool(self.platform_settings.get("path_mapping", [])) or bool(
+            self.stt_settings.get("enable", False)
+        )
+
     async def process(
         self, event: AstrMessageEvent
     ) -> Union[None, AsyncGenerator[None, None]]:
@@ -37,7 +43,7 @@ class PreProcessStage(Stage):
                         url = component.url.removeprefix("file://")
                         if url.startswith(from_):
                             component.url = url.replace(from_, to_, 1)
-                            logger.debug(f"路径映射: {url} -> {component.url}")
+                            logger.debug("路径映射: %s -> %s", url, component.url)
                     message_chain[idx] = component
 
         # STT
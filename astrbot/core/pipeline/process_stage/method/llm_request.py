@@ -4,7 +4,10 @@
 
 import traceback
 import asyncio
+import copy
+import inspect
 import json
+import time
 from typing import Union, AsyncGenerator
 from ...context import PipelineContext
 from ..stage import Stage
@@ -17,6 +20,9 @@ from astrbot.core.message.message_event_result import (
 from astrbot.core.message.components import Image
 from astrbot.core import logger
 from astrbot.core.utils.metrics import Metric
+from astrbot.core.utils.tracing import tracer
+from astrbot.core.conversation_mgr import CachedConversation
+from astrbot.core.provider.token_budget import token_counter
 from astrbot.core.provider.entities import (
     ProviderRequest,
     LLMResponse,
@@ -33,7 +39,7 @@ from mcp.types import (
     TextResourceContents,
     BlobResourceContents,
 )
-from astrbot.core import web_chat_back_queue
+from astrbot.core import web_chat_broker
 
 
 class LLMRequestSubStage(Stage):
@@ -53,6 +59,15 @@ class LLMRequestSubStage(Stage):
         self.streaming_response = ctx.astrbot_config["provider_settings"][
             "streaming_response"
         ]  # bool
+        self.tool_call_max_concurrency = ctx.astrbot_config["provider_settings"].get(
+            "tool_call_max_concurrency", 4
+        )  # int
+        self.tool_call_timeout = ctx.astrbot_config["provider_settings"].get(
+            "tool_call_timeout", 60
+        )  # int, 0 为不限制
+        self.max_context_tokens = ctx.astrbot_config["provider_settings"].get(
+            "max_context_tokens", 0
+        )  # int, 0 为不限制
 
         for bwp in self.bot_wake_prefixs:
             if self.provider_wake_prefix.startswith(bwp):
@@ -83,7 +98,10 @@ class LLMRequestSubStage(Stage):
             )
 
             if req.conversation:
-                all_contexts = json.loads(req.conversation.history)
+                if isinstance(req.conversation, CachedConversation):
+                    all_contexts = req.conversation.get_history()
+                else:
+                    all_contexts = json.loads(req.conversation.history)
                 req.contexts = self._process_tool_message_pairs(
                     all_contexts, remove_tags=True
                 )
@@ -119,7 +137,7 @@ class LLMRequestSubStage(Stage):
                     event.unified_msg_origin, conversation_id
                 )
             req.conversation = conversation
-            req.contexts = json.loads(conversation.history)
+            req.contexts = conversation.get_history()
 
             event.set_extra("provider_request", req)
 
@@ -136,7 +154,9 @@ class LLMRequestSubStage(Stage):
         for handler in handlers:
             try:
                 logger.debug(
-                    f"hook(on_llm_request) -> {star_map[handler.handler_module_path].name} - {handler.handler_name}"
+                    "hook(on_llm_request) -> %s - %s",
+                    star_map[handler.handler_module_path].name,
+                    handler.handler_name,
                 )
                 await handler.handler(event, req)
             except BaseException:
@@ -172,6 +192,19 @@ class LLMRequestSubStage(Stage):
             if index is not None and index > 0:
                 req.contexts = req.contexts[index:]
 
+        # max context tokens
+        if self.max_context_tokens > 0:
+            # 为模型的输出预留 token
+            model_config = provider.provider_config.get("model_config", {})
+            budget = self.max_context_tokens - int(model_config.get("max_tokens") or 0)
+            meta = provider.meta()
+            await token_counter.load_tokenizer(meta.type, meta.model)
+            dropped = token_counter.fit(req, meta.type, meta.model, budget)
+            if dropped:
+                logger.debug(
+                    f"上下文 token 数超过限制，已丢弃最早的 {dropped} 条记录。"
+                )
+
         # session_id
         if not req.session_id:
             req.session_id = event.unified_msg_origin
@@ -181,12 +214,19 @@ class LLMRequestSubStage(Stage):
                 need_loop = True
                 while need_loop:
                     need_loop = False
-                    logger.debug(f"提供商请求 Payload: {req}")
+                    logger.debug("提供商请求 Payload: %s", req)
 
                     final_llm_response = None
 
                     if self.streaming_response:
                         stream = provider.text_chat_stream(**req.__dict__)
+                        if tracer.enabled:
+                            stream = tracer.trace_agen(
+                                stream,
+                                "llm_request",
+                                event.get_platform_name(),
+                                provider.meta().id,
+                            )
                         async for llm_response in stream:
                             if llm_response.is_chunk:
                                 if llm_response.result_chain:
@@ -198,9 +238,15 @@ class LLMRequestSubStage(Stage):
                             else:
                                 final_llm_response = llm_response
                     else:
-                        final_llm_response = await provider.text_chat(
-                            **req.__dict__
-                        )  # 请求 LLM
+                        llm_call = provider.text_chat(**req.__dict__)  # 请求 LLM
+                        if tracer.enabled:
+                            llm_call = tracer.timed(
+                                llm_call,
+                                "llm_request",
+                                event.get_platform_name(),
+                                provider.meta().id,
+                            )
+                        final_llm_response = await llm_call
 
                     if not final_llm_response:
                         raise Exception("LLM response is None.")
@@ -212,7 +258,9 @@ class LLMRequestSubStage(Stage):
                     for handler in handlers:
                         try:
                             logger.debug(
-                                f"hook(on_llm_response) -> {star_map[handler.handler_module_path].name} - {handler.handler_name}"
+                                "hook(on_llm_response) -> %s - %s",
+                                star_map[handler.handler_module_path].name,
+                                handler.handler_name,
                             )
                             await handler.handler(event, final_llm_response)
                         except BaseException:
@@ -295,11 +343,10 @@ class LLMRequestSubStage(Stage):
 
     async def _handle_webchat(self, event: AstrMessageEvent, req: ProviderRequest):
         """处理 WebChat 平台的特殊情况，包括第一次 LLM 对话时总结对话内容生成 title"""
-        conversation = await self.conv_manager.get_conversation(
+        messages = await self.conv_manager.get_conversation_history(
             event.unified_msg_origin, req.conversation.cid
         )
-        if conversation and not req.conversation.title:
-            messages = json.loads(conversation.history)
+        if messages is not None and not req.conversation.title:
             latest_pair = messages[-2:]
             if not latest_pair:
                 return
@@ -309,7 +356,7 @@ class LLMRequestSubStage(Stage):
             #     cleaned_text += (
             #         "\nAssistant: " + latest_pair[1].get("content", "").strip()
             #     )
-            logger.debug(f"WebChat 对话标题生成请求，清理后的文本: {cleaned_text}")
+            logger.debug("WebChat 对话标题生成请求，清理后的文本: %s", cleaned_text)
             llm_resp = await provider.text_chat(
                 system_prompt="You are expert in summarizing user's query.",
                 prompt=(
@@ -336,17 +383,19 @@ class LLMRequestSubStage(Stage):
                 if event.session_id:
                     username, cid = event.session_id.split("!")[1:3]
                     db_helper = self.ctx.plugin_manager.context._db
-                    db_helper.update_conversation_title(
+                    await db_helper.run(
+                        db_helper.update_conversation_title,
                         user_id=username,
                         cid=cid,
                         title=title,
                     )
-                    web_chat_back_queue.put_nowait(
+                    web_chat_broker.publish(
+                        username,
                         {
                             "type": "update_title",
                             "cid": cid,
                             "data": title,
-                        }
+                        },
                     )
 
     async def _handle_llm_response(
@@ -437,129 +486,144 @@ class LLMRequestSubStage(Stage):
     ) -> AsyncGenerator[Union[None, ProviderRequest], None]:
         """处理函数工具调用。
 
+        同一轮中的多个工具调用并发执行，最大并发数和单个工具的超时时间分别由 tool_call_max_concurrency 和 tool_call_timeout 配置。
+        插件中以异步生成器实现的工具函数可能在执行过程中向用户发送消息，这些消息需要经过消息管道，
+        因此这类工具会在其他工具执行完毕后逐个执行。调用结果始终按照 LLM 给出的工具调用顺序返回。
+        并发执行的工具各自使用事件的浅拷贝, 拥有独立的消息结果, 不会读取或清除其他工具设置的结果。
+
         Returns:
             AsyncGenerator[Union[None, ProviderRequest], None]: 如果返回 ProviderRequest，表示需要再次调用 LLM
         """
         # function calling
-        tool_call_result: list[ToolCallMessageSegment] = []
+        tool_calls = list(
+            zip(
+                llm_response.tools_call_name,
+                llm_response.tools_call_args,
+                llm_response.tools_call_ids,
+            )
+        )
         logger.info(
-            f"触发 {len(llm_response.tools_call_name)} 个函数调用: {llm_response.tools_call_name}"
+            f"触发 {len(tool_calls)} 个函数调用: {llm_response.tools_call_name}"
         )
-        for func_tool_name, func_tool_args, func_tool_id in zip(
-            llm_response.tools_call_name,
-            llm_response.tools_call_args,
-            llm_response.tools_call_ids,
-        ):
+        contents: list[list] = [[] for _ in tool_calls]
+        """每个工具调用返回给 LLM 的结果"""
+        messages: list[list] = [[] for _ in tool_calls]
+        """并发执行的工具调用设置的需要发送给用户的消息结果"""
+        concurrent, serial = [], []
+        for i, (func_tool_name, _, _) in enumerate(tool_calls):
+            func_tool = req.func_tool.get_func(func_tool_name)
+            if (
+                func_tool
+                and func_tool.origin != "mcp"
+                and inspect.isasyncgenfunction(func_tool.handler)
+            ):
+                serial.append(i)
+            else:
+                concurrent.append(i)
+
+        semaphore = asyncio.Semaphore(max(1, self.tool_call_max_concurrency))
+
+        async def collect(i: int):
+            func_tool_name, func_tool_args, _ = tool_calls[i]
+            call_event = copy.copy(event)
+            call_event.clear_result()
+            outputs = self._trace_tool(
+                event,
+                func_tool_name,
+                self._call_tool(call_event, req, func_tool_name, func_tool_args),
+            )
             try:
-                func_tool = req.func_tool.get_func(func_tool_name)
-                if func_tool.origin == "mcp":
-                    logger.info(
-                        f"从 MCP 服务 {func_tool.mcp_server_name} 调用工具函数：{func_tool.name}，参数：{func_tool_args}"
-                    )
-                    client = req.func_tool.mcp_client_dict[func_tool.mcp_server_name]
-                    res = await client.session.call_tool(func_tool.name, func_tool_args)
-                    if res:
-                        # TODO 仅对ImageContent | EmbeddedResource进行了简单的Fallback
-                        if isinstance(res.content[0], TextContent):
-                            tool_call_result.append(
-                                ToolCallMessageSegment(
-                                    role="tool",
-                                    tool_call_id=func_tool_id,
-                                    content=res.content[0].text,
-                                )
-                            )
-                        elif isinstance(res.content[0], ImageContent):
-                            tool_call_result.append(
-                                ToolCallMessageSegment(
-                                    role="tool",
-                                    tool_call_id=func_tool_id,
-                                    content="返回了图片(已直接发送给用户)",
-                                )
-                            )
-                            event.set_extra(
-                                "tool_call_img_respond",
-                                res.content[0].data,
-                            )
-                        elif isinstance(res.content[0], EmbeddedResource):
-                            resource = res.content[0].resource
-                            if isinstance(resource, TextResourceContents):
-                                tool_call_result.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content=resource.text,
-                                    )
-                                )
-                            elif (
-                                isinstance(resource, BlobResourceContents)
-                                and resource.mimeType
-                                and resource.mimeType.startswith("image/")
-                            ):
-                                tool_call_result.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content="返回了图片(已直接发送给用户)",
-                                    )
-                                )
-                                event.set_extra(
-                                    "tool_call_img_respond",
-                                    res.content[0].data,
-                                )
-                            else:
-                                tool_call_result.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content="返回的数据类型不受支持",
-                                    )
-                                )
-                else:
-                    # 获取处理器，过滤掉平台不兼容的处理器
-                    platform_id = event.get_platform_id()
-                    star_md = star_map.get(func_tool.handler_module_path)
-                    if (
-                        star_md
-                        and platform_id in star_md.supported_platforms
-                        and not star_md.supported_platforms[platform_id]
-                    ):
-                        logger.debug(
-                            f"处理器 {func_tool_name}({star_md.name}) 在当前平台不兼容或者被禁用，跳过执行"
-                        )
-                        # 直接跳过，不添加任何消息到tool_call_result
-                        continue
-
-                    logger.info(
-                        f"调用工具函数：{func_tool_name}，参数：{func_tool_args}"
-                    )
-                    # 尝试调用工具函数
-                    wrapper = self._call_handler(
-                        self.ctx, event, func_tool.handler, **func_tool_args
+                async for kind, value in outputs:
+                    if kind == "content":
+                        contents[i].append(value)
+                    else:
+                        messages[i].append(value)
+                        call_event.clear_result()
+            finally:
+                if call_event._has_send_oper:
+                    event._has_send_oper = True
+
+        async def run_concurrent(i: int):
+            func_tool_name = tool_calls[i][0]
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(collect(i), self.tool_call_timeout or None)
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        f"工具函数 {func_tool_name} 执行超时({self.tool_call_timeout} 秒)。"
                     )
-                    async for resp in wrapper:
-                        if resp is not None:  # 有 return 返回
-                            tool_call_result.append(
-                                ToolCallMessageSegment(
-                                    role="tool",
-                                    tool_call_id=func_tool_id,
-                                    content=resp,
-                                )
-                            )
-                        else:
-                            res = event.get_result()
-                            if res and res.chain:
-                                event.set_extra("tool_call_result", res)
-                            yield  # 有生成器返回
-                event.clear_result()  # 清除上一个 handler 的结果
-            except BaseException as e:
-                logger.warning(traceback.format_exc())
-                tool_call_result.append(
-                    ToolCallMessageSegment(
-                        role="tool",
-                        tool_call_id=func_tool_id,
-                        content=f"error: {str(e)}",
+                    contents[i].append(
+                        f"error: 工具调用超时({self.tool_call_timeout} 秒)"
                     )
+                except Exception as e:
+                    logger.warning(traceback.format_exc())
+                    contents[i].append(f"error: {str(e)}")
+                logger.info(
+                    f"工具函数 {func_tool_name} 执行完毕，耗时 {time.perf_counter() - start:.3f} 秒"
+                )
+
+        await asyncio.gather(*(run_concurrent(i) for i in concurrent))
+        for i in concurrent:
+            for res in messages[i]:
+                if res:
+                    event.set_result(res)
+                    if res.chain:
+                        event.set_extra("tool_call_result", res)
+                yield
+                event.clear_result()
+
+        for i in serial:
+            func_tool_name, func_tool_args, _ = tool_calls[i]
+            start = time.perf_counter()
+            # 只计算工具函数自身的执行时间, yield 之后等待下游发送消息的时间不计入超时
+            remaining = self.tool_call_timeout or None
+            outputs = self._trace_tool(
+                event,
+                func_tool_name,
+                self._call_tool(event, req, func_tool_name, func_tool_args),
+            )
+            try:
+                while True:
+                    step_start = time.monotonic()
+                    try:
+                        kind, value = await asyncio.wait_for(
+                            outputs.__anext__(), remaining
+                        )
+                    except StopAsyncIteration:
+                        break
+                    if remaining is not None:
+                        remaining = max(0, remaining - (time.monotonic() - step_start))
+                    if kind == "content":
+                        contents[i].append(value)
+                    else:
+                        if value and value.chain:
+                            event.set_extra("tool_call_result", value)
+                        yield  # 有生成器返回
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"工具函数 {func_tool_name} 执行超时({self.tool_call_timeout} 秒)。"
                 )
+                contents[i].append(f"error: 工具调用超时({self.tool_call_timeout} 秒)")
+            except Exception as e:
+                logger.warning(traceback.format_exc())
+                contents[i].append(f"error: {str(e)}")
+            finally:
+                await outputs.aclose()
+            event.clear_result()  # 清除上一个 handler 的结果
+            logger.info(
+                f"工具函数 {func_tool_name} 执行完毕，耗时 {time.perf_counter() - start:.3f} 秒"
+            )
+
+        tool_call_result: list[ToolCallMessageSegment] = [
+            ToolCallMessageSegment(
+                role="tool",
+                tool_call_id=func_tool_id,
+                content=content,
+            )
+            for (_, _, func_tool_id), results in zip(tool_calls, contents)
+            for content in results
+        ]
         if tool_call_result:
             # 函数调用结果
             req.func_tool = None  # 暂时不支持递归工具调用
@@ -578,6 +642,82 @@ class LLMRequestSubStage(Stage):
                     MessageEventResult().message(llm_response.completion_text)
                 )
 
+    def _trace_tool(
+        self, event: AstrMessageEvent, func_tool_name: str, outputs: AsyncGenerator
+    ) -> AsyncGenerator:
+        if tracer.enabled:
+            return tracer.trace_agen(
+                outputs, "tool_call", event.get_platform_name(), func_tool_name
+            )
+        return outputs
+
+    async def _call_tool(
+        self,
+        event: AstrMessageEvent,
+        req: ProviderRequest,
+        func_tool_name: str,
+        func_tool_args: dict,
+    ) -> AsyncGenerator[tuple, None]:
+        """执行一个工具调用。
+
+        Yields:
+            ("content", 内容): 返回给 LLM 的调用结果
+            ("message", MessageEventResult): 工具函数设置了需要发送给用户的消息结果
+        """
+        func_tool = req.func_tool.get_func(func_tool_name)
+        if func_tool.origin == "mcp":
+            logger.info(
+                f"从 MCP 服务 {func_tool.mcp_server_name} 调用工具函数：{func_tool.name}，参数：{func_tool_args}"
+            )
+            client = req.func_tool.mcp_client_dict[func_tool.mcp_server_name]
+            res = await client.session.call_tool(func_tool.name, func_tool_args)
+            if res:
+                # TODO 仅对ImageContent | EmbeddedResource进行了简单的Fallback
+                if isinstance(res.content[0], TextContent):
+                    yield "content", res.content[0].text
+                elif isinstance(res.content[0], ImageContent):
+                    event.set_extra("tool_call_img_respond", res.content[0].data)
+                    yield "content", "返回了图片(已直接发送给用户)"
+                elif isinstance(res.content[0], EmbeddedResource):
+                    resource = res.content[0].resource
+                    if isinstance(resource, TextResourceContents):
+                        yield "content", resource.text
+                    elif (
+                        isinstance(resource, BlobResourceContents)
+                        and resource.mimeType
+                        and resource.mimeType.startswith("image/")
+                    ):
+                        event.set_extra("tool_call_img_respond", res.content[0].data)
+                        yield "content", "返回了图片(已直接发送给用户)"
+                    else:
+                        yield "content", "返回的数据类型不受支持"
+            return
+
+        # 获取处理器，过滤掉平台不兼容的处理器
+        platform_id = event.get_platform_id()
+        star_md = star_map.get(func_tool.handler_module_path)
+        if (
+            star_md
+            and platform_id in star_md.supported_platforms
+            and not star_md.supported_platforms[platform_id]
+        ):
+            logger.debug(
+                f"处理器 {func_tool_name}({star_md.name}) 在当前平台不兼容或者被禁用，跳过执行"
+            )
+            # 直接跳过，不添加任何消息到tool_call_result
+            return
+
+        logger.info(f"调用工具函数：{func_tool_name}，参数：{func_tool_args}")
+        # 尝试调用工具函数
+        wrapper = self._call_handler(
+            self.ctx, event, func_tool.handler, **func_tool_args
+        )
+        async for resp in wrapper:
+            if resp is not None:  # 有 return 返回
+                yield "content", resp
+            else:
+                yield "message", event.get_result()
+
     async def _save_to_history(
         self, event: AstrMessageEvent, req: ProviderRequest, llm_response: LLMResponse
     ):
@@ -10,6 +10,7 @@ from astrbot.core.message.message_event_result import MessageEventResult
 from astrbot.core import logger
 from astrbot.core.star.star_handler import StarHandlerMetadata
 from astrbot.core.star.star import star_map
+from astrbot.core.utils.tracing import tracer
 import traceback
 
 
@@ -39,7 +40,7 @@ class StarRequestSubStage(Stage):
                 and handler.platform_compatible is False
             ):
                 logger.debug(
-                    f"处理器 {handler.handler_name} 在当前平台不兼容，跳过执行"
+                    "处理器 %s 在当前平台不兼容，跳过执行", handler.handler_name
                 )
                 continue
 
@@ -48,9 +49,18 @@ class StarRequestSubStage(Stage):
                 if handler.handler_module_path not in star_map:
                     continue
                 logger.debug(
-                    f"plugin -> {star_map.get(handler.handler_module_path).name} - {handler.handler_name}"
+                    "plugin -> %s - %s",
+                    star_map.get(handler.handler_module_path).name,
+                    handler.handler_name,
                 )
                 wrapper = self._call_handler(self.ctx, event, handler.handler, **params)
+                if tracer.enabled:
+                    wrapper = tracer.trace_agen(
+                        wrapper,
+                        "plugin_handler",
+                        event.get_platform_name(),
+                        handler.handler_full_name,
+                    )
                 async for ret in wrapper:
                     yield ret
                 event.clear_result()  # 清除上一个 handler 的结果
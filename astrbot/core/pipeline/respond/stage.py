@@ -219,7 +219,9 @@ class RespondStage(Stage):
         for handler in handlers:
             try:
                 logger.debug(
-                    f"hook(on_after_message_sent) -> {star_map[handler.handler_module_path].name} - {handler.handler_name}"
+                    "hook(on_after_message_sent) -> %s - %s",
+                    star_map[handler.handler_module_path].name,
+                    handler.handler_name,
                 )
                 await handler.handler(event)
             except BaseException:
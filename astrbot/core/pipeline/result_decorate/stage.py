@@ -102,7 +102,9 @@ class ResultDecorateStage(Stage):
         for handler in handlers:
             try:
                 logger.debug(
-                    f"hook(on_decorating_result) -> {star_map[handler.handler_module_path].name} - {handler.handler_name}"
+                    "hook(on_decorating_result) -> %s - %s",
+                    star_map[handler.handler_module_path].name,
+                    handler.handler_name,
                 )
                 if is_stream:
                     logger.warning(
@@ -111,7 +113,9 @@ class ResultDecorateStage(Stage):
                 await handler.handler(event)
                 if event.get_result() is None or not event.get_result().chain:
                     logger.debug(
-                        f"hook(on_decorating_result) -> {star_map[handler.handler_module_path].name} - {handler.handler_name} 将消息结果清空。"
+                        "hook(on_decorating_result) -> %s - %s 将消息结果清空。",
+                        star_map[handler.handler_module_path].name,
+                        handler.handler_name,
                     )
             except BaseException:
                 logger.error(traceback.format_exc())
@@ -207,7 +211,7 @@ class ResultDecorateStage(Stage):
                                     audio_path
                                 )
                                 url = f"{callback_api_base}/api/file/{token}"
-                                logger.debug(f"已注册：{url}")
+                                logger.debug("已注册：%s", url)
 
                             new_chain.append(
                                 Record(
@@ -257,7 +261,7 @@ class ResultDecorateStage(Stage):
                         ):
                             token = await file_token_service.register_file(url)
                             url = f"{self.ctx.astrbot_config['callback_api_base']}/api/file/{token}"
-                            logger.debug(f"已注册：{url}")
+                            logger.debug("已注册：%s", url)
                             result.chain = [Image.fromURL(url)]
                         else:
                             result.chain = [Image.fromFileSystem(url)]
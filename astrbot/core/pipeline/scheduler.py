@@ -1,68 +1,142 @@
+import inspect
 from . import STAGES_ORDER
-from .stage import registered_stages
+from .stage import Stage, registered_stages
 from .context import PipelineContext
-from typing import AsyncGenerator
+from typing import Dict, List, Tuple
 from astrbot.core.platform import AstrMessageEvent
 from astrbot.core import logger
+from astrbot.core.utils.tracing import tracer
+
+ExecutionPlan = List[Tuple[Stage, bool]]
+"""编译后的执行计划。每一项为 (阶段, 该阶段的 process 是否为异步生成器)"""
 
 
 class PipelineScheduler:
     """管道调度器，负责调度各个阶段的执行"""
 
-    def __init__(self, context: PipelineContext):
-        registered_stages.sort(
-            key=lambda x: STAGES_ORDER.index(x.__class__.__name__)
-        )  # 按照顺序排序
+    def __init__(self, context: PipelineContext, stages: List[Stage] = None):
+        if stages is None:
+            registered_stages.sort(
+                key=lambda x: STAGES_ORDER.index(x.__class__.__name__)
+            )  # 按照顺序排序
+            stages = registered_stages
+        self.stages = stages
         self.ctx = context  # 上下文对象
+        self._plans: Dict[str, ExecutionPlan] = {}
+        """按平台名缓存的执行计划"""
 
     async def initialize(self):
-        """初始化管道调度器时, 初始化所有阶段"""
-        for stage in registered_stages:
+        """初始化管道调度器时, 初始化所有阶段, 并编译执行计划"""
+        for stage in self.stages:
             # logger.debug(f"初始化阶段 {stage.__class__ .__name__}")
 
             await stage.initialize(self.ctx)
 
-    async def _process_stages(self, event: AstrMessageEvent, from_stage=0):
-        """依次执行各个阶段
+        self._plans.clear()
+        plan = self.get_plan(None)
+        logger.debug(
+            f"消息管道执行计划: {' -> '.join(s.__class__.__name__ for s, _ in plan)}"
+        )
+
+    def get_plan(self, platform_name: str | None) -> ExecutionPlan:
+        """获取指定平台的执行计划, 首次获取时编译并缓存。
+
+        编译时会移除在该平台上不产生作用的阶段, 并预先判断每个阶段是否为洋葱模型的阶段(异步生成器)。
+        """
+        plan = self._plans.get(platform_name)
+        if plan is None:
+            plan = [
+                (stage, inspect.isasyncgenfunction(stage.process))
+                for stage in self.stages
+                if stage.is_enabled(platform_name)
+            ]
+            self._plans[platform_name] = plan
+        return plan
+
+    async def _process_stages(self, event: AstrMessageEvent, plan: ExecutionPlan):
+        """依次执行执行计划中的各个阶段
+
+        使用显式的栈代替递归实现洋葱模型: 异步生成器阶段每 yield 一次, 就执行一遍其后的所有阶段, 然后再恢复该生成器执行后置处理。
 
         Args:
             event (AstrMessageEvent): 事件对象
-            from_stage (int): 从第几个阶段开始执行, 默认从0开始
+            plan (ExecutionPlan): 执行计划
         """
-        for i in range(from_stage, len(registered_stages)):
-            stage = registered_stages[i]  # 获取当前要执行的阶段
-            # logger.debug(f"执行阶段 {stage.__class__ .__name__}")
-            coroutine = stage.process(
-                event
-            )  # 调用阶段的process方法, 返回协程或者异步生成器
-
-            if isinstance(coroutine, AsyncGenerator):
-                # 如果返回的是异步生成器, 实现洋葱模型的核心
-                async for _ in coroutine:
-                    # 此处是前置处理完成后的暂停点(yield), 下面开始执行后续阶段
-                    if event.is_stopped():
-                        logger.debug(
-                            f"阶段 {stage.__class__.__name__} 已终止事件传播。"
+        stack = []  # 被挂起的洋葱模型阶段: (异步生成器, 在执行计划中的位置)
+        n = len(plan)
+        i = 0
+        traced = tracer.enabled
+        platform = event.get_platform_name()
+        while True:
+            while i < n:
+                stage, is_onion = plan[i]
+                # logger.debug(f"执行阶段 {stage.__class__ .__name__}")
+                if not is_onion:
+                    # 普通协程(不含 yield 的 async 函数), 等待它执行完成, 然后继续执行下一个阶段
+                    step = stage.process(event)
+                    if traced:
+                        step = tracer.timed(
+                            step, "pipeline_stage", platform, stage.__class__.__name__
                         )
-                        break
-
-                    # 递归调用, 处理所有后续阶段
-                    await self._process_stages(event, i + 1)
-
-                    # 此处是后续所有阶段处理完毕后返回的点, 执行后置处理
+                    await step
                     if event.is_stopped():
                         logger.debug(
-                            f"阶段 {stage.__class__.__name__} 已终止事件传播。"
+                            "阶段 %s 已终止事件传播。", stage.__class__.__name__
                         )
                         break
-            else:
-                # 如果返回的是普通协程(不含yield的async函数), 则不进入下一层(基线条件)
-                # 简单地等待它执行完成, 然后继续执行下一个阶段
-                await coroutine
+                    i += 1
+                    continue
 
+                # 异步生成器, 执行前置处理直到第一个暂停点(yield)
+                gen = stage.process(event)
+                step = gen.__anext__()
+                if traced:
+                    step = tracer.timed(
+                        step,
+                        "pipeline_stage",
+                        platform,
+                        f"{stage.__class__.__name__}:pre",
+                    )
+                try:
+                    await step
+                except StopAsyncIteration:
+                    i += 1
+                    continue
                 if event.is_stopped():
-                    logger.debug(f"阶段 {stage.__class__.__name__} 已终止事件传播。")
-                    break
+                    logger.debug("阶段 %s 已终止事件传播。", stage.__class__.__name__)
+                    await gen.aclose()
+                    i += 1
+                    continue
+                # 挂起该阶段, 开始处理所有后续阶段
+                stack.append((gen, i))
+                i += 1
+
+            if not stack:
+                return
+
+            # 后续所有阶段处理完毕, 回到最近一个被挂起的阶段, 执行后置处理
+            gen, i = stack.pop()
+            stage = plan[i][0]
+            i += 1
+            if event.is_stopped():
+                logger.debug("阶段 %s 已终止事件传播。", stage.__class__.__name__)
+                await gen.aclose()
+                continue
+            step = gen.__anext__()
+            if traced:
+                step = tracer.timed(
+                    step, "pipeline_stage", platform, f"{stage.__class__.__name__}:post"
+                )
+            try:
+                await step
+            except StopAsyncIteration:
+                continue
+            if event.is_stopped():
+                logger.debug("阶段 %s 已终止事件传播。", stage.__class__.__name__)
+                await gen.aclose()
+                continue
+            # 又一次 yield, 再次处理所有后续阶段
+            stack.append((gen, i - 1))
 
     async def execute(self, event: AstrMessageEvent):
         """执行 pipeline
@@ -70,7 +144,7 @@ class PipelineScheduler:
         Args:
             event (AstrMessageEvent): 事件对象
         """
-        await self._process_stages(event)
+        await self._process_stages(event, self.get_plan(event.get_platform_name()))
 
         # 如果没有发送操作, 则发送一个空消息, 以便于后续的处理
         if not event._has_send_oper and event.get_platform_name() == "webchat":
@@ -42,6 +42,16 @@ class Stage(abc.ABC):
         """
         raise NotImplementedError
 
+    def is_enabled(self, platform_name: str | None) -> bool:
+        """该阶段在指定平台的消息管道中是否会产生作用。在 initialize 之后、编译执行计划时调用
+
+        Args:
+            platform_name (str | None): 平台名。为 None 时表示默认执行计划
+        Returns:
+            bool: 返回 False 的阶段将不会被加入执行计划。默认为 True
+        """
+        return True
+
     async def _call_handler(
         self,
         ctx: PipelineContext,
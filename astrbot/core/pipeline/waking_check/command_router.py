@@ -0,0 +1,131 @@
+"""
+指令路由
+
+根据已注册的适配器消息事件 Handler 的过滤器预先构建索引, 对每条消息只挑选出可能通过过滤器的 Handler, 再执行它们完整的过滤器链:
+    - 指令(CommandFilter)和指令组(CommandGroupFilter): 按空白分词后存入前缀树, 消息只需分词一次, 沿前缀树查找即可得到匹配的指令
+    - 正则(RegexFilter): 合并为一个正则表达式, 没有任何正则匹配时直接跳过所有正则 Handler。
+      包含反向引用、命名分组或内联标志等无法安全合并的正则单独匹配
+    - 其他 Handler(例如只有消息类型过滤器): 总是作为候选
+
+索引只用于排除一定不会通过过滤器的 Handler, 是否通过仍然由过滤器本身判断。
+"""
+
+import re
+import warnings
+from typing import Dict, List, Pattern, Set, Tuple
+
+from astrbot.core.platform.astr_message_event import AstrMessageEvent
+from astrbot.core.star.filter.command import CommandFilter
+from astrbot.core.star.filter.command_group import CommandGroupFilter
+from astrbot.core.star.filter.regex import RegexFilter
+from astrbot.core.star.star_handler import StarHandlerMetadata
+
+_UNSAFE_REGEX = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?[aiLmsux-]+[:)]")
+"""合并后会改变含义或无法编译的正则: 数字反向引用、命名分组、内联标志"""
+
+
+class _TrieNode:
+    __slots__ = ("children", "prefix", "exact")
+
+    def __init__(self):
+        self.children: Dict[str, _TrieNode] = {}
+        self.prefix: List[int] = []
+        """指令: 消息以该节点对应的词序列开头时匹配"""
+        self.exact: List[int] = []
+        """指令组: 消息恰好为该节点对应的词序列时匹配"""
+
+    def insert(self, name: str) -> "_TrieNode":
+        node = self
+        for token in name.split():
+            node = node.children.setdefault(token, _TrieNode())
+        return node
+
+
+class CommandRouter:
+    def __init__(self, handlers: List[StarHandlerMetadata]):
+        """
+        Args:
+            handlers: 按优先级排序的适配器消息事件 Handler
+        """
+        self.handlers = handlers
+        self._trie = _TrieNode()
+        self._always: List[int] = []
+        self._regex: List[Tuple[int, Pattern]] = []
+        """无法合并的正则"""
+        self._combined_indices: List[int] = []
+        self._combined: Pattern = None
+
+        safe_regex: List[Tuple[int, str]] = []
+        for i, handler in enumerate(handlers):
+            if not handler.event_filters:
+                continue
+            gate = self._gate_of(handler)
+            if isinstance(gate, CommandFilter):
+                for candidate in [gate.command_name] + list(gate.alias):
+                    for parent in gate.parent_command_names:
+                        full = f"{parent} {candidate}" if parent else candidate
+                        self._trie.insert(full).prefix.append(i)
+            elif isinstance(gate, CommandGroupFilter):
+                for full in gate.get_complete_command_names():
+                    self._trie.insert(full).exact.append(i)
+            elif isinstance(gate, RegexFilter):
+                if _is_safe_regex(gate.regex_str):
+                    safe_regex.append((i, gate.regex_str))
+                else:
+                    self._regex.append((i, gate.regex))
+            else:
+                self._always.append(i)
+
+        if safe_regex:
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?:{regex})" for _, regex in safe_regex)
+                )
+                self._combined_indices = [i for i, _ in safe_regex]
+            except re.error:
+                self._regex.extend((i, re.compile(regex)) for i, regex in safe_regex)
+
+    @staticmethod
+    def _gate_of(handler: StarHandlerMetadata):
+        """选出 Handler 的过滤器中可以建立索引的一个。过滤器之间是与的关系, 因此任选一个作为必要条件即可"""
+        for f in handler.event_filters:
+            if isinstance(f, (CommandFilter, CommandGroupFilter, RegexFilter)):
+                return f
+        return None
+
+    def candidates(self, event: AstrMessageEvent) -> List[StarHandlerMetadata]:
+        """获取可能通过过滤器的 Handler, 保持原有的优先级顺序"""
+        message_str = event.get_message_str().strip()
+        matched: Set[int] = set(self._always)
+
+        if event.is_at_or_wake_command:
+            # 指令和指令组只在唤醒时生效
+            tokens = message_str.split()
+            node = self._trie
+            for depth, token in enumerate(tokens):
+                node = node.children.get(token)
+                if node is None:
+                    break
+                matched.update(node.prefix)
+                if depth == len(tokens) - 1:
+                    matched.update(node.exact)
+
+        if self._combined is not None and self._combined.match(message_str):
+            matched.update(self._combined_indices)
+        for i, regex in self._regex:
+            if regex.match(message_str):
+                matched.add(i)
+
+        return [self.handlers[i] for i in sorted(matched)]
+
+
+def _is_safe_regex(regex: str) -> bool:
+    if _UNSAFE_REGEX.search(regex):
+        return False
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            re.compile(f"(?:{regex})")
+    except (re.error, Warning):
+        return False
+    return True
@@ -8,6 +8,7 @@ from astrbot.core.message.components import At, AtAll, Reply
 from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star import star_map
 from astrbot.core.star.filter.permission import PermissionTypeFilter
+from .command_router import CommandRouter
 
 
 @register_stage
@@ -42,6 +43,19 @@ class WakingCheckStage(Stage):
         self.ignore_at_all = self.ctx.astrbot_config["platform_settings"].get(
             "ignore_at_all", False
         )
+        self._router: CommandRouter = None
+        self._router_key: tuple = None
+
+    def _get_router(self) -> CommandRouter:
+        """获取当前已激活的 Handler 的指令路由。Handler 列表变化(插件加载、卸载、启用、禁用)时重新构建"""
+        handlers = star_handlers_registry.get_handlers_by_event_type(
+            EventType.AdapterMessageEvent
+        )
+        key = tuple(map(id, handlers))
+        if key != self._router_key:
+            self._router = CommandRouter(handlers)
+            self._router_key = key
+        return self._router
 
     async def process(
         self, event: AstrMessageEvent
@@ -109,9 +123,7 @@ class WakingCheckStage(Stage):
         activated_handlers = []
         handlers_parsed_params = {}  # 注册了指令的 handler
 
-        for handler in star_handlers_registry.get_handlers_by_event_type(
-            EventType.AdapterMessageEvent
-        ):
+        for handler in self._get_router().candidates(event):
             # filter 需满足 AND 逻辑关系
             passed = True
             permission_not_pass = False
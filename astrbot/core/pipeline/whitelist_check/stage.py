@@ -26,6 +26,14 @@ class WhitelistCheckStage(Stage):
         ]
         self.wl_log = ctx.astrbot_config["platform_settings"]["id_whitelist_log"]
 
+    def is_enabled(self, platform_name: str | None) -> bool:
+        # 白名单检查未启用、白名单为空或 WebChat 时, 不需要检查
+        return (
+            self.enable_whitelist_check
+            and len(self.whitelist) > 0
+            and platform_name != "webchat"
+        )
+
     async def process(
         self, event: AstrMessageEvent
     ) -> Union[None, AsyncGenerator[None, None]]:
@@ -1,3 +1,4 @@
+import copy
 import time
 import asyncio
 import logging
@@ -18,6 +19,7 @@ from astrbot.api.message_components import *  # noqa: F403
 from astrbot.api import logger
 from .aiocqhttp_message_event import AiocqhttpMessageEvent
 from astrbot.core.platform.astr_message_event import MessageSesion
+from astrbot.core.utils.ttl_cache import TTLCache
 from ...register import register_platform_adapter
 from aiocqhttp.exceptions import ActionFailed
 
@@ -52,6 +54,14 @@ class AiocqhttpAdapter(Platform):
             ),  # 以防旧版本配置不存在
         )
 
+        # 缓存群成员昵称和被引用的消息, 避免每条消息都调用 get_stranger_info 和 get_msg
+        cache_ttl = platform_config.get("cache_ttl", 600)
+        self.nickname_cache = TTLCache(max_entries=4096, ttl=cache_ttl)
+        """QQ 号 -> 昵称"""
+        self.reply_cache = TTLCache(max_entries=1024, ttl=cache_ttl)
+        """消息 ID -> 不包含引用消息内容的 AstrBotMessage"""
+        self.caches = {"nickname": self.nickname_cache, "reply": self.reply_cache}
+
         @self.bot.on_request()
         async def request(event: Event):
             abm = await self.convert_message(event)
@@ -99,7 +109,7 @@ class AiocqhttpAdapter(Platform):
         await super().send_by_session(session, message_chain)
 
     async def convert_message(self, event: Event) -> AstrBotMessage:
-        logger.debug(f"[aiocqhttp] RawMessage {event}")
+        logger.debug("[aiocqhttp] RawMessage %s", event)
 
         if event["post_type"] == "message":
             abm = await self._convert_handle_message_event(event)
@@ -107,6 +117,8 @@ class AiocqhttpAdapter(Platform):
                 # 屏蔽 QQ 管家的消息
                 return
         elif event["post_type"] == "notice":
+            if event.get("notice_type") in ("group_recall", "friend_recall"):
+                self.reply_cache.pop(str(event["message_id"]))
             abm = await self._convert_handle_notice_event(event)
         elif event["post_type"] == "request":
             abm = await self._convert_handle_request_event(event)
@@ -187,6 +199,8 @@ class AiocqhttpAdapter(Platform):
         abm.sender = MessageMember(
             str(event.sender["user_id"]), event.sender["nickname"]
         )
+        if abm.sender.nickname:
+            self.nickname_cache.put(abm.sender.user_id, abm.sender.nickname)
         if event["message_type"] == "group":
             abm.type = MessageType.GROUP_MESSAGE
             abm.group_id = str(event.group_id)
@@ -269,17 +283,20 @@ class AiocqhttpAdapter(Platform):
                         abm.message.append(a)
                     else:
                         try:
-                            reply_event_data = await self.bot.call_action(
-                                action="get_msg",
-                                message_id=int(m["data"]["id"]),
-                            )
-                            abm_reply = await self._convert_handle_message_event(
-                                Event.from_payload(reply_event_data), get_reply=False
-                            )
+                            abm_reply = self.reply_cache.get(str(m["data"]["id"]))
+                            if abm_reply is None:
+                                reply_event_data = await self.bot.call_action(
+                                    action="get_msg",
+                                    message_id=int(m["data"]["id"]),
+                                )
+                                abm_reply = await self._convert_handle_message_event(
+                                    Event.from_payload(reply_event_data),
+                                    get_reply=False,
+                                )
 
                             reply_seg = Reply(
                                 id=abm_reply.message_id,
-                                chain=abm_reply.message,
+                                chain=list(abm_reply.message),
                                 sender_id=abm_reply.sender.user_id,
                                 sender_nickname=abm_reply.sender.nickname,
                                 time=abm_reply.timestamp,
@@ -302,12 +319,16 @@ class AiocqhttpAdapter(Platform):
                             abm.message.append(At(qq="all", name="全体成员"))
                             continue
 
-                        at_info = await self.bot.call_action(
-                            action="get_stranger_info",
-                            user_id=int(m["data"]["qq"]),
-                        )
-                        if at_info:
-                            nickname = at_info.get("nick", "")
+                        nickname = self.nickname_cache.get(str(m["data"]["qq"]))
+                        if nickname is None:
+                            at_info = await self.bot.call_action(
+                                action="get_stranger_info",
+                                user_id=int(m["data"]["qq"]),
+                            )
+                            if at_info:
+                                nickname = at_info.get("nick", "")
+                                self.nickname_cache.put(str(m["data"]["qq"]), nickname)
+                        if nickname is not None:
                             is_at_self = str(m["data"]["qq"]) in {abm.self_id, "all"}
 
                             abm.message.append(
@@ -338,6 +359,16 @@ class AiocqhttpAdapter(Platform):
         abm.message_str = message_str
         abm.raw_message = event
 
+        # 缓存不包含引用消息内容的版本, 之后这条消息被引用时直接使用
+        reply_form = abm
+        if get_reply:
+            reply_form = copy.copy(abm)
+            reply_form.message = [
+                Reply(id=comp.id) if isinstance(comp, Reply) else comp
+                for comp in abm.message
+            ]
+        self.reply_cache.put(abm.message_id, reply_form)
+
         return abm
 
     def run(self) -> Awaitable[Any]:
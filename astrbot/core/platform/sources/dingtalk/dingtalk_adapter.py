@@ -51,7 +51,7 @@ class DingtalkPlatformAdapter(Platform):
 
         class AstrCallbackClient(dingtalk_stream.ChatbotHandler):
             async def process(self_, message: dingtalk_stream.CallbackMessage):
-                logger.debug(f"dingtalk: {message.data}")
+                logger.debug("dingtalk: %s", message.data)
                 im = dingtalk_stream.ChatbotMessage.from_dict(message.data)
                 abm = await self.convert_msg(im)
                 await self.handle_msg(abm)
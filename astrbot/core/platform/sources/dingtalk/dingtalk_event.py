@@ -51,7 +51,7 @@ class DingtalkMessageEvent(AstrMessageEvent):
                         markdown_str,
                         self.message_obj.raw_message,
                     )
-                    logger.debug(f"send image: {ret}")
+                    logger.debug("send image: %s", ret)
 
                 except Exception as e:
                     logger.error(f"钉钉图片处理失败: {e}")
@@ -109,7 +109,7 @@ class DiscordPlatformAdapter(Platform):
 
         # 初始化回调函数
         async def on_received(message_data):
-            logger.debug(f"[Discord] 收到消息: {message_data}")
+            logger.debug("[Discord] 收到消息: %s", message_data)
             if self.client_self_id is None:
                 self.client_self_id = message_data.get("bot_id")
             abm = await self.convert_message(data=message_data)
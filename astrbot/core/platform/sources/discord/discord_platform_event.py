@@ -121,7 +121,7 @@ class DiscordPlatformEvent(AstrMessageEvent):
             elif isinstance(i, At):
                 content += f"<@{i.qq}>"
             elif isinstance(i, Image):
-                logger.debug(f"[Discord] 开始处理 Image 组件: {i}")
+                logger.debug("[Discord] 开始处理 Image 组件: %s", i)
                 try:
                     filename = getattr(i, "filename", None)
                     file_content = getattr(i, "file", None)
@@ -134,14 +134,14 @@ class DiscordPlatformEvent(AstrMessageEvent):
 
                     # 1. URL
                     if file_content.startswith("http"):
-                        logger.debug(f"[Discord] 处理 URL 图片: {file_content}")
+                        logger.debug("[Discord] 处理 URL 图片: %s", file_content)
                         embed = discord.Embed().set_image(url=file_content)
                         embeds.append(embed)
                         continue
 
                     # 2. File URI
                     elif file_content.startswith("file:///"):
-                        logger.debug(f"[Discord] 处理 File URI: {file_content}")
+                        logger.debug("[Discord] 处理 File URI: %s", file_content)
                         path = Path(file_content[8:])
                         if await asyncio.to_thread(path.exists):
                             file_bytes = await asyncio.to_thread(path.read_bytes)
@@ -228,7 +228,7 @@ class DiscordPlatformEvent(AstrMessageEvent):
                 if isinstance(i.view, discord.ui.View):
                     view = i.view
             else:
-                logger.debug(f"[Discord] 忽略了不支持的消息组件: {i.type}")
+                logger.debug("[Discord] 忽略了不支持的消息组件: %s", i.type)
 
         if len(content) > 2000:
             logger.warning("[Discord] 消息内容超过2000字符，将被截断。")
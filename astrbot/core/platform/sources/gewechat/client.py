@@ -243,7 +243,7 @@ class SimpleGewechatClient:
                 file_url = await self.multimedia_downloader.download_image(
                     self.appid, content
                 )
-                logger.debug(f"下载图片: {file_url}")
+                logger.debug("下载图片: %s", file_url)
                 file_path = await download_image_by_url(file_url)
                 abm.message.append(Image(file=file_path, url=file_path))
 
@@ -295,12 +295,12 @@ class SimpleGewechatClient:
                 logger.info(f"未实现的消息类型: {d['MsgType']}")
                 abm.raw_message = d
 
-        logger.debug(f"abm: {abm}")
+        logger.debug("abm: %s", abm)
         return abm
 
     async def _callback(self):
         data = await quart.request.json
-        logger.debug(f"收到 gewechat 回调: {data}")
+        logger.debug("收到 gewechat 回调: %s", data)
 
         if data.get("testMsg", None):
             return quart.jsonify({"r": "AstrBot ACK"})
@@ -555,7 +555,7 @@ class SimpleGewechatClient:
                 f"{self.base_url}/message/postText", headers=self.headers, json=payload
             ) as resp:
                 json_blob = await resp.json()
-                logger.debug(f"发送消息结果: {json_blob}")
+                logger.debug("发送消息结果: %s", json_blob)
 
     async def post_image(self, to_wxid, image_url: str):
         """发送图片消息"""
@@ -570,7 +570,7 @@ class SimpleGewechatClient:
                 f"{self.base_url}/message/postImage", headers=self.headers, json=payload
             ) as resp:
                 json_blob = await resp.json()
-                logger.debug(f"发送图片结果: {json_blob}")
+                logger.debug("发送图片结果: %s", json_blob)
 
     async def post_emoji(self, to_wxid, emoji_md5, emoji_size, cdnurl=""):
         """发送emoji消息"""
@@ -615,7 +615,7 @@ class SimpleGewechatClient:
                 f"{self.base_url}/message/postVideo", headers=self.headers, json=payload
             ) as resp:
                 json_blob = await resp.json()
-                logger.debug(f"发送视频结果: {json_blob}")
+                logger.debug("发送视频结果: %s", json_blob)
 
     async def forward_video(self, to_wxid, cnd_xml: str):
         """转发视频
@@ -636,7 +636,7 @@ class SimpleGewechatClient:
                 json=payload,
             ) as resp:
                 json_blob = await resp.json()
-                logger.debug(f"转发视频结果: {json_blob}")
+                logger.debug("转发视频结果: %s", json_blob)
 
     async def post_voice(self, to_wxid, voice_url: str, voice_duration: int):
         """发送语音信息
@@ -652,7 +652,7 @@ class SimpleGewechatClient:
             "voiceDuration": voice_duration,
         }
 
-        logger.debug(f"发送语音: {payload}")
+        logger.debug("发送语音: %s", payload)
 
         async with aiohttp.ClientSession() as session:
             async with session.post(
@@ -681,7 +681,7 @@ class SimpleGewechatClient:
                 f"{self.base_url}/message/postFile", headers=self.headers, json=payload
             ) as resp:
                 json_blob = await resp.json()
-                logger.debug(f"发送文件结果: {json_blob}")
+                logger.debug("发送文件结果: %s", json_blob)
 
     async def add_friend(self, v3: str, v4: str, content: str):
         """申请添加好友"""
@@ -87,7 +87,7 @@ class GewechatPlatformEvent(AstrMessageEvent):
                 # 为了安全，向 AstrBot 回调服务注册可被 gewechat 访问的文件，并获得文件 token
                 token = await client._register_file(img_path)
                 img_url = f"{client.file_server_url}/{token}"
-                logger.debug(f"gewe callback img url: {img_url}")
+                logger.debug("gewe callback img url: %s", img_url)
                 await client.post_image(to_wxid, img_url)
             elif isinstance(comp, Video):
                 if comp.cover != "":
@@ -171,7 +171,7 @@ class GewechatPlatformEvent(AstrMessageEvent):
                     duration = get_wav_duration(record_path)
                 token = await client._register_file(silk_path)
                 record_url = f"{client.file_server_url}/{token}"
-                logger.debug(f"gewe callback record url: {record_url}")
+                logger.debug("gewe callback record url: %s", record_url)
                 await client.post_voice(to_wxid, record_url, duration * 1000)
             elif isinstance(comp, File):
                 file_path = comp.file
@@ -188,14 +188,14 @@ class GewechatPlatformEvent(AstrMessageEvent):
 
                 token = await client._register_file(file_path)
                 file_url = f"{client.file_server_url}/{token}"
-                logger.debug(f"gewe callback file url: {file_url}")
+                logger.debug("gewe callback file url: %s", file_url)
                 await client.post_file(to_wxid, file_url, file_name)
             elif isinstance(comp, Emoji):
                 await client.post_emoji(to_wxid, comp.md5, comp.md5_len, comp.cdnurl)
             elif isinstance(comp, At):
                 pass
             else:
-                logger.debug(f"gewechat 忽略: {comp.type}")
+                logger.debug("gewechat 忽略: %s", comp.type)
 
     async def send(self, message: MessageChain):
         to_wxid = self.message_obj.raw_message.get("to_wxid", None)
@@ -200,7 +200,7 @@ class TelegramPlatformAdapter(Platform):
         )
 
     async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        logger.debug(f"Telegram message: {update.message}")
+        logger.debug("Telegram message: %s", update.message)
         abm = await self.convert_message(update, context)
         if abm:
             await self.handle_msg(abm)
@@ -92,7 +92,7 @@ class WebChatAdapter(Platform):
                 path = os.path.join(self.imgs_dir, payload["audio_url"])
                 abm.message.append(Record(file=path, path=path))
 
-        logger.debug(f"WebChatAdapter: {abm.message}")
+        logger.debug("WebChatAdapter: %s", abm.message)
 
         message_str = payload["message"]
         abm.timestamp = int(time.time())
@@ -1,11 +1,14 @@
 import os
+import json
 import uuid
 import base64
+from typing import List
 from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent, MessageChain
 from astrbot.api.message_components import Plain, Image, Record
 from astrbot.core.utils.io import download_image_by_url
-from astrbot.core import web_chat_back_queue
+from astrbot.core import web_chat_broker, db_helper
+from astrbot.core.webchat_broker import parse_session_id
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 
 imgs_dir = os.path.join(get_astrbot_data_path(), "webchat", "imgs")
@@ -16,27 +19,41 @@ class WebChatMessageEvent(AstrMessageEvent):
         super().__init__(message_str, message_obj, platform_meta, session_id)
         os.makedirs(imgs_dir, exist_ok=True)
 
+    @staticmethod
+    async def _persist(session_id: str, messages: List[str]):
+        """将机器人的回复追加到对话历史中"""
+        username, cid = parse_session_id(session_id)
+        await db_helper.run(
+            db_helper.append_conversation_messages,
+            username,
+            cid,
+            [json.dumps({"type": "bot", "message": message}) for message in messages],
+        )
+
     @staticmethod
     async def _send(message: MessageChain, session_id: str, streaming: bool = False):
+        username, cid = parse_session_id(session_id)
         if not message:
-            await web_chat_back_queue.put(
-                {"type": "end", "data": "", "streaming": False}
+            web_chat_broker.publish(
+                username, {"type": "end", "cid": cid, "data": "", "streaming": False}
             )
             return ""
 
-        cid = session_id.split("!")[-1]
         data = ""
+        sent = []
         for comp in message.chain:
             if isinstance(comp, Plain):
                 data = comp.text
-                await web_chat_back_queue.put(
+                web_chat_broker.publish(
+                    username,
                     {
                         "type": "plain",
                         "cid": cid,
                         "data": data,
                         "streaming": streaming,
-                    }
+                    },
                 )
+                sent.append(data)
             elif isinstance(comp, Image):
                 # save image to local
                 filename = str(uuid.uuid4()) + ".jpg"
@@ -58,14 +75,16 @@ class WebChatMessageEvent(AstrMessageEvent):
                         with open(comp.file, "rb") as f2:
                             f.write(f2.read())
                 data = f"[IMAGE]{filename}"
-                await web_chat_back_queue.put(
+                web_chat_broker.publish(
+                    username,
                     {
                         "type": "image",
                         "cid": cid,
                         "data": data,
                         "streaming": streaming,
-                    }
+                    },
                 )
+                sent.append(data)
             elif isinstance(comp, Record):
                 # save record to local
                 filename = str(uuid.uuid4()) + ".wav"
@@ -82,28 +101,35 @@ class WebChatMessageEvent(AstrMessageEvent):
                         with open(comp.file, "rb") as f2:
                             f.write(f2.read())
                 data = f"[RECORD]{filename}"
-                await web_chat_back_queue.put(
+                web_chat_broker.publish(
+                    username,
                     {
                         "type": "record",
                         "cid": cid,
                         "data": data,
                         "streaming": streaming,
-                    }
+                    },
                 )
+                sent.append(data)
             else:
-                logger.debug(f"webchat 忽略: {comp.type}")
+                logger.debug("webchat 忽略: %s", comp.type)
 
+        # 流式输出的片段在结束时整体保存
+        if sent and not streaming:
+            await WebChatMessageEvent._persist(session_id, sent)
         return data
 
     async def send(self, message: MessageChain):
         await WebChatMessageEvent._send(message, session_id=self.session_id)
-        await web_chat_back_queue.put(
+        username, cid = parse_session_id(self.session_id)
+        web_chat_broker.publish(
+            username,
             {
                 "type": "end",
                 "data": "",
                 "streaming": False,
-                "cid": self.session_id.split("!")[-1],
-            }
+                "cid": cid,
+            },
         )
         await super().send(message)
 
@@ -114,12 +140,16 @@ class WebChatMessageEvent(AstrMessageEvent):
                 chain, session_id=self.session_id, streaming=True
             )
 
-        await web_chat_back_queue.put(
+        username, cid = parse_session_id(self.session_id)
+        web_chat_broker.publish(
+            username,
             {
                 "type": "end",
                 "data": final_data,
                 "streaming": True,
-                "cid": self.session_id.split("!")[-1],
-            }
+                "cid": cid,
+            },
         )
+        if final_data:
+            await WebChatMessageEvent._persist(self.session_id, [final_data])
         await super().send_streaming(generator, use_fallback)
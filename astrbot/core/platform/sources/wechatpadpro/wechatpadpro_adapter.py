@@ -400,7 +400,7 @@ class WeChatPadProAdapter(Platform):
         """
         处理从 WebSocket 接收到的消息。
         """
-        logger.debug(f"收到 WebSocket 消息: {message}")
+        logger.debug("收到 WebSocket 消息: %s", message)
         try:
             message_data = json.loads(message)
             if (
@@ -705,7 +705,7 @@ class WeChatPadProAdapter(Platform):
                         oldest_key = next(iter(self.cached_texts))
                         self.cached_texts.pop(oldest_key)
 
-                    logger.debug(f"缓存文本消息，new_msg_id={new_msg_id}")
+                    logger.debug("缓存文本消息，new_msg_id=%s", new_msg_id)
                     self.cached_texts[str(new_msg_id)] = content
             except Exception as e:
                 logger.error(f"缓存文本消息失败: {e}")
@@ -736,7 +736,7 @@ class WeChatPadProAdapter(Platform):
                             oldest_key = next(iter(self.cached_images))
                             self.cached_images.pop(oldest_key)
 
-                        logger.debug(f"缓存图片消息，new_msg_id={new_msg_id}")
+                        logger.debug("缓存图片消息，new_msg_id=%s", new_msg_id)
                         self.cached_images[str(new_msg_id)] = image_bs64_data
                 except Exception as e:
                     logger.error(f"缓存图片消息失败: {e}")
@@ -154,14 +154,14 @@ class WeixinOfficialAccountPlatformAdapter(Platform):
                 else:
                     if msg.id in self.wexin_event_workers:
                         future = self.wexin_event_workers[msg.id]
-                        logger.debug(f"duplicate message id checked: {msg.id}")
+                        logger.debug("duplicate message id checked: %s", msg.id)
                     else:
                         future = asyncio.get_event_loop().create_future()
                         self.wexin_event_workers[msg.id] = future
                         await self.convert_message(msg, future)
                     # I love shield so much!
                     result = await asyncio.wait_for(asyncio.shield(future), 60)  # wait for 60s
-                    logger.debug(f"Got future result: {result}")
+                    logger.debug("Got future result: %s", result)
                     self.wexin_event_workers.pop(msg.id, None)
                     return result  # xml. see weixin_offacc_event.py
             except asyncio.TimeoutError:
@@ -4,8 +4,8 @@ import json
 from astrbot.core.utils.io import download_image_by_url
 from astrbot import logger
 from dataclasses import dataclass, field
-from typing import List, Dict, Type
-from .func_tool_manager import FuncCall
+from typing import List, Dict, Type, Union
+from .func_tool_manager import FuncCall, FuncToolSubset
 from openai.types.chat.chat_completion import ChatCompletion
 from openai.types.chat.chat_completion_message_tool_call import (
     ChatCompletionMessageToolCall,
@@ -97,8 +97,8 @@ class ProviderRequest:
     """会话 ID"""
     image_urls: List[str] = None
     """图片 URL 列表"""
-    func_tool: FuncCall = None
-    """可用的函数工具"""
+    func_tool: Union[FuncCall, FuncToolSubset] = None
+    """可用的函数工具。可以在 on_llm_request 钩子中设置为 FuncCall.select() 返回的子集, 只发送部分工具"""
     contexts: List = None
     """上下文。格式与 openai 的上下文格式一致：
     参考 https://platform.openai.com/docs/api-reference/chat/create#chat-create-messages
@@ -6,7 +6,7 @@ import asyncio
 import logging
 from datetime import timedelta
 
-from typing import Dict, List, Awaitable, Literal, Any
+from typing import Dict, List, Awaitable, Literal, Any, Callable, Iterable
 from dataclasses import dataclass
 from typing import Optional
 from contextlib import AsyncExitStack
@@ -197,17 +197,51 @@ class MCPClient:
 
 class FuncCall:
     def __init__(self) -> None:
-        self.func_list: List[FuncTool] = []
-        """内部加载的 func tools"""
+        self._func_list: List[FuncTool] = []
+        self._version = 0
+        """工具列表的版本号, 每次增删工具时递增"""
+        self._desc_cache: Dict[tuple, Any] = {}
+        """渲染好的工具描述。(风格, 选项, 工具子集) -> 工具描述"""
+        self._desc_cache_state: tuple = None
         self.mcp_client_dict: Dict[str, MCPClient] = {}
         """MCP 服务列表"""
         self.mcp_service_queue = asyncio.Queue()
         """用于外部控制 MCP 服务的启停"""
         self.mcp_client_event: Dict[str, asyncio.Event] = {}
 
+    @property
+    def func_list(self) -> List[FuncTool]:
+        """内部加载的 func tools"""
+        return self._func_list
+
+    @func_list.setter
+    def func_list(self, value: List[FuncTool]):
+        self._func_list = value
+        self._version += 1
+
     def empty(self) -> bool:
         return len(self.func_list) == 0
 
+    def select(self, names: Iterable[str]) -> "FuncToolSubset":
+        """获取只包含指定工具的子集, 可以在 on_llm_request 钩子中设置为 ProviderRequest.func_tool, 减少每次请求发送给模型的工具"""
+        return FuncToolSubset(self, names)
+
+    def _cached_desc(self, key: tuple, build: Callable[[List[FuncTool]], Any]):
+        """获取缓存的工具描述, 没有缓存时使用 build 从已经激活的工具渲染。
+
+        工具被增删(版本号变化)或者被激活、停用时缓存失效。
+        """
+        state = (self._version, tuple(f.active for f in self._func_list))
+        if state != self._desc_cache_state:
+            self._desc_cache.clear()
+            self._desc_cache_state = state
+        desc = self._desc_cache.get(key)
+        if desc is None:
+            desc = self._desc_cache[key] = build(
+                [f for f in self._func_list if f.active]
+            )
+        return desc
+
     def add_func(
         self,
         name: str,
@@ -241,6 +275,7 @@ class FuncCall:
             handler=handler,
         )
         self.func_list.append(_func)
+        self._version += 1
         logger.info(f"添加函数调用工具: {name}")
 
     def remove_func(self, name: str) -> None:
@@ -250,6 +285,7 @@ class FuncCall:
         for i, f in enumerate(self.func_list):
             if f.name == name:
                 self.func_list.pop(i)
+                self._version += 1
                 break
 
     def get_func(self, name) -> FuncTool:
@@ -395,6 +431,7 @@ class FuncCall:
                     mcp_client=mcp_client,
                 )
                 self.func_list.append(func_tool)
+            self._version += 1
 
             logger.info(f"已连接 MCP 服务 {name}, Tools: {tool_names}")
             return
@@ -427,134 +464,21 @@ class FuncCall:
 
     def get_func_desc_openai_style(self, omit_empty_parameter_field=False) -> list:
         """
-        获得 OpenAI API 风格的**已经激活**的工具描述
+        获得 OpenAI API 风格的**已经激活**的工具描述。结果会被缓存, 调用方不应修改其中的元素
         """
-        _l = []
-        # 处理所有工具（包括本地和MCP工具）
-        for f in self.func_list:
-            if not f.active:
-                continue
-            func_ = {
-                "type": "function",
-                "function": {
-                    "name": f.name,
-                    # "parameters": f.parameters,
-                    "description": f.description,
-                },
-            }
-            func_["function"]["parameters"] = f.parameters
-            if not f.parameters.get("properties") and omit_empty_parameter_field:
-                # 如果 properties 为空，并且 omit_empty_parameter_field 为 True，则删除 parameters 字段
-                del func_["function"]["parameters"]
-            _l.append(func_)
-        return _l
+        return _openai_style(self._cached_desc, omit_empty_parameter_field)
 
     def get_func_desc_anthropic_style(self) -> list:
         """
-        获得 Anthropic API 风格的**已经激活**的工具描述
+        获得 Anthropic API 风格的**已经激活**的工具描述。结果会被缓存, 调用方不应修改其中的元素
         """
-        tools = []
-        for f in self.func_list:
-            if not f.active:
-                continue
-
-            # Convert internal format to Anthropic style
-            tool = {
-                "name": f.name,
-                "description": f.description,
-                "input_schema": {
-                    "type": "object",
-                    "properties": f.parameters.get("properties", {}),
-                    # Keep the required field from the original parameters if it exists
-                    "required": f.parameters.get("required", []),
-                },
-            }
-            tools.append(tool)
-        return tools
+        return _anthropic_style(self._cached_desc)
 
     def get_func_desc_google_genai_style(self) -> dict:
         """
-        获得 Google GenAI API 风格的**已经激活**的工具描述
+        获得 Google GenAI API 风格的**已经激活**的工具描述。结果会被缓存, 调用方不应修改其中的元素
         """
-
-        # Gemini API 支持的数据类型和格式
-        supported_types = {
-            "string",
-            "number",
-            "integer",
-            "boolean",
-            "array",
-            "object",
-            "null",
-        }
-        supported_formats = {
-            "string": {"enum", "date-time"},
-            "integer": {"int32", "int64"},
-            "number": {"float", "double"},
-        }
-
-        def convert_schema(schema: dict) -> dict:
-            """转换 schema 为 Gemini API 格式"""
-
-            # 如果 schema 包含 anyOf，则只返回 anyOf 字段
-            if "anyOf" in schema:
-                return {"anyOf": [convert_schema(s) for s in schema["anyOf"]]}
-
-            result = {}
-
-            if "type" in schema and schema["type"] in supported_types:
-                result["type"] = schema["type"]
-                if "format" in schema and schema["format"] in supported_formats.get(
-                    result["type"], set()
-                ):
-                    result["format"] = schema["format"]
-            else:
-                # 暂时指定默认为null
-                result["type"] = "null"
-
-            support_fields = {
-                "title",
-                "description",
-                "enum",
-                "minimum",
-                "maximum",
-                "maxItems",
-                "minItems",
-                "nullable",
-                "required",
-            }
-            result.update({k: schema[k] for k in support_fields if k in schema})
-
-            if "properties" in schema:
-                properties = {}
-                for key, value in schema["properties"].items():
-                    prop_value = convert_schema(value)
-                    if "default" in prop_value:
-                        del prop_value["default"]
-                    properties[key] = prop_value
-
-                if properties:  # 只在有非空属性时添加
-                    result["properties"] = properties
-
-            if "items" in schema:
-                result["items"] = convert_schema(schema["items"])
-
-            return result
-
-        tools = [
-            {
-                "name": f.name,
-                "description": f.description,
-                **({"parameters": convert_schema(f.parameters)}),
-            }
-            for f in self.func_list
-            if f.active
-        ]
-
-        declarations = {}
-        if tools:
-            declarations["function_declarations"] = tools
-        return declarations
+        return _google_genai_style(self._cached_desc)
 
     async def func_call(self, question: str, session_id: str, provider) -> tuple:
         _l = []
@@ -634,3 +558,186 @@ class FuncCall:
         for name in self.mcp_client_dict.keys():
             await self._terminate_mcp_client(name)
             logger.debug(f"清理 MCP 客户端 {name} 资源")
+
+
+def _openai_style(cached_desc: Callable, omit_empty_parameter_field=False) -> list:
+    """渲染 OpenAI 风格的工具描述。cached_desc 为 FuncCall 或 FuncToolSubset 的 _cached_desc"""
+
+    def build(tools: List[FuncTool]) -> list:
+        _l = []
+        # 处理所有工具（包括本地和MCP工具）
+        for f in tools:
+            func_ = {
+                "type": "function",
+                "function": {
+                    "name": f.name,
+                    # "parameters": f.parameters,
+                    "description": f.description,
+                },
+            }
+            func_["function"]["parameters"] = f.parameters
+            if not f.parameters.get("properties") and omit_empty_parameter_field:
+                # 如果 properties 为空，并且 omit_empty_parameter_field 为 True，则删除 parameters 字段
+                del func_["function"]["parameters"]
+            _l.append(func_)
+        return _l
+
+    return list(cached_desc(("openai", bool(omit_empty_parameter_field)), build))
+
+
+def _anthropic_style(cached_desc: Callable) -> list:
+    """渲染 Anthropic 风格的工具描述"""
+
+    def build(tools: List[FuncTool]) -> list:
+        # Convert internal format to Anthropic style
+        return [
+            {
+                "name": f.name,
+                "description": f.description,
+                "input_schema": {
+                    "type": "object",
+                    "properties": f.parameters.get("properties", {}),
+                    # Keep the required field from the original parameters if it exists
+                    "required": f.parameters.get("required", []),
+                },
+            }
+            for f in tools
+        ]
+
+    return list(cached_desc(("anthropic",), build))
+
+
+def _google_genai_style(cached_desc: Callable) -> dict:
+    """渲染 Google GenAI 风格的工具描述"""
+
+    # Gemini API 支持的数据类型和格式
+    supported_types = {
+        "string",
+        "number",
+        "integer",
+        "boolean",
+        "array",
+        "object",
+        "null",
+    }
+    supported_formats = {
+        "string": {"enum", "date-time"},
+        "integer": {"int32", "int64"},
+        "number": {"float", "double"},
+    }
+
+    def convert_schema(schema: dict) -> dict:
+        """转换 schema 为 Gemini API 格式"""
+
+        # 如果 schema 包含 anyOf，则只返回 anyOf 字段
+        if "anyOf" in schema:
+            return {"anyOf": [convert_schema(s) for s in schema["anyOf"]]}
+
+        result = {}
+
+        if "type" in schema and schema["type"] in supported_types:
+            result["type"] = schema["type"]
+            if "format" in schema and schema["format"] in supported_formats.get(
+                result["type"], set()
+            ):
+                result["format"] = schema["format"]
+        else:
+            # 暂时指定默认为null
+            result["type"] = "null"
+
+        support_fields = {
+            "title",
+            "description",
+            "enum",
+            "minimum",
+            "maximum",
+            "maxItems",
+            "minItems",
+            "nullable",
+            "required",
+        }
+        result.update({k: schema[k] for k in support_fields if k in schema})
+
+        if "properties" in schema:
+            properties = {}
+            for key, value in schema["properties"].items():
+                prop_value = convert_schema(value)
+                if "default" in prop_value:
+                    del prop_value["default"]
+                properties[key] = prop_value
+
+            if properties:  # 只在有非空属性时添加
+                result["properties"] = properties
+
+        if "items" in schema:
+            result["items"] = convert_schema(schema["items"])
+
+        return result
+
+    def build(tools: List[FuncTool]) -> list:
+        return [
+            {
+                "name": f.name,
+                "description": f.description,
+                **({"parameters": convert_schema(f.parameters)}),
+            }
+            for f in tools
+        ]
+
+    tools = cached_desc(("google_genai",), build)
+
+    declarations = {}
+    if tools:
+        declarations["function_declarations"] = list(tools)
+    return declarations
+
+
+class FuncToolSubset:
+    """FuncCall 的只读子集视图, 只包含指定名称的工具。
+
+    可以在 on_llm_request 钩子中设置为 ProviderRequest.func_tool, 只向模型发送与本次请求相关的工具。
+    提供管道和提供商用到的只读接口, 不能增删工具或管理 MCP 服务, 这些操作应在原 FuncCall 上进行。
+    工具描述缓存在原 FuncCall 中, 相同的子集在之后的请求中不需要重新渲染。
+    """
+
+    def __init__(self, parent: FuncCall, names: Iterable[str]) -> None:
+        self.parent = parent
+        self.names = frozenset(names)
+
+    @property
+    def func_list(self) -> List[FuncTool]:
+        """子集中的工具。每次调用返回新的列表, 修改它不会影响原 FuncCall"""
+        return [f for f in self.parent.func_list if f.name in self.names]
+
+    @property
+    def mcp_client_dict(self) -> Dict[str, MCPClient]:
+        return self.parent.mcp_client_dict
+
+    def empty(self) -> bool:
+        return len(self.func_list) == 0
+
+    def get_func(self, name) -> FuncTool:
+        if name not in self.names:
+            return None
+        return self.parent.get_func(name)
+
+    def select(self, names: Iterable[str]) -> "FuncToolSubset":
+        return FuncToolSubset(self.parent, self.names.intersection(names))
+
+    def _cached_desc(self, key: tuple, build: Callable[[List[FuncTool]], Any]):
+        return self.parent._cached_desc(
+            key + (self.names,),
+            lambda tools: build([f for f in tools if f.name in self.names]),
+        )
+
+    def get_func_desc_openai_style(self, omit_empty_parameter_field=False) -> list:
+        return _openai_style(self._cached_desc, omit_empty_parameter_field)
+
+    def get_func_desc_anthropic_style(self) -> list:
+        return _anthropic_style(self._cached_desc)
+
+    def get_func_desc_google_genai_style(self) -> dict:
+        return _google_genai_style(self._cached_desc)
+
+    def __repr__(self):
+        return str(self.func_list)
@@ -0,0 +1,219 @@
+"""
+提供商 API Key 池
+
+每个 Key 持有一个独立的客户端(及其 HTTP 连接池), 并发的请求各自租用一个 Key, 不会再互相修改同一个客户端的 api_key。
+
+选择 Key 时:
+    - 跳过处于冷却中的 Key。Key 被限流(429)后进入冷却, 冷却时长优先使用响应头中的 Retry-After, 否则按连续限流次数指数退避;
+      鉴权失败(401/403)的 Key 会冷却更长时间
+    - 配置了每个 Key 的每分钟请求数(key_rpm)时, 按令牌桶限速, 跳过令牌不足的 Key
+    - 在剩下的 Key 中选择当前并发请求数最少的, 并发数相同时选择最久未使用的
+    - 没有可用的 Key 时等待最早可用的 Key
+
+每个 Key 的请求数、成功/失败/限流次数和平均耗时可以通过 stats() 获取, 在 /api/stat/provider-keys 中展示。
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+from astrbot.core import logger
+
+RATE_LIMIT_BASE_COOLDOWN = 5
+"""没有 Retry-After 时, 第一次限流的冷却秒数, 之后每次连续限流翻倍"""
+RATE_LIMIT_MAX_COOLDOWN = 300
+AUTH_ERROR_COOLDOWN = 600
+"""鉴权失败的 Key 的冷却秒数"""
+
+
+def get_status_code(e: Exception) -> Optional[int]:
+    """从各个 SDK 的异常中获取 HTTP 状态码"""
+    for attr in ("status_code", "code", "status"):
+        code = getattr(e, attr, None)
+        if isinstance(code, int):
+            return code
+    if "429" in str(e):
+        return 429
+    return None
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    """从异常携带的响应头中获取 Retry-After 秒数"""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if ms := headers.get("retry-after-ms"):
+            return float(ms) / 1000
+        if seconds := headers.get("retry-after"):
+            return float(seconds)
+    except (TypeError, ValueError):
+        # Retry-After 也可能是 HTTP 日期格式, 此时使用默认的退避时间
+        pass
+    return None
+
+
+class ApiKey:
+    """一个 API Key 及其客户端和统计信息"""
+
+    def __init__(self, key: str, client: Any, rpm: int = 0):
+        self.key = key
+        self.client = client
+        self.rpm = rpm
+        self.tokens = float(rpm)
+        self._refilled_at = time.monotonic()
+
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.total_latency = 0.0
+        self.last_used = 0.0
+        self.last_error = ""
+        self.cooldown_until = 0.0
+        self._consecutive_rate_limits = 0
+
+    def _refill(self, now: float):
+        if self.rpm:
+            self.tokens = min(
+                self.rpm, self.tokens + (now - self._refilled_at) * self.rpm / 60
+            )
+            self._refilled_at = now
+
+    def available_in(self, now: float) -> float:
+        """距离该 Key 可用还需要等待的秒数"""
+        wait = max(0.0, self.cooldown_until - now)
+        if self.rpm:
+            self._refill(now)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) * 60 / self.rpm)
+        return wait
+
+    def masked(self) -> str:
+        if not self.key:
+            return ""
+        return self.key[:8] + "..." if len(self.key) > 12 else self.key[:3] + "..."
+
+    def stats(self, now: float) -> dict:
+        return {
+            "key": self.masked(),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "avg_latency": self.total_latency / self.successes
+            if self.successes
+            else 0.0,
+            "cooldown": max(0.0, self.cooldown_until - now),
+            "last_error": self.last_error,
+        }
+
+
+class ApiKeyPool:
+    def __init__(
+        self, keys: Iterable[str], client_factory: Callable[[str], Any], rpm: int = 0
+    ):
+        """
+        Args:
+            keys: API Key 列表。为空时使用一个值为 None 的 Key
+            client_factory: 根据 Key 创建客户端的函数
+            rpm: 每个 Key 每分钟的最大请求数, 0 为不限制
+        """
+        keys = list(dict.fromkeys(keys)) or [None]
+        self.keys: List[ApiKey] = [ApiKey(k, client_factory(k), rpm) for k in keys]
+        self._by_key: Dict[str, ApiKey] = {k.key: k for k in self.keys}
+
+    def get(self, key: str) -> Optional[ApiKey]:
+        return self._by_key.get(key)
+
+    def _pick(self, candidates: List[ApiKey], now: float) -> ApiKey | float:
+        """选择一个可用的 Key, 没有可用的 Key 时返回需要等待的秒数"""
+        best, wait = None, None
+        for k in candidates:
+            w = k.available_in(now)
+            if w > 0:
+                wait = w if wait is None else min(wait, w)
+                continue
+            if best is None or (k.in_flight, k.last_used) < (
+                best.in_flight,
+                best.last_used,
+            ):
+                best = k
+        return best if best is not None else wait
+
+    async def acquire(self, exclude: Iterable[str] = ()) -> ApiKey:
+        """租用一个 Key。使用完毕后必须调用 release()
+
+        Args:
+            exclude: 本次请求中不使用的 Key(例如已经失败过的 Key)
+
+        Raises:
+            LookupError: 所有的 Key 都被排除
+        """
+        exclude = set(exclude)
+        candidates = [k for k in self.keys if k.key not in exclude]
+        if not candidates:
+            raise LookupError("没有可用的 API Key")
+        while True:
+            now = time.monotonic()
+            picked = self._pick(candidates, now)
+            if isinstance(picked, ApiKey):
+                break
+            logger.debug("所有 API Key 均在冷却或限速中, 等待 %.1f 秒", picked)
+            await asyncio.sleep(picked)
+        if picked.rpm:
+            picked.tokens -= 1
+        picked.in_flight += 1
+        picked.requests += 1
+        picked.last_used = now
+        return picked
+
+    def release(self, key: ApiKey, latency: float, error: Exception = None):
+        """归还 Key, 并记录本次请求的结果"""
+        key.in_flight -= 1
+        if error is None:
+            key.successes += 1
+            key.total_latency += latency
+            key._consecutive_rate_limits = 0
+            return
+        key.failures += 1
+        key.last_error = str(error)[:200]
+        code = get_status_code(error)
+        if code == 429:
+            key.rate_limited += 1
+            key._consecutive_rate_limits += 1
+            cooldown = get_retry_after(error)
+            if cooldown is None:
+                cooldown = min(
+                    RATE_LIMIT_BASE_COOLDOWN * 2 ** (key._consecutive_rate_limits - 1),
+                    RATE_LIMIT_MAX_COOLDOWN,
+                )
+            self.cooldown(key, cooldown)
+        elif code in (401, 403):
+            self.cooldown(key, AUTH_ERROR_COOLDOWN)
+
+    def cooldown(self, key: ApiKey, seconds: float):
+        key.cooldown_until = max(key.cooldown_until, time.monotonic() + seconds)
+        logger.warning(f"API Key {key.masked()} 进入冷却, {seconds:.1f} 秒后重新启用。")
+
+    @asynccontextmanager
+    async def lease(self, exclude: Iterable[str] = ()) -> AsyncIterator[ApiKey]:
+        """租用一个 Key, 退出时自动归还并记录结果和耗时"""
+        key = await self.acquire(exclude)
+        start = time.perf_counter()
+        try:
+            yield key
+        except Exception as e:
+            self.release(key, time.perf_counter() - start, e)
+            raise
+        except BaseException:
+            # 被取消, 不计入统计
+            key.in_flight -= 1
+            raise
+        self.release(key, time.perf_counter() - start)
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        return [k.stats(now) for k in self.keys]
@@ -6,6 +6,12 @@ from .entities import ProviderType
 from typing import List
 from astrbot.core.db import BaseDatabase
 from .register import provider_cls_map, llm_tools
+from .response_cache import (
+    ResponseCache,
+    install_chat_cache,
+    supports_chat_cache,
+    install_embedding_cache,
+)
 from astrbot.core import logger, sp
 
 
@@ -105,6 +111,12 @@ class ProviderManager:
         """默认的 Text To Speech Provider 实例"""
         self.db_helper = db_helper
 
+        self.cache_settings: dict = config.get("provider_cache_settings", {})
+        self.response_cache: ResponseCache = None
+        """提供商响应缓存, 未启用时为 None"""
+        if self.cache_settings.get("enable", False):
+            self.response_cache = ResponseCache.from_config(self.cache_settings)
+
         # kdb(experimental)
         self.curr_kdb_name = ""
         kdb_cfg = config.get("knowledge_db", {})
@@ -334,6 +346,9 @@ class ProviderManager:
                 if getattr(inst, "initialize", None):
                     await inst.initialize()
 
+                if self.response_cache and supports_chat_cache(provider_config):
+                    install_chat_cache(inst, self.response_cache)
+
                 self.provider_insts.append(inst)
                 if (
                     self.provider_settings.get("default_provider_id")
@@ -352,6 +367,8 @@ class ProviderManager:
                 )
                 if getattr(inst, "initialize", None):
                     await inst.initialize()
+                if self.response_cache and self.cache_settings.get("embedding", True):
+                    install_embedding_cache(inst, self.response_cache)
                 self.embedding_provider_insts.append(inst)
 
             self.inst_map[provider_config["id"]] = inst
@@ -201,3 +201,7 @@ class EmbeddingProvider(AbstractProvider):
     def get_dim(self) -> int:
         """获取向量的维度"""
         ...
+
+    def get_batch_size(self) -> int:
+        """获取 get_embeddings 单次请求的最大文本数"""
+        return int(self.provider_config.get("embedding_batch_size", 16))
@@ -0,0 +1,388 @@
+"""
+提供商响应缓存
+
+为 Provider.text_chat 和 EmbeddingProvider.get_embedding(s) 提供可选的缓存。缓存键为 (提供商 ID, 模型, 上下文, 工具, 参数等) 的稳定哈希,
+相同的请求在有效期内直接返回缓存的结果, 不再请求提供商。
+
+缓存分为两级:
+    - 内存: 有大小上限的 LRU
+    - 磁盘(可选): SQLite 数据库, 重启后仍然有效。内存未命中时查询磁盘, 命中后放回内存
+
+只缓存成功的纯文本或工具调用响应。流式请求(text_chat_stream)不经过缓存。
+对话缓存只用于输出只取决于请求参数的提供商(见 CACHEABLE_CHAT_PROVIDERS)。Dify 等在服务端保存会话状态的提供商不缓存,
+否则不同会话的相同请求会得到同一个回复, 服务端的会话也不会推进。默认只缓存 temperature 为 0 的请求。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import astrbot.core.message.components as Comp
+from astrbot.core import logger
+from astrbot.core.message.message_event_result import MessageChain
+from astrbot.core.utils.astrbot_path import get_astrbot_data_path
+from .entities import LLMResponse
+
+
+CACHEABLE_CHAT_PROVIDERS = {
+    "openai_chat_completion",
+    "googlegenai_chat_completion",
+    "anthropic_chat_completion",
+    "zhipu_chat_completion",
+}
+"""无状态的对话提供商类型, 输出只取决于请求参数"""
+
+
+CACHE_KEY_KWARGS = (
+    "model",
+    "temperature",
+    "top_p",
+    "top_k",
+    "max_tokens",
+    "stop",
+    "seed",
+)
+"""text_chat 的额外参数中会影响输出的参数, 只有这些参数参与计算缓存键。
+管道传入的其他参数(例如 conversation)是会话状态, 每个会话、每轮对话都不同, 不能参与计算"""
+
+
+def supports_chat_cache(provider_config: dict) -> bool:
+    """提供商是否可以使用对话缓存"""
+    return provider_config.get("type") in CACHEABLE_CHAT_PROVIDERS
+
+
+def make_key(*parts: Any) -> str:
+    """计算参数的稳定哈希。字典按键排序, 无法序列化的对象使用 str()"""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class _DiskCache:
+    """SQLite 磁盘缓存。所有方法都是同步的, 由 ResponseCache 在线程池中调用"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache(
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache(accessed_at)"
+        )
+        self.conn.commit()
+        self.prune()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO response_cache(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at
+                """,
+                (key, json.dumps(value, ensure_ascii=False), expires_at, time.time()),
+            )
+            self.conn.commit()
+            self._puts += 1
+        if self._puts % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """删除过期的条目, 以及超出数量上限的最久未访问的条目"""
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM response_cache WHERE expires_at < ?", (time.time(),)
+            )
+            self.conn.execute(
+                """
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM response_cache")
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_entries: int = 1000,
+        disk_path: str = None,
+        disk_max_entries: int = 100000,
+        deterministic_only: bool = True,
+    ):
+        """
+        Args:
+            ttl: 缓存有效期, 单位为秒
+            max_entries: 内存中最多缓存的条目数
+            disk_path: 磁盘缓存的 SQLite 数据库路径, 为 None 时不使用磁盘缓存
+            disk_max_entries: 磁盘中最多缓存的条目数
+            deterministic_only: 是否只缓存 temperature 为 0 的对话请求
+        """
+        self.ttl = ttl
+        self.deterministic_only = deterministic_only
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        """key -> (过期时间, 值)"""
+        self.disk = _DiskCache(disk_path, disk_max_entries) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] >= time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._memory[key]
+        if self.disk is not None:
+            try:
+                entry = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.warning(f"读取响应缓存失败: {e!s}")
+                entry = None
+            if entry is not None:
+                value, expires_at = entry
+                self._put_memory(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: Any):
+        """写入缓存。值需要能够被 JSON 序列化"""
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, value, expires_at)
+            except Exception as e:
+                logger.warning(f"写入响应缓存失败: {e!s}")
+
+    def _put_memory(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def clear(self):
+        self._memory.clear()
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.clear)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "ResponseCache":
+        disk_path = None
+        if cfg.get("disk_cache", True):
+            disk_path = os.path.join(get_astrbot_data_path(), "provider_cache.db")
+        return cls(
+            ttl=cfg.get("ttl", 3600),
+            max_entries=cfg.get("max_entries", 1000),
+            disk_path=disk_path,
+            deterministic_only=cfg.get("deterministic_only", True),
+        )
+
+
+def _dump_response(resp: LLMResponse) -> Optional[dict]:
+    """将 LLMResponse 转换为可缓存的字典。包含非文本内容(如图片)或出错的响应返回 None"""
+    if resp is None or resp.role == "err" or resp.is_chunk:
+        return None
+    if resp.result_chain and any(
+        not isinstance(comp, Comp.Plain) for comp in resp.result_chain.chain
+    ):
+        return None
+    return {
+        "role": resp.role,
+        "completion_text": resp.completion_text,
+        "tools_call_args": resp.tools_call_args,
+        "tools_call_name": resp.tools_call_name,
+        "tools_call_ids": resp.tools_call_ids,
+    }
+
+
+def _load_response(data: dict) -> LLMResponse:
+    resp = LLMResponse(
+        data["role"],
+        tools_call_args=data["tools_call_args"],
+        tools_call_name=data["tools_call_name"],
+        tools_call_ids=data["tools_call_ids"],
+    )
+    if data["completion_text"]:
+        resp.result_chain = MessageChain().message(data["completion_text"])
+    return resp
+
+
+def install_chat_cache(provider, cache: ResponseCache):
+    """为提供商实例的 text_chat 添加缓存。只应用于无状态的提供商, 参见 supports_chat_cache()"""
+    text_chat = provider.text_chat
+
+    async def cached_text_chat(
+        prompt: str = None,
+        session_id: str = None,
+        image_urls: List[str] = None,
+        func_tool=None,
+        contexts: List = None,
+        system_prompt: str = None,
+        tool_calls_result=None,
+        **kwargs,
+    ) -> LLMResponse:
+        model_config = provider.provider_config.get("model_config", {})
+        temperature = kwargs.get("temperature", model_config.get("temperature"))
+        if cache.deterministic_only and temperature != 0:
+            # 采样结果不确定, 不缓存
+            return await text_chat(
+                prompt=prompt,
+                session_id=session_id,
+                image_urls=image_urls,
+                func_tool=func_tool,
+                contexts=contexts,
+                system_prompt=system_prompt,
+                tool_calls_result=tool_calls_result,
+                **kwargs,
+            )
+        tools = func_tool.get_func_desc_openai_style() if func_tool else None
+        tool_results = None
+        if tool_calls_result:
+            tool_results = (
+                [r.to_openai_messages() for r in tool_calls_result]
+                if isinstance(tool_calls_result, list)
+                else tool_calls_result.to_openai_messages()
+            )
+        key = make_key(
+            "text_chat",
+            provider.meta().id,
+            provider.get_model(),
+            model_config,
+            prompt,
+            image_urls,
+            contexts,
+            system_prompt,
+            tools,
+            tool_results,
+            {k: kwargs[k] for k in CACHE_KEY_KWARGS if k in kwargs},
+        )
+        cached = await cache.get(key)
+        if cached is not None:
+            return _load_response(cached)
+        resp = await text_chat(
+            prompt=prompt,
+            session_id=session_id,
+            image_urls=image_urls,
+            func_tool=func_tool,
+            contexts=contexts,
+            system_prompt=system_prompt,
+            tool_calls_result=tool_calls_result,
+            **kwargs,
+        )
+        if (data := _dump_response(resp)) is not None:
+            await cache.put(key, data)
+        return resp
+
+    provider.text_chat = cached_text_chat
+    provider.response_cache = cache
+
+
+def install_embedding_cache(provider, cache: ResponseCache):
+    """为嵌入提供商实例的 get_embedding 和 get_embeddings 添加缓存。批量请求时只请求未命中的文本"""
+    get_embedding = provider.get_embedding
+    get_embeddings = provider.get_embeddings
+
+    def key_of(text: str) -> str:
+        return make_key(
+            "embedding",
+            provider.meta().id,
+            provider.provider_config.get("embedding_model"),
+            provider.get_dim(),
+            text,
+        )
+
+    async def cached_get_embedding(text: str) -> List[float]:
+        key = key_of(text)
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached
+        vector = [float(x) for x in await get_embedding(text)]
+        await cache.put(key, vector)
+        return vector
+
+    async def cached_get_embeddings(texts: List[str]) -> List[List[float]]:
+        keys = [key_of(text) for text in texts]
+        result: List[Optional[List[float]]] = [await cache.get(key) for key in keys]
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(result):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            vectors = await get_embeddings(list(missing))
+            for positions, vector in zip(missing.values(), vectors):
+                vector = [float(x) for x in vector]
+                await cache.put(keys[positions[0]], vector)
+                for i in positions:
+                    result[i] = vector
+        return result
+
+    provider.get_embedding = cached_get_embedding
+    provider.get_embeddings = cached_get_embeddings
+    provider.response_cache = cache
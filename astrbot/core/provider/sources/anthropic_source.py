@@ -12,6 +12,7 @@ from astrbot.core.provider.func_tool_manager import FuncCall
 from ..register import register_provider_adapter
 from astrbot.core.message.message_event_result import MessageChain
 from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
+from astrbot.core.provider.key_pool import ApiKeyPool, get_status_code
 from .openai_source import ProviderOpenAIOfficial
 
 
@@ -45,22 +46,34 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
         if isinstance(self.timeout, str):
             self.timeout = int(self.timeout)
 
-        self.client = AsyncAnthropic(
-            api_key=self.chosen_api_key, timeout=self.timeout, base_url=self.base_url
+        self.key_pool = ApiKeyPool(
+            self.api_keys,
+            self._create_client,
+            rpm=int(provider_config.get("key_rpm", 0) or 0),
         )
+        self.client = self.key_pool.keys[0].client
 
         self.set_model(provider_config["model_config"]["model"])
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    def _create_client(self, api_key: str):
+        return AsyncAnthropic(
+            api_key=api_key, timeout=self.timeout, base_url=self.base_url
+        )
+
+    async def _query(
+        self, payloads: dict, tools: FuncCall, client: AsyncAnthropic = None
+    ) -> LLMResponse:
         if tools:
             tool_list = tools.get_func_desc_anthropic_style()
             if tool_list:
                 payloads["tools"] = tool_list
 
-        completion = await self.client.messages.create(**payloads, stream=False)
+        completion = await (client or self.client).messages.create(
+            **payloads, stream=False
+        )
 
         assert isinstance(completion, Message)
-        logger.debug(f"completion: {completion}")
+        logger.debug("completion: %s", completion)
 
         if len(completion.content) == 0:
             raise Exception("API 返回的 completion 为空。")
@@ -132,9 +145,37 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
         if system_prompt:
             payloads["system"] = system_prompt
 
+        available_api_keys = [k.key for k in self.key_pool.keys]
+        while True:
+            try:
+                async with self.key_pool.lease(
+                    exclude=self._excluded_keys(available_api_keys)
+                ) as key:
+                    return await self._query_with_client(
+                        payloads, func_tool, context_query, model_config, key.client
+                    )
+            except Exception as e:
+                if get_status_code(e) != 429:
+                    raise
+                # 该 Key 已在 Key 池中进入冷却, 本次请求换用其他 Key
+                available_api_keys.remove(key.key)
+                if not available_api_keys:
+                    raise
+                logger.warning(
+                    f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {key.masked()}"
+                )
+
+    async def _query_with_client(
+        self,
+        payloads: dict,
+        func_tool: FuncCall,
+        context_query: list,
+        model_config: dict,
+        client: AsyncAnthropic,
+    ) -> LLMResponse:
         llm_response = None
         try:
-            llm_response = await self._query(payloads, func_tool)
+            llm_response = await self._query(payloads, func_tool, client)
 
         except Exception as e:
             if "maximum context length" in str(e):
@@ -145,11 +186,13 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
                     )
                     try:
                         await self.pop_record(context_query)
-                        response = await self.client.messages.create(
+                        response = await client.messages.create(
                             messages=context_query, **model_config
                         )
                         llm_response = LLMResponse("assistant")
-                        llm_response.result_chain = MessageChain().message(response.content[0].text)
+                        llm_response.result_chain = MessageChain().message(
+                            response.content[0].text
+                        )
                         llm_response.raw_completion = response
                         return llm_response
                     except Exception as e:
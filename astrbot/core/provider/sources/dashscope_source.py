@@ -127,7 +127,7 @@ class ProviderDashscope(ProviderOpenAIOfficial):
             )
             response = await asyncio.get_event_loop().run_in_executor(None, partial)
 
-        logger.debug(f"dashscope resp: {response}")
+        logger.debug("dashscope resp: %s", response)
 
         if response.status_code != 200:
             logger.error(
@@ -120,7 +120,7 @@ class ProviderDify(Provider):
                         files=files_payload,
                         timeout=self.timeout,
                     ):
-                        logger.debug(f"dify resp chunk: {chunk}")
+                        logger.debug("dify resp chunk: %s", chunk)
                         if (
                             chunk["event"] == "message"
                             or chunk["event"] == "agent_message"
@@ -164,7 +164,7 @@ class ProviderDify(Provider):
                                 logger.info(
                                     f"Dify 工作流(ID: {chunk['workflow_run_id']})运行结束"
                                 )
-                                logger.debug(f"Dify 工作流结果：{chunk}")
+                                logger.debug("Dify 工作流结果：%s", chunk)
                                 if chunk["data"]["error"]:
                                     logger.error(
                                         f"Dify 工作流出现错误：{chunk['data']['error']}"
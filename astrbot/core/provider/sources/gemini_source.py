@@ -1,8 +1,6 @@
-import asyncio
 import base64
 import json
 import logging
-import random
 from typing import Optional
 from collections.abc import AsyncGenerator
 
@@ -17,6 +15,7 @@ from astrbot.core.db import BaseDatabase
 from astrbot.core.message.message_event_result import MessageChain
 from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
 from astrbot.core.provider.func_tool_manager import FuncCall
+from astrbot.core.provider.key_pool import AUTH_ERROR_COOLDOWN, ApiKey, ApiKeyPool
 from astrbot.core.utils.io import download_image_by_url
 
 from ..register import register_provider_adapter
@@ -73,14 +72,20 @@ class ProviderGoogleGenAI(Provider):
         if self.api_base and self.api_base.endswith("/"):
             self.api_base = self.api_base[:-1]
 
-        self._init_client()
+        # 每个 Key 使用独立的客户端, 并发请求之间互不影响
+        self.key_pool = ApiKeyPool(
+            self.api_keys,
+            self._create_client,
+            rpm=int(provider_config.get("key_rpm", 0) or 0),
+        )
+        self.client = self.key_pool.keys[0].client
         self.set_model(provider_config["model_config"]["model"])
         self._init_safety_settings()
 
-    def _init_client(self) -> None:
-        """初始化Gemini客户端"""
-        self.client = genai.Client(
-            api_key=self.chosen_api_key,
+    def _create_client(self, api_key: str):
+        """创建Gemini客户端"""
+        return genai.Client(
+            api_key=api_key,
             http_options=types.HttpOptions(
                 base_url=self.api_base,
                 timeout=self.timeout * 1000,  # 毫秒
@@ -99,20 +104,23 @@ class ProviderGoogleGenAI(Provider):
             and threshold_str in self.THRESHOLD_MAPPING
         ]
 
-    async def _handle_api_error(self, e: APIError, keys: list[str]) -> bool:
+    async def _handle_api_error(
+        self, e: APIError, keys: list[str], chosen_key: ApiKey
+    ) -> bool:
         """处理API错误，返回是否需要重试"""
         if e.code == 429 or "API key not valid" in e.message:
-            keys.remove(self.chosen_api_key)
+            if "API key not valid" in e.message:
+                self.key_pool.cooldown(chosen_key, AUTH_ERROR_COOLDOWN)
+            # 本次请求不再使用该 Key
+            keys.remove(chosen_key.key)
             if len(keys) > 0:
-                self.set_key(random.choice(keys))
                 logger.info(
-                    f"检测到 Key 异常({e.message})，正在尝试更换 API Key 重试... 当前 Key: {self.chosen_api_key[:12]}..."
+                    f"检测到 Key 异常({e.message})，正在尝试更换 API Key 重试... 当前 Key: {chosen_key.masked()}"
                 )
-                await asyncio.sleep(1)
                 return True
             else:
                 logger.error(
-                    f"检测到 Key 异常({e.message})，且已没有可用的 Key。 当前 Key: {self.chosen_api_key[:12]}..."
+                    f"检测到 Key 异常({e.message})，且已没有可用的 Key。 当前 Key: {chosen_key.masked()}"
                 )
                 raise Exception("达到了 Gemini 速率限制, 请稍后再试...")
         else:
@@ -375,8 +383,9 @@ class ProviderGoogleGenAI(Provider):
                 chain.append(Comp.Image.fromBytes(part.inline_data.data))
         return MessageChain(chain=chain)
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    async def _query(self, payloads: dict, tools: FuncCall, client=None) -> LLMResponse:
         """非流式请求 Gemini API"""
+        client = client or self.client
         system_instruction = next(
             (msg["content"] for msg in payloads["messages"] if msg["role"] == "system"),
             None,
@@ -395,7 +404,7 @@ class ProviderGoogleGenAI(Provider):
                 config = await self._prepare_query_config(
                     payloads, tools, system_instruction, modalities, temperature
                 )
-                result = await self.client.models.generate_content(
+                result = await client.models.generate_content(
                     model=self.get_model(),
                     contents=conversation,
                     config=config,
@@ -440,9 +449,10 @@ class ProviderGoogleGenAI(Provider):
         return llm_response
 
     async def _query_stream(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, client=None
     ) -> AsyncGenerator[LLMResponse, None]:
         """流式请求 Gemini API"""
+        client = client or self.client
         system_instruction = next(
             (msg["content"] for msg in payloads["messages"] if msg["role"] == "system"),
             None,
@@ -456,7 +466,7 @@ class ProviderGoogleGenAI(Provider):
                 config = await self._prepare_query_config(
                     payloads, tools, system_instruction
                 )
-                result = await self.client.models.generate_content_stream(
+                result = await client.models.generate_content_stream(
                     model=self.get_model(),
                     contents=conversation,
                     config=config,
@@ -535,13 +545,16 @@ class ProviderGoogleGenAI(Provider):
         payloads = {"messages": context_query, **model_config}
 
         retry = 10
-        keys = self.api_keys.copy()
+        keys = [k.key for k in self.key_pool.keys]
 
         for _ in range(retry):
             try:
-                return await self._query(payloads, func_tool)
+                async with self.key_pool.lease(
+                    exclude=self._excluded_keys(keys)
+                ) as key:
+                    return await self._query(payloads, func_tool, key.client)
             except APIError as e:
-                if await self._handle_api_error(e, keys):
+                if await self._handle_api_error(e, keys, key):
                     continue
                 break
 
@@ -577,15 +590,20 @@ class ProviderGoogleGenAI(Provider):
         payloads = {"messages": context_query, **model_config}
 
         retry = 10
-        keys = self.api_keys.copy()
+        keys = [k.key for k in self.key_pool.keys]
 
         for _ in range(retry):
             try:
-                async for response in self._query_stream(payloads, func_tool):
-                    yield response
+                async with self.key_pool.lease(
+                    exclude=self._excluded_keys(keys)
+                ) as key:
+                    async for response in self._query_stream(
+                        payloads, func_tool, key.client
+                    ):
+                        yield response
                 break
             except APIError as e:
-                if await self._handle_api_error(e, keys):
+                if await self._handle_api_error(e, keys, key):
                     continue
                 break
 
@@ -607,8 +625,16 @@ class ProviderGoogleGenAI(Provider):
         return self.api_keys
 
     def set_key(self, key):
+        """设置 get_models 等请求使用的 Key。对话请求由 Key 池在所有 Key 之间分配"""
         self.chosen_api_key = key
-        self._init_client()
+        if (pooled := self.key_pool.get(key)) is not None:
+            self.client = pooled.client
+        else:
+            self.client = self._create_client(key)
+
+    def _excluded_keys(self, keys: list[str]) -> list[str]:
+        """本次请求中已经失败、不再使用的 Key"""
+        return [k.key for k in self.key_pool.keys if k.key not in keys]
 
     async def assemble_context(self, text: str, image_urls: list[str] = None):
         """
@@ -2,8 +2,6 @@ import base64
 import json
 import os
 import inspect
-import random
-import asyncio
 import astrbot.core.message.components as Comp
 
 from openai import AsyncOpenAI, AsyncAzureOpenAI
@@ -22,6 +20,7 @@ from astrbot.core.provider.func_tool_manager import FuncCall
 from typing import List, AsyncGenerator
 from ..register import register_provider_adapter
 from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
+from astrbot.core.provider.key_pool import ApiKeyPool
 
 
 @register_provider_adapter(
@@ -49,22 +48,13 @@ class ProviderOpenAIOfficial(Provider):
         self.timeout = provider_config.get("timeout", 120)
         if isinstance(self.timeout, str):
             self.timeout = int(self.timeout)
-        # 适配 azure openai #332
-        if "api_version" in provider_config:
-            # 使用 azure api
-            self.client = AsyncAzureOpenAI(
-                api_key=self.chosen_api_key,
-                api_version=provider_config.get("api_version", None),
-                base_url=provider_config.get("api_base", None),
-                timeout=self.timeout,
-            )
-        else:
-            # 使用 openai api
-            self.client = AsyncOpenAI(
-                api_key=self.chosen_api_key,
-                base_url=provider_config.get("api_base", None),
-                timeout=self.timeout,
-            )
+        # 每个 Key 使用独立的客户端, 并发请求之间互不影响
+        self.key_pool = ApiKeyPool(
+            self.api_keys,
+            self._create_client,
+            rpm=int(provider_config.get("key_rpm", 0) or 0),
+        )
+        self.client = self.key_pool.keys[0].client
 
         self.default_params = inspect.signature(
             self.client.chat.completions.create
@@ -74,6 +64,23 @@ class ProviderOpenAIOfficial(Provider):
         model = model_config.get("model", "unknown")
         self.set_model(model)
 
+    def _create_client(self, api_key: str):
+        # 适配 azure openai #332
+        if "api_version" in self.provider_config:
+            # 使用 azure api
+            return AsyncAzureOpenAI(
+                api_key=api_key,
+                api_version=self.provider_config.get("api_version", None),
+                base_url=self.provider_config.get("api_base", None),
+                timeout=self.timeout,
+            )
+        # 使用 openai api
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=self.provider_config.get("api_base", None),
+            timeout=self.timeout,
+        )
+
     async def get_models(self):
         try:
             models_str = []
@@ -85,7 +92,9 @@ class ProviderOpenAIOfficial(Provider):
         except NotFoundError as e:
             raise Exception(f"获取模型列表失败：{e}")
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    async def _query(
+        self, payloads: dict, tools: FuncCall, client: AsyncOpenAI = None
+    ) -> LLMResponse:
         if tools:
             model = payloads.get("model", "").lower()
             omit_empty_param_field = "gemini" in model
@@ -105,7 +114,7 @@ class ProviderOpenAIOfficial(Provider):
         for key in to_del:
             del payloads[key]
 
-        completion = await self.client.chat.completions.create(
+        completion = await (client or self.client).chat.completions.create(
             **payloads, stream=False, extra_body=extra_body
         )
 
@@ -114,14 +123,14 @@ class ProviderOpenAIOfficial(Provider):
                 f"API 返回的 completion 类型错误：{type(completion)}: {completion}。"
             )
 
-        logger.debug(f"completion: {completion}")
+        logger.debug("completion: %s", completion)
 
         llm_response = await self.parse_openai_completion(completion, tools)
 
         return llm_response
 
     async def _query_stream(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, client: AsyncOpenAI = None
     ) -> AsyncGenerator[LLMResponse, None]:
         """流式查询API，逐步返回结果"""
         if tools:
@@ -143,7 +152,7 @@ class ProviderOpenAIOfficial(Provider):
         for key in to_del:
             del payloads[key]
 
-        stream = await self.client.chat.completions.create(
+        stream = await (client or self.client).chat.completions.create(
             **payloads, stream=True, extra_body=extra_body
         )
 
@@ -269,14 +278,11 @@ class ProviderOpenAIOfficial(Provider):
         """处理API错误并尝试恢复"""
         if "429" in str(e):
             logger.warning(
-                f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {chosen_key[:12]}"
+                f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {(chosen_key or '')[:12]}"
             )
-            # 最后一次不等待
-            if retry_cnt < max_retries - 1:
-                await asyncio.sleep(1)
+            # 该 Key 已在 Key 池中进入冷却, 本次请求不再使用
             available_api_keys.remove(chosen_key)
             if len(available_api_keys) > 0:
-                chosen_key = random.choice(available_api_keys)
                 return (
                     False,
                     chosen_key,
@@ -365,15 +371,18 @@ class ProviderOpenAIOfficial(Provider):
 
         llm_response = None
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = [k.key for k in self.key_pool.keys]
+        chosen_key = None
 
         last_exception = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
             try:
-                self.client.api_key = chosen_key
-                llm_response = await self._query(payloads, func_tool)
+                async with self.key_pool.lease(
+                    exclude=self._excluded_keys(available_api_keys)
+                ) as key:
+                    chosen_key = key.key
+                    llm_response = await self._query(payloads, func_tool, key.client)
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -434,16 +443,21 @@ class ProviderOpenAIOfficial(Provider):
         )
 
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = [k.key for k in self.key_pool.keys]
+        chosen_key = None
 
         last_exception = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
             try:
-                self.client.api_key = chosen_key
-                async for response in self._query_stream(payloads, func_tool):
-                    yield response
+                async with self.key_pool.lease(
+                    exclude=self._excluded_keys(available_api_keys)
+                ) as key:
+                    chosen_key = key.key
+                    async for response in self._query_stream(
+                        payloads, func_tool, key.client
+                    ):
+                        yield response
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -479,6 +493,10 @@ class ProviderOpenAIOfficial(Provider):
                 raise Exception("未知错误")
             raise last_exception
 
+    def _excluded_keys(self, available_api_keys: List[str]) -> List[str]:
+        """本次请求中已经失败、不再使用的 Key"""
+        return [k.key for k in self.key_pool.keys if k.key not in available_api_keys]
+
     async def _remove_image_from_context(self, contexts: List):
         """
         从上下文中删除所有带有 image 的记录
@@ -512,7 +530,15 @@ class ProviderOpenAIOfficial(Provider):
         return self.api_keys
 
     def set_key(self, key):
-        self.client.api_key = key
+        """设置 get_models 等请求使用的 Key。对话请求由 Key 池在所有 Key 之间分配"""
+        if (pooled := self.key_pool.get(key)) is not None:
+            self.client = pooled.client
+        else:
+            self.client = self._create_client(key)
+
+    async def terminate(self):
+        for key in self.key_pool.keys:
+            await key.client.close()
 
     async def assemble_context(self, text: str, image_urls: List[str] = None) -> dict:
         """组装成符合 OpenAI 格式的 role 为 user 的消息段"""
@@ -88,7 +88,7 @@ class ProviderSenseVoiceSTTSelfHost(STTProvider):
             )
 
             # res = self.model(audio_url, language="auto", use_itn=True)
-            logger.debug(f"SenseVoice识别到的文案：{res}")
+            logger.debug("SenseVoice识别到的文案：%s", res)
             text = rich_transcription_postprocess(res[0])
             if self.is_emotion:
                 # 提取第二个匹配的值
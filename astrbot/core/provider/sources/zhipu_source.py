@@ -62,24 +62,27 @@ class ProviderZhipu(ProviderOpenAIOfficial):
             context_query.insert(0, {"role": "system", "content": system_prompt})
 
         payloads = {"messages": context_query, **model_cfgs}
-        try:
-            llm_response = await self._query(payloads, func_tool)
-            return llm_response
-        except Exception as e:
-            if "maximum context length" in str(e):
-                retry_cnt = 10
-                while retry_cnt > 0:
-                    logger.warning(
-                        f"请求失败：{e}。上下文长度超过限制。尝试弹出最早的记录然后重试。"
-                    )
-                    try:
-                        self.pop_record(session_id)
-                        llm_response = await self._query(payloads, func_tool)
-                        break
-                    except Exception as e:
-                        if "maximum context length" in str(e):
-                            retry_cnt -= 1
-                        else:
-                            raise e
-            else:
-                raise e
+        async with self.key_pool.lease() as key:
+            try:
+                llm_response = await self._query(payloads, func_tool, key.client)
+                return llm_response
+            except Exception as e:
+                if "maximum context length" in str(e):
+                    retry_cnt = 10
+                    while retry_cnt > 0:
+                        logger.warning(
+                            f"请求失败：{e}。上下文长度超过限制。尝试弹出最早的记录然后重试。"
+                        )
+                        try:
+                            self.pop_record(session_id)
+                            llm_response = await self._query(
+                                payloads, func_tool, key.client
+                            )
+                            break
+                        except Exception as e:
+                            if "maximum context length" in str(e):
+                                retry_cnt -= 1
+                            else:
+                                raise e
+                else:
+                    raise e
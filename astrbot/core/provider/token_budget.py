@@ -0,0 +1,164 @@
+"""
+上下文 token 预算
+
+在请求 LLM 之前按 token 数裁剪上下文, 避免上下文超出模型的上下文窗口后由提供商报错, 再逐条弹出记录重试。
+
+分词器按提供商类型选择:
+    - OpenAI 提供商: 安装了 tiktoken 时使用与模型对应的编码
+    - 其他提供商, 或 tiktoken 不可用时: 估算。中日韩字符按每个字符 1 个 token, 其他字符按每 4 个字符 1 个 token 计算
+
+每条消息的 token 数按 (分词器, 消息的 content 和 tool_calls 对象) 缓存。对话缓存返回的历史记录是浅拷贝, content 等字段
+仍然是对话缓存中的同一个对象, 因此同一条历史消息在之后的请求中不会被重新计算, 也不需要为了计算缓存键而序列化消息。
+缓存中的内容视为不可变, 原地修改了 content 列表的消息需要替换为新的对象。
+"""
+
+import asyncio
+import json
+import math
+import re
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from astrbot.core import logger
+from .entities import ProviderRequest
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MESSAGE_OVERHEAD = 4
+"""每条消息的角色、分隔符等额外的 token 数"""
+IMAGE_TOKENS = 765
+"""每张图片的 token 数。按 OpenAI 1024x1024 图片(高精度)的开销估算"""
+
+_CJK_RE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+class EstimateTokenizer:
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        other = len(_CJK_RE.sub("", text))
+        return len(text) - other + math.ceil(other / 4)
+
+
+class TiktokenTokenizer:
+    def __init__(self, model: str):
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+        self.name = f"tiktoken:{self.encoding.name}"
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+class TokenCounter:
+    def __init__(self, cache_size: int = 20000):
+        self.cache_size = cache_size
+        self._cache: OrderedDict[Tuple[str, int, int], tuple] = OrderedDict()
+        """(分词器名称, id(content), id(tool_calls)) -> (content, tool_calls, token 数)。
+        保存 content 和 tool_calls 的引用, 保证缓存项存在期间 id 不会被其他对象复用"""
+        self._tokenizers: Dict[Tuple[str, str], object] = {}
+        self._estimate = EstimateTokenizer()
+
+    async def load_tokenizer(self, provider_type: str, model: str):
+        """获取提供商类型和模型对应的分词器。首次加载 tiktoken 编码可能需要联网下载, 在线程池中执行"""
+        tokenizer = self._tokenizers.get((provider_type, model))
+        if tokenizer is None:
+            tokenizer = await asyncio.to_thread(
+                self.get_tokenizer, provider_type, model
+            )
+        return tokenizer
+
+    def get_tokenizer(self, provider_type: str, model: str):
+        """获取提供商类型和模型对应的分词器。在事件循环中调用前应先调用 load_tokenizer"""
+        key = (provider_type, model)
+        tokenizer = self._tokenizers.get(key)
+        if tokenizer is None:
+            tokenizer = self._estimate
+            if tiktoken is not None and provider_type == "openai_chat_completion":
+                try:
+                    tokenizer = TiktokenTokenizer(model)
+                except Exception as e:
+                    # 编码文件需要联网下载, 失败时使用估算
+                    logger.warning(f"加载 tiktoken 编码失败, 将估算 token 数: {e!s}")
+            self._tokenizers[key] = tokenizer
+        return tokenizer
+
+    def count_message(self, tokenizer, message: dict) -> int:
+        content = message.get("content")
+        tool_calls = message.get("tool_calls")
+        key = (tokenizer.name, id(content), id(tool_calls))
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] is content and cached[1] is tool_calls:
+            self._cache.move_to_end(key)
+            return cached[2]
+        tokens = MESSAGE_OVERHEAD
+        if isinstance(content, str):
+            tokens += tokenizer.count(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += tokenizer.count(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    tokens += IMAGE_TOKENS
+        if tool_calls:
+            tokens += tokenizer.count(json.dumps(tool_calls))
+        self._cache[key] = (content, tool_calls, tokens)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_fixed(self, tokenizer, req: ProviderRequest) -> int:
+        """计算请求中上下文以外的部分(系统提示词、提示词、图片、工具)的 token 数"""
+        tokens = MESSAGE_OVERHEAD * 2
+        tokens += tokenizer.count(req.system_prompt or "")
+        tokens += tokenizer.count(req.prompt or "")
+        tokens += IMAGE_TOKENS * len(req.image_urls or [])
+        if req.func_tool:
+            tools = req.func_tool.get_func_desc_openai_style()
+            if tools:
+                tokens += tokenizer.count(json.dumps(tools, ensure_ascii=False))
+        return tokens
+
+    def fit(
+        self, req: ProviderRequest, provider_type: str, model: str, budget: int
+    ) -> int:
+        """从最早的记录开始丢弃上下文, 使整个请求的 token 数不超过 budget。系统提示词记录不会被丢弃
+
+        Returns:
+            int: 丢弃的记录条数
+        """
+        tokenizer = self.get_tokenizer(provider_type, model)
+        contexts: List[dict] = req.contexts or []
+        counts = [self.count_message(tokenizer, m) for m in contexts]
+        total = self.count_fixed(tokenizer, req) + sum(counts)
+        if total <= budget:
+            return 0
+
+        drop = set()
+        i = 0
+        while total > budget and i < len(contexts):
+            if contexts[i].get("role") != "system":
+                drop.add(i)
+                total -= counts[i]
+            i += 1
+        # 确保保留的第一条非系统记录是用户的消息, 不留下没有对应调用的工具结果
+        while i < len(contexts) and contexts[i].get("role") != "user":
+            if contexts[i].get("role") != "system":
+                drop.add(i)
+                total -= counts[i]
+            i += 1
+        if total > budget:
+            logger.warning(
+                f"丢弃所有上下文后请求仍有约 {total} tokens, 超过了上下文 token 上限 {budget}。"
+            )
+        req.contexts = [m for idx, m in enumerate(contexts) if idx not in drop]
+        return len(drop)
+
+
+token_counter = TokenCounter()
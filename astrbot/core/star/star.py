@@ -5,8 +5,49 @@ from typing import List, Dict
 from dataclasses import dataclass, field
 from astrbot.core.config import AstrBotConfig
 
+
+class StarMap(dict):
+    """插件模块路径到插件元数据的映射。
+
+    插件被加入、移除，或者插件的激活状态、平台兼容性发生变化时递增 version，用于使 Handler 索引失效。
+    """
+
+    version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
 star_registry: List[StarMetadata] = []
-star_map: Dict[str, StarMetadata] = {}
+star_map: Dict[str, StarMetadata] = StarMap()
 """key 是模块路径，__module__"""
 
 
@@ -53,6 +94,11 @@ class StarMetadata:
     def __str__(self) -> str:
         return f"StarMetadata({self.name}, {self.desc}, {self.version}, {self.repo})"
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in ("name", "activated", "supported_platforms"):
+            star_map._changed()
+
     def update_platform_compatibility(self, plugin_enable_config: dict) -> None:
         """更新插件支持的平台列表
 
@@ -73,3 +119,5 @@ class StarMetadata:
             else:
                 # 如果没有明确配置，默认为启用
                 self.supported_platforms[platform_id] = True
+
+        star_map._changed()
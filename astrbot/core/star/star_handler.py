@@ -1,7 +1,8 @@
 from __future__ import annotations
 import enum
+from bisect import insort
 from dataclasses import dataclass, field
-from typing import Awaitable, List, Dict, TypeVar, Generic
+from typing import Awaitable, List, Dict, Tuple, TypeVar, Generic
 from .filter import HandlerFilter
 from .star import star_map
 
@@ -11,6 +12,10 @@ class StarHandlerRegistry(Generic[T]):
     def __init__(self):
         self.star_handlers_map: Dict[str, StarHandlerMetadata] = {}
         self._handlers: List[StarHandlerMetadata] = []
+        self._version = 0
+        """Handler 列表的版本号，每次增删 Handler 时递增"""
+        self._index: Dict[tuple, Tuple[tuple, List[StarHandlerMetadata]]] = {}
+        """(事件类型, 是否只包含已激活的, 平台 ID) -> ((Handler 列表版本号, star_map 版本号), Handler 列表)"""
 
     def append(self, handler: StarHandlerMetadata):
         """添加一个 Handler，并保持按优先级有序"""
@@ -18,8 +23,9 @@ class StarHandlerRegistry(Generic[T]):
             handler.extras_configs["priority"] = 0
 
         self.star_handlers_map[handler.handler_full_name] = handler
-        self._handlers.append(handler)
-        self._handlers.sort(key=lambda h: -h.extras_configs["priority"])
+        # 插入到所有优先级不低于它的 Handler 之后
+        insort(self._handlers, handler, key=lambda h: -h.extras_configs["priority"])
+        self._version += 1
 
     def _print_handlers(self):
         for handler in self._handlers:
@@ -27,6 +33,23 @@ class StarHandlerRegistry(Generic[T]):
 
     def get_handlers_by_event_type(
         self, event_type: EventType, only_activated=True, platform_id=None
+    ) -> List[StarHandlerMetadata]:
+        """获取某个事件类型的 Handler。
+
+        结果按 (事件类型, 是否只包含已激活的, 平台 ID) 缓存，Handler 增删、插件加载卸载、启用禁用或平台兼容性配置变化后重新计算。
+        """
+        key = (event_type, only_activated, platform_id)
+        stamp = (self._version, star_map.version)
+        cached = self._index.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = self._index[key] = (
+                stamp,
+                self._filter_handlers(event_type, only_activated, platform_id),
+            )
+        return list(cached[1])
+
+    def _filter_handlers(
+        self, event_type: EventType, only_activated: bool, platform_id: str
     ) -> List[StarHandlerMetadata]:
         handlers = []
         for handler in self._handlers:
@@ -56,10 +79,13 @@ class StarHandlerRegistry(Generic[T]):
     def clear(self):
         self.star_handlers_map.clear()
         self._handlers.clear()
+        self._index.clear()
+        self._version += 1
 
     def remove(self, handler: StarHandlerMetadata):
         self.star_handlers_map.pop(handler.handler_full_name, None)
         self._handlers = [h for h in self._handlers if h != handler]
+        self._version += 1
 
     def __iter__(self):
         return iter(self._handlers)
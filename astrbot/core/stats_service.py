@@ -0,0 +1,182 @@
+"""
+管理面板统计数据服务
+
+/api/stat/get 需要的数据都预先在内存中维护, 请求时不会阻塞事件循环, 也不会查询数据库:
+    - SystemSampler: 后台线程定时采样 CPU 使用率、内存占用和线程数, 保存在环形缓冲区中
+    - MessageStats: 启动时从数据库加载一次消息数统计, 之后在收到消息时增量更新按 30 分钟划分的时间桶、各平台的计数和总消息数
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+import psutil
+
+from astrbot.core import logger
+from astrbot.core.db import BaseDatabase
+from astrbot.core.db.po import Platform
+
+BUCKET_SECONDS = 1800
+"""消息数时间序列的时间桶长度"""
+
+
+class SystemSampler:
+    def __init__(self, interval: float = 5, history: int = 720):
+        """
+        Args:
+            interval: 采样间隔, 单位为秒
+            history: 保存的采样数
+        """
+        self.interval = interval
+        self.samples: Deque[Tuple[int, float, int, int]] = deque(maxlen=history)
+        """(时间, CPU 使用率, 进程内存 MB, 线程数)"""
+        self.system_memory = psutil.virtual_memory().total >> 20
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # 第一次调用 cpu_percent(None) 作为计算的起点
+        self._process.cpu_percent(None)
+        psutil.cpu_percent(None)
+        self._thread = threading.Thread(
+            target=self._run, name="system_sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"采样系统状态失败: {e!s}")
+
+    def sample(self):
+        self.samples.append(
+            (
+                int(time.time()),
+                psutil.cpu_percent(None),
+                self._process.memory_info().rss >> 20,
+                threading.active_count(),
+            )
+        )
+
+    def latest(self) -> Tuple[int, float, int, int]:
+        if not self.samples:
+            self.sample()
+        return self.samples[-1]
+
+
+class MessageStats:
+    def __init__(self, retention: int = 86400 * 7):
+        """
+        Args:
+            retention: 在内存中保存的时间范围, 单位为秒。超出该范围的查询需要查询数据库
+        """
+        self.retention = retention
+        self.buckets: Dict[int, Dict[str, int]] = {}
+        """时间桶序号(时间 // BUCKET_SECONDS) -> 平台名称 -> 消息数"""
+        self.last_seen: Dict[str, int] = {}
+        """平台名称 -> 最后一条消息的时间"""
+        self.total = 0
+        self.loaded = False
+
+    def load(self, platform: List[Platform], total: int):
+        """加载从数据库中查询的统计数据
+
+        Args:
+            platform: retention 秒前到现在的各平台消息数
+            total: 总消息数
+        """
+        buckets: Dict[int, Dict[str, int]] = {}
+        last_seen: Dict[str, int] = {}
+        for p in platform:
+            bucket = buckets.setdefault(p.timestamp // BUCKET_SECONDS, {})
+            bucket[p.name] = bucket.get(p.name, 0) + p.count
+            last_seen[p.name] = max(last_seen.get(p.name, 0), p.timestamp)
+        # 合并查询期间收到的消息
+        for idx, bucket in self.buckets.items():
+            target = buckets.setdefault(idx, {})
+            for name, count in bucket.items():
+                target[name] = target.get(name, 0) + count
+        for name, ts in self.last_seen.items():
+            last_seen[name] = max(last_seen.get(name, 0), ts)
+        self.buckets, self.last_seen = buckets, last_seen
+        self.total += total
+        self.loaded = True
+
+    def record(self, platform_name: str, count: int = 1):
+        now = int(time.time())
+        bucket = self.buckets.setdefault(now // BUCKET_SECONDS, {})
+        bucket[platform_name] = bucket.get(platform_name, 0) + count
+        self.last_seen[platform_name] = now
+        self.total += count
+        # 每个时间桶只需要清理一次过期的桶
+        if len(bucket) == 1 and bucket[platform_name] == count:
+            self._expire(now)
+
+    def _expire(self, now: int):
+        cutoff = (now - self.retention) // BUCKET_SECONDS
+        for idx in [idx for idx in self.buckets if idx < cutoff]:
+            del self.buckets[idx]
+
+    def covers(self, offset_sec: int) -> bool:
+        return self.loaded and offset_sec <= self.retention
+
+    def time_series(self, offset_sec: int) -> List[List[int]]:
+        """offset_sec 秒前到现在, 每个时间桶的 [结束时间, 消息数]"""
+        now = int(time.time())
+        first = (now - offset_sec) // BUCKET_SECONDS
+        last = now // BUCKET_SECONDS
+        return [
+            [(idx + 1) * BUCKET_SECONDS, sum(self.buckets.get(idx, {}).values())]
+            for idx in range(first, last + 1)
+        ]
+
+    def by_platform(self, offset_sec: int) -> List[Platform]:
+        """offset_sec 秒前到现在, 各个平台的消息数"""
+        now = int(time.time())
+        first = (now - offset_sec) // BUCKET_SECONDS
+        counts: Dict[str, int] = {}
+        for idx in range(first, now // BUCKET_SECONDS + 1):
+            for name, count in self.buckets.get(idx, {}).items():
+                counts[name] = counts.get(name, 0) + count
+        return [
+            Platform(name, count, self.last_seen.get(name, 0))
+            for name, count in counts.items()
+        ]
+
+
+class StatsService:
+    def __init__(self):
+        self.sampler = SystemSampler()
+        self.messages = MessageStats()
+
+    async def initialize(self, db: BaseDatabase):
+        self.sampler.start()
+
+        def query():
+            stats = db.get_base_stats(self.messages.retention)
+            return stats.platform, db.get_total_message_count() or 0
+
+        try:
+            self.messages.load(*await asyncio.to_thread(query))
+        except Exception as e:
+            logger.error(f"加载消息统计数据失败: {e!s}")
+
+    def record_message(self, platform_name: str):
+        self.messages.record(platform_name)
+
+    def stop(self):
+        self.sampler.stop()
+
+
+stats_service = StatsService()
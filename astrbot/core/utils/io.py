@@ -1,3 +1,4 @@
+import asyncio
 import os
 import ssl
 import shutil
@@ -11,10 +12,16 @@ import psutil
 
 import certifi
 
-from typing import Union
+import threading
+from collections import OrderedDict
+from typing import Tuple, Union
 
 from PIL import Image
 from .astrbot_path import get_astrbot_data_path
+from .media_cache import media_cache
+from astrbot.core.log import LogManager
+
+logger = LogManager.GetLogger(log_name="astrbot")
 
 
 def on_error(func, path, exc_info):
@@ -49,18 +56,49 @@ def port_checker(port: int, host: str = "localhost"):
         return False
 
 
-def save_temp_img(img: Union[Image.Image, str]) -> str:
+TEMP_FILE_MAX_AGE = 3600 * 12
+"""临时文件的保留时间, 单位为秒"""
+
+
+def clean_temp_dir(max_age: float = TEMP_FILE_MAX_AGE) -> int:
+    """删除临时文件夹中超过 max_age 秒未修改的文件
+
+    Returns:
+        int: 删除的文件数
+    """
     temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-    # 获得文件创建时间，清除超过 12 小时的
+    removed = 0
+    now = time.time()
     try:
-        for f in os.listdir(temp_dir):
-            path = os.path.join(temp_dir, f)
-            if os.path.isfile(path):
-                ctime = os.path.getctime(path)
-                if time.time() - ctime > 3600 * 12:
-                    os.remove(path)
-    except Exception as e:
-        print(f"清除临时文件失败: {e}")
+        with os.scandir(temp_dir) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    # 文件可能已被其他进程删除
+                    continue
+    except FileNotFoundError:
+        pass
+    return removed
+
+
+async def temp_file_janitor(interval: float = 3600):
+    """定期清理临时文件夹"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(clean_temp_dir)
+            if removed:
+                logger.debug(f"已清理 {removed} 个过期的临时文件。")
+        except Exception as e:
+            logger.warning(f"清除临时文件失败: {e}")
+        await asyncio.sleep(interval)
+
+
+def save_temp_img(img: Union[Image.Image, str]) -> str:
+    """保存图片到临时文件夹。过期的临时文件由 temp_file_janitor 定期清理"""
+    temp_dir = os.path.join(get_astrbot_data_path(), "temp")
 
     # 获得时间戳
     timestamp = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
@@ -78,8 +116,11 @@ async def download_image_by_url(
     url: str, post: bool = False, post_data: dict = None, path=None
 ) -> str:
     """
-    下载图片, 返回 path
+    下载图片, 返回 path。未指定 path 的 GET 请求通过媒体缓存下载, 相同的 URL 和内容只会下载、保存一次。
+    返回的是缓存文件的私有副本, 调用方可以修改或删除
     """
+    if not post and not path:
+        return await media_cache.fetch(url, private=True)
     try:
         ssl_context = ssl.create_default_context(
             cafile=certifi.where()
@@ -182,11 +223,41 @@ async def download_file(url: str, path: str, show_progress: bool = False):
         print()
 
 
+class _Base64Cache:
+    """文件的 base64 编码缓存, 按 (路径, 修改时间, 大小) 缓存, 有总大小上限"""
+
+    def __init__(self, max_chars: int = 64 * 1024 * 1024):
+        self.max_chars = max_chars
+        self._data: OrderedDict[Tuple[str, int, int], str] = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                return value
+        with open(file_path, "rb") as f:
+            value = "base64://" + base64.b64encode(f.read()).decode()
+        if len(value) <= self.max_chars // 8:
+            with self._lock:
+                if key not in self._data:
+                    self._data[key] = value
+                    self._chars += len(value)
+                while self._chars > self.max_chars:
+                    _, old = self._data.popitem(last=False)
+                    self._chars -= len(old)
+        return value
+
+
+_base64_cache = _Base64Cache()
+
+
 def file_to_base64(file_path: str) -> str:
-    with open(file_path, "rb") as f:
-        data_bytes = f.read()
-        base64_str = base64.b64encode(data_bytes).decode()
-    return "base64://" + base64_str
+    return _base64_cache.get(file_path)
 
 
 def get_local_ip_addresses():
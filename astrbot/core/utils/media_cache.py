@@ -0,0 +1,298 @@
+"""
+内容寻址的媒体缓存
+
+消息组件中的网络图片、语音等文件下载后以内容的 SHA-256 命名保存在 data/media_cache 中:
+    - 内容相同的文件(例如相同的表情包、被多次转发的图片)只保存一份
+    - 维护 URL -> 文件的索引, 有效期内再次引用同一个 URL 时不会重新下载; 同时对同一个 URL 的多次请求只下载一次
+    - 下载时按块写入磁盘, 不会将整个文件读入内存
+    - 所有下载共用一个带连接池的 HTTP 会话
+    - 缓存总大小超过上限时, 删除最久未使用的文件
+
+缓存中的文件是共享的, 调用方不能删除或修改。需要交给可能删除文件的调用方(例如插件)时,
+使用 private=True 获取位于 data/temp 中的私有副本, 调用方可以修改或删除, 由临时文件清理任务删除。
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import ssl
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import aiohttp
+import certifi
+
+if sys.platform.startswith("linux"):
+    import fcntl
+
+    # Python 3.12 之前 fcntl 模块中没有 FICLONE 常量
+    FICLONE = getattr(fcntl, "FICLONE", 0x40049409)
+else:
+    FICLONE = None
+
+from astrbot.core.log import LogManager
+from .astrbot_path import get_astrbot_data_path
+from .ttl_cache import TTLCache
+
+logger = LogManager.GetLogger(log_name="astrbot")
+
+CHUNK_SIZE = 64 * 1024
+# 下载时积累到该大小后再写入磁盘, 减少线程切换次数
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class MediaCache:
+    def __init__(
+        self,
+        root: str = None,
+        temp_root: str = None,
+        max_bytes: int = 512 * 1024 * 1024,
+        url_ttl: float = 3600,
+    ):
+        """
+        Args:
+            root: 缓存目录, 默认为 data/media_cache
+            temp_root: 私有副本的目录, 默认为 data/temp
+            max_bytes: 缓存的总大小上限, 单位为字节
+            url_ttl: URL 索引的有效期, 单位为秒。同一个 URL 的内容可能会变化, 过期后重新下载
+        """
+        self._root = root
+        self._temp_root = temp_root
+        self.max_bytes = max_bytes
+        self._urls = TTLCache(max_entries=10000, ttl=url_ttl)
+        """URL -> 文件路径"""
+        self._pending: Dict[str, asyncio.Future] = {}
+        """正在下载的 URL -> 下载任务"""
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._size: Optional[int] = None
+        """缓存目录的总大小, 首次写入时统计"""
+        self._evict_lock = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        root = self._root or os.path.join(get_astrbot_data_path(), "media_cache")
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    @property
+    def temp_root(self) -> str:
+        temp_root = self._temp_root or os.path.join(get_astrbot_data_path(), "temp")
+        os.makedirs(temp_root, exist_ok=True)
+        return temp_root
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取共用的 HTTP 会话。会话与事件循环绑定, 事件循环变化时重新创建"""
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session._loop is not loop
+        ):
+            ssl_context = ssl.create_default_context(cafile=certifi.where())
+            self._session = aiohttp.ClientSession(
+                trust_env=True,
+                connector=aiohttp.TCPConnector(ssl=ssl_context, limit=32),
+            )
+        return self._session
+
+    async def fetch(self, url: str, suffix: str = ".jpg", private: bool = False) -> str:
+        """下载 URL 对应的文件到缓存中, 返回文件的路径
+
+        Args:
+            private: 为 True 时返回私有副本的路径, 调用方可以删除该文件
+        """
+        path = self._urls.get(url)
+        if path is not None and await asyncio.to_thread(_touch_cached, path):
+            return await self._private(path) if private else path
+        if path is not None:
+            # 文件已被淘汰
+            self._urls.pop(url)
+
+        future = self._pending.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._download(url, suffix))
+            self._pending[url] = future
+            future.add_done_callback(lambda _: self._pending.pop(url, None))
+        # 等待者被取消时不取消下载, 其他等待者仍然需要结果
+        path = await asyncio.shield(future)
+        return await self._private(path) if private else path
+
+    async def _download(self, url: str, suffix: str) -> str:
+        tmp_path = os.path.join(self.root, f"{uuid.uuid4().hex}.tmp")
+        try:
+            try:
+                digest, size = await self._stream_to(url, tmp_path)
+            except (
+                aiohttp.ClientConnectorSSLError,
+                aiohttp.ClientConnectorCertificateError,
+            ):
+                # 使用系统的 CA 证书重试
+                ssl_context = ssl.create_default_context()
+                ssl_context.set_ciphers("DEFAULT")
+                digest, size = await self._stream_to(url, tmp_path, ssl=ssl_context)
+            path = await asyncio.to_thread(self._commit, tmp_path, digest, suffix, size)
+        finally:
+            await asyncio.to_thread(_remove_if_exists, tmp_path)
+        self._urls.put(url, path)
+        return path
+
+    async def _stream_to(self, url: str, path: str, **kwargs):
+        """按块下载到 path, 返回内容的 SHA-256 和大小"""
+        sha = hashlib.sha256()
+        size = 0
+        async with self.get_session().get(url, **kwargs) as resp:
+            if resp.status != 200:
+                raise Exception(f"下载文件失败: {resp.status}, URL: {url}")
+            f = await asyncio.to_thread(open, path, "wb")
+            try:
+                buffer = bytearray()
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    sha.update(chunk)
+                    buffer += chunk
+                    size += len(chunk)
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        await asyncio.to_thread(f.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+            finally:
+                await asyncio.to_thread(f.close)
+        return sha.hexdigest(), size
+
+    async def put_bytes(
+        self, data: bytes, suffix: str = ".jpg", private: bool = False
+    ) -> str:
+        """将数据保存到缓存中, 返回文件的路径
+
+        Args:
+            private: 为 True 时返回私有副本的路径, 调用方可以删除该文件
+        """
+
+        def write():
+            digest = hashlib.sha256(data).hexdigest()
+            path = os.path.join(self.root, digest + suffix)
+            if os.path.exists(path):
+                _touch(path)
+                return path
+            tmp_path = os.path.join(self.root, f"{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            return self._commit(tmp_path, digest, suffix, len(data))
+
+        path = await asyncio.to_thread(write)
+        return await self._private(path) if private else path
+
+    async def _private(self, path: str) -> str:
+        return await asyncio.to_thread(self.private_copy, path)
+
+    def private_copy(self, path: str) -> str:
+        """在 data/temp 中创建缓存文件的副本, 返回副本的路径。
+
+        副本是独立的文件, 修改或删除副本不会影响缓存。文件系统支持时使用 reflink(写时复制), 不占用额外的磁盘空间
+        """
+        _, suffix = os.path.splitext(path)
+        dst = os.path.join(self.temp_root, f"{uuid.uuid4().hex}{suffix}")
+        if not _reflink(path, dst):
+            shutil.copyfile(path, dst)
+        return dst
+
+    def _commit(self, tmp_path: str, digest: str, suffix: str, size: int) -> str:
+        """将临时文件移动到以内容哈希命名的路径。已有相同内容的文件时直接使用该文件"""
+        path = os.path.join(self.root, digest + suffix)
+        if os.path.exists(path):
+            _touch(path)
+            os.remove(tmp_path)
+            return path
+        os.replace(tmp_path, path)
+        with self._evict_lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _scan(self):
+        entries = []
+        total = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+                    total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """删除最久未使用的文件, 直到总大小低于上限的 80%"""
+        with self._evict_lock:
+            entries, total = self._scan()
+            entries.sort()
+            target = self.max_bytes * 0.8
+            removed = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._size = total
+        if removed:
+            logger.debug("媒体缓存超出大小上限, 已删除 %s 个文件。", removed)
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "max_size": self.max_bytes,
+            "urls": self._urls.stats(),
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _touch(path: str):
+    """更新访问时间, 标记为最近使用。不修改修改时间, 以免按修改时间缓存的 base64 编码失效"""
+    stat = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """使用 FICLONE 创建 src 的写时复制副本(Linux 上的 Btrfs、XFS 等)。不支持时返回 False, 不会留下 dst"""
+    if FICLONE is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        _remove_if_exists(dst)
+        return False
+
+
+def _touch_cached(path: str) -> bool:
+    """标记缓存文件为最近使用。文件已被淘汰时返回 False"""
+    try:
+        _touch(path)
+        return True
+    except OSError:
+        return False
+
+
+def _remove_if_exists(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+media_cache = MediaCache()
@@ -5,6 +5,7 @@ import socket
 import uuid
 from astrbot.core.config import VERSION
 from astrbot.core import db_helper, logger
+from astrbot.core.stats_service import stats_service
 
 
 class Metric:
@@ -59,6 +60,7 @@ class Metric:
         try:
             if "adapter_name" in kwargs:
                 db_helper.insert_platform_metrics({kwargs["adapter_name"]: 1})
+                stats_service.record_message(kwargs["adapter_name"])
             if "llm_name" in kwargs:
                 db_helper.insert_llm_metrics({kwargs["llm_name"]: 1})
         except Exception as e:
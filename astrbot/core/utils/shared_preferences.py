@@ -1,41 +1,195 @@
+"""
+简单的偏好设置存储
+
+修改只会更新内存中的数据并标记为脏, 在 save_delay 秒后由后台线程统一写入存储后端, 短时间内的多次修改只会写入一次。
+进程退出前以及 AstrBot 停止、重启时会调用 flush() 立即写入。
+
+存储后端:
+    JsonFileBackend: 存储为一个 JSON 文件。每次写入都会重写整个文件, 先写入临时文件再重命名, 保证文件不会损坏
+    SQLiteBackend: 存储在 SQLite 数据库中, 每个键一行, 只写入发生变更的键
+"""
+
+import atexit
+import copy
 import json
 import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable
 from .astrbot_path import get_astrbot_data_path
+from astrbot.core.log import LogManager
 
+logger = LogManager.GetLogger(log_name="astrbot")
 
-class SharedPreferences:
-    def __init__(self, path=None):
-        if path is None:
-            path = os.path.join(get_astrbot_data_path(), "shared_preferences.json")
+
+class JsonFileBackend:
+    def __init__(self, path: str):
         self.path = path
-        self._data = self._load_preferences()
 
-    def _load_preferences(self):
+    def load(self) -> Dict[str, Any]:
         if os.path.exists(self.path):
             try:
-                with open(self.path, "r") as f:
+                with open(self.path, "r", encoding="utf-8") as f:
                     return json.load(f)
             except json.JSONDecodeError:
                 os.remove(self.path)
         return {}
 
-    def _save_preferences(self):
-        with open(self.path, "w") as f:
-            json.dump(self._data, f, indent=4, ensure_ascii=False)
+    def save(self, data: Dict[str, Any], changed: Iterable[str]):
+        content = json.dumps(data, ensure_ascii=False)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
             f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class SQLiteBackend:
+    partial = True
+    """save 只读取 changed 中的键, 不需要传入全部数据"""
+
+    def __init__(self, path: str, legacy_json_path: str = None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        """首次创建数据库时, 从该 JSON 文件导入已有的数据"""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self) -> Dict[str, Any]:
+        exists = os.path.exists(self.path)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS preferences(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            conn.commit()
+            if not exists and self.legacy_json_path:
+                data = JsonFileBackend(self.legacy_json_path).load()
+                if data:
+                    logger.info(
+                        f"正在将 {self.legacy_json_path} 中的偏好设置导入数据库。"
+                    )
+                    self._save(conn, data, data.keys())
+                return data
+            return {
+                key: json.loads(value)
+                for key, value in conn.execute("SELECT key, value FROM preferences")
+            }
+        finally:
+            conn.close()
+
+    def save(self, data: Dict[str, Any], changed: Iterable[str]):
+        conn = self._connect()
+        try:
+            self._save(conn, data, changed)
+        finally:
+            conn.close()
+
+    def _save(self, conn: sqlite3.Connection, data: Dict[str, Any], changed):
+        upserts, deletes = [], []
+        for key in changed:
+            if key in data:
+                upserts.append((key, json.dumps(data[key], ensure_ascii=False)))
+            else:
+                deletes.append((key,))
+        with conn:
+            conn.executemany(
+                "INSERT INTO preferences(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                upserts,
+            )
+            conn.executemany("DELETE FROM preferences WHERE key = ?", deletes)
+
+
+class SharedPreferences:
+    save_delay = 1.0
+    """修改后延迟写入的秒数"""
+
+    def __init__(self, path=None, backend=None):
+        """
+        Args:
+            path (str): JSON 文件路径。使用 SQLite 后端时, 数据库文件与其同名, 扩展名为 .db
+            backend: 存储后端。可以是 "json", "sqlite" 或自定义的后端对象, 默认为 "json"
+        """
+        if path is None:
+            path = os.path.join(get_astrbot_data_path(), "shared_preferences.json")
+        self.path = path
+        if backend is None or backend == "json":
+            backend = JsonFileBackend(path)
+        elif backend == "sqlite":
+            backend = SQLiteBackend(
+                os.path.splitext(path)[0] + ".db", legacy_json_path=path
+            )
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty: set = set()
+        self._timer: threading.Timer = None
+        self._data = self._load_preferences()
+        atexit.register(self.flush)
+
+    def _load_preferences(self):
+        return self.backend.load()
+
+    def _mark_dirty(self, *keys):
+        """调用方需持有 _lock"""
+        self._dirty.update(keys)
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """立即将所有修改写入存储后端"""
+        with self._save_lock:
+            # 在 _lock 中复制一份快照, 写入存储时不持有 _lock, 避免阻塞其他线程(例如事件循环)中的修改,
+            # 也避免序列化到一半的值被其他线程修改
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                dirty, self._dirty = self._dirty, set()
+                if getattr(self.backend, "partial", False):
+                    snapshot = {
+                        k: copy.deepcopy(self._data[k])
+                        for k in dirty
+                        if k in self._data
+                    }
+                else:
+                    snapshot = copy.deepcopy(self._data)
+            try:
+                self.backend.save(snapshot, dirty)
+            except Exception as e:
+                logger.error(f"保存偏好设置失败: {e!s}")
+                with self._lock:
+                    self._dirty |= dirty
 
     def get(self, key, default=None):
         return self._data.get(key, default)
 
+    def items(self, prefix: str = ""):
+        """返回键以 prefix 开头的所有键值对"""
+        return [(k, v) for k, v in list(self._data.items()) if k.startswith(prefix)]
+
     def put(self, key, value):
-        self._data[key] = value
-        self._save_preferences()
+        with self._lock:
+            self._data[key] = value
+            self._mark_dirty(key)
 
     def remove(self, key):
-        if key in self._data:
-            del self._data[key]
-            self._save_preferences()
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self._mark_dirty(key)
 
     def clear(self):
-        self._data.clear()
-        self._save_preferences()
+        with self._lock:
+            keys = list(self._data)
+            self._data.clear()
+            self._mark_dirty(*keys)
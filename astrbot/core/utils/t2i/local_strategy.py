@@ -1,41 +1,35 @@
+import asyncio
+import hashlib
+import multiprocessing
 import re
 import os
 import aiohttp
 import ssl
 import certifi
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from abc import ABC, abstractmethod
 from astrbot.core.config import VERSION
 
 from . import RenderStrategy
 from PIL import ImageFont, Image, ImageDraw
-from astrbot.core.utils.io import save_temp_img
+from astrbot.core.log import LogManager
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 
+logger = LogManager.GetLogger(log_name="astrbot")
 
-class FontManager:
-    """字体管理类，负责加载和缓存字体"""
-
-    _font_cache = {}
 
-    @classmethod
-    def get_font(cls, size: int) -> ImageFont.FreeTypeFont:
-        """获取指定大小的字体，优先从缓存获取"""
-        if size in cls._font_cache:
-            return cls._font_cache[size]
+class FontManager:
+    """字体管理类，负责加载和缓存字体
 
-        # 首先尝试加载自定义字体
-        try:
-            font_path = os.path.join(get_astrbot_data_path(), "font.ttf")
-            font = ImageFont.truetype(font_path, size)
-            cls._font_cache[size] = font
-            return font
-        except Exception:
-            pass
+    字体按 (样式, 大小) 缓存。每种样式会依次尝试候选字体文件，第一个能加载的字体文件会被记住，之后加载其他大小时直接使用。
+    """
 
-        # 跨平台常见字体列表
-        fonts = [
+    STYLE_FONTS = {
+        "regular": [
             "msyh.ttc",  # Windows
             "NotoSansCJK-Regular.ttc",  # Linux
             "msyhbd.ttc",  # Windows
@@ -43,28 +37,74 @@ class FontManager:
             "Heiti.ttc",  # macOS
             "Arial.ttf",  # 通用
             "DejaVuSans.ttf",  # Linux
-        ]
+        ],
+        "bold": [
+            "msyhbd.ttc",  # 微软雅黑粗体 (Windows)
+            "Arial-Bold.ttf",  # Arial粗体
+            "DejaVuSans-Bold.ttf",  # Linux粗体
+        ],
+        "italic": [
+            "msyhi.ttc",  # 微软雅黑斜体 (Windows)
+            "Arial-Italic.ttf",  # Arial斜体
+            "DejaVuSans-Oblique.ttf",  # Linux斜体
+        ],
+    }
+    """各个样式的跨平台常见字体列表"""
+
+    _font_cache: Dict[Tuple[str, int], Optional[ImageFont.FreeTypeFont]] = {}
+    _face_cache: Dict[str, Optional[str]] = {}
+    """样式 -> 可以加载的字体文件"""
 
-        for font_name in fonts:
-            try:
-                font = ImageFont.truetype(font_name, size)
-                cls._font_cache[size] = font
-                return font
-            except Exception:
-                continue
+    @classmethod
+    def get_font(cls, size: int) -> ImageFont.FreeTypeFont:
+        """获取指定大小的字体，优先从缓存获取"""
+        font = cls.get_styled_font(size, "regular")
+        if font is not None:
+            return font
 
         # 如果所有字体都失败，使用默认字体
         try:
-            default_font = ImageFont.load_default()
-            # PIL默认字体大小固定，这里不缓存
-            return default_font
+            font = ImageFont.load_default()
+            cls._font_cache[("regular", size)] = font
+            return font
         except Exception:
             raise RuntimeError("无法加载任何字体")
 
+    @classmethod
+    def get_styled_font(cls, size: int, style: str) -> Optional[ImageFont.FreeTypeFont]:
+        """获取指定大小和样式的字体，没有可用的字体文件时返回 None"""
+        key = (style, size)
+        if key in cls._font_cache:
+            return cls._font_cache[key]
+
+        font = None
+        face = cls._face_cache.get(style)
+        if face is not None:
+            font = ImageFont.truetype(face, size)
+        elif style not in cls._face_cache:
+            faces = cls.STYLE_FONTS[style]
+            if style == "regular":
+                # 首先尝试加载自定义字体
+                faces = [os.path.join(get_astrbot_data_path(), "font.ttf")] + faces
+            for face in faces:
+                try:
+                    font = ImageFont.truetype(face, size)
+                    cls._face_cache[style] = face
+                    break
+                except Exception:
+                    continue
+            else:
+                cls._face_cache[style] = None
+        cls._font_cache[key] = font
+        return font
+
 
 class TextMeasurer:
     """测量文本尺寸的工具类"""
 
+    _glyph_widths: Dict[ImageFont.FreeTypeFont, Dict[str, float]] = {}
+    """字体 -> 单个字符的宽度"""
+
     @staticmethod
     def get_text_size(text: str, font: ImageFont.FreeTypeFont) -> Tuple[int, int]:
         """获取文本的尺寸"""
@@ -79,6 +119,62 @@ class TextMeasurer:
             # 兼容旧版本
             return font.getsize(text)
 
+    @staticmethod
+    def _cumulative_widths(text: str, font: ImageFont.FreeTypeFont) -> List[float]:
+        """按单个字符的宽度累加，估算 text 每个前缀的宽度。不考虑字距调整"""
+        widths = TextMeasurer._glyph_widths.setdefault(font, {})
+        result = [0.0]
+        total = 0.0
+        for ch in text:
+            w = widths.get(ch)
+            if w is None:
+                try:
+                    w = font.getlength(ch)
+                except Exception:
+                    w = TextMeasurer.get_text_size(ch, font)[0]
+                widths[ch] = w
+            total += w
+            result.append(total)
+        return result
+
+    @staticmethod
+    def _fit(
+        text: str, start: int, guess: int, font: ImageFont.FreeTypeFont, max_width: int
+    ) -> int:
+        """返回最大的 end，使 text[start:end] 的宽度不超过 max_width。
+
+        从估算的字符数 guess 开始，以倍增的步长向前或向后查找边界，再二分查找，只需要测量 O(log n) 次。
+        """
+        n = len(text) - start
+
+        def fits(k: int) -> bool:
+            return (
+                TextMeasurer.get_text_size(text[start : start + k], font)[0]
+                <= max_width
+            )
+
+        step = 1
+        if fits(guess):
+            lo = guess
+            while lo + step <= n and fits(lo + step):
+                lo += step
+                step *= 2
+            hi = min(lo + step, n + 1)
+        else:
+            hi = guess
+            while hi - step >= 1 and not fits(hi - step):
+                hi -= step
+                step *= 2
+            lo = max(hi - step, 0)
+        # fits(lo) 成立，fits(hi) 不成立
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid
+        return start + lo
+
     @staticmethod
     def split_text_to_fit_width(
         text: str, font: ImageFont.FreeTypeFont, max_width: int
@@ -88,25 +184,18 @@ class TextMeasurer:
         if not text:
             return lines
 
-        remaining_text = text
-        while remaining_text:
-            # 如果文本宽度小于最大宽度，直接添加
-            text_width = TextMeasurer.get_text_size(remaining_text, font)[0]
-            if text_width <= max_width:
-                lines.append(remaining_text)
-                break
-
-            # 尝试逐字计算能放入当前行的最多字符
-            for i in range(len(remaining_text), 0, -1):
-                width = TextMeasurer.get_text_size(remaining_text[:i], font)[0]
-                if width <= max_width:
-                    lines.append(remaining_text[:i])
-                    remaining_text = remaining_text[i:]
-                    break
-            else:
+        cumulative = TextMeasurer._cumulative_widths(text, font)
+        start = 0
+        while start < len(text):
+            # 按字符宽度估算这一行能放下的字符数，再使用实际的排版宽度校正
+            guess = bisect_right(cumulative, cumulative[start] + max_width) - 1 - start
+            guess = min(max(guess, 1), len(text) - start)
+            end = TextMeasurer._fit(text, start, guess, font, max_width)
+            if end == start:
                 # 如果单个字符都放不下，强制放一个字符
-                lines.append(remaining_text[0])
-                remaining_text = remaining_text[1:]
+                end = start + 1
+            lines.append(text[start:end])
+            start = end
 
         return lines
 
@@ -194,19 +283,7 @@ class BoldTextElement(MarkdownElement):
     ) -> int:
         # 尝试使用粗体字体，如果没有则绘制两次模拟粗体效果
         try:
-            bold_fonts = [
-                "msyhbd.ttc",  # 微软雅黑粗体 (Windows)
-                "Arial-Bold.ttf",  # Arial粗体
-                "DejaVuSans-Bold.ttf",  # Linux粗体
-            ]
-
-            bold_font = None
-            for font_name in bold_fonts:
-                try:
-                    bold_font = ImageFont.truetype(font_name, font_size)
-                    break
-                except Exception:
-                    continue
+            bold_font = FontManager.get_styled_font(font_size, "bold")
 
             if bold_font:
                 lines = TextMeasurer.split_text_to_fit_width(
@@ -259,19 +336,7 @@ class ItalicTextElement(MarkdownElement):
     ) -> int:
         # 尝试使用斜体字体，如果没有则使用倾斜变换模拟斜体效果
         try:
-            italic_fonts = [
-                "msyhi.ttc",  # 微软雅黑斜体 (Windows)
-                "Arial-Italic.ttf",  # Arial斜体
-                "DejaVuSans-Oblique.ttf",  # Linux斜体
-            ]
-
-            italic_font = None
-            for font_name in italic_fonts:
-                try:
-                    italic_font = ImageFont.truetype(font_name, font_size)
-                    break
-                except Exception:
-                    continue
+            italic_font = FontManager.get_styled_font(font_size, "italic")
 
             if italic_font:
                 lines = TextMeasurer.split_text_to_fit_width(
@@ -913,20 +978,91 @@ class MarkdownRenderer:
         return image
 
 
+def _touch_cached(path: str) -> bool:
+    """已有渲染结果时更新其修改时间, 避免被定期清理。返回是否已有渲染结果"""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def _render_to_file(text: str, font_size: int, width: int, path: str) -> str:
+    """渲染 Markdown 文本并保存到 path。在渲染进程池中执行
+
+    渲染进程使用 spawn 方式启动, 重新导入本模块, 不依赖父进程中的任何状态。
+    """
+    image = asyncio.run(MarkdownRenderer(font_size=font_size, width=width).render(text))
+    # 先写入临时文件再重命名, 避免其他协程读取到不完整的图片
+    tmp_path = path + ".tmp"
+    image.save(tmp_path, format="JPEG")
+    os.replace(tmp_path, path)
+    return path
+
+
 class LocalRenderStrategy(RenderStrategy):
-    """本地渲染策略实现"""
+    """本地渲染策略实现
+
+    渲染在进程池中进行, 不会阻塞事件循环。进程池使用 spawn 方式启动: 此时进程中已有数据库写线程、日志线程等,
+    fork 出的子进程可能因继承了被其他线程持有的锁而死锁。渲染结果以 (AstrBot 版本, 字号, 宽度, 文本) 的哈希为文件名保存在临时文件夹中,
+    相同的文本再次渲染时直接返回已有的图片, 同时渲染的相同文本只会渲染一次。
+    """
+
+    def __init__(self, max_workers: int = 2, font_size: int = 26, width: int = 800):
+        """
+        Args:
+            max_workers: 渲染进程数。为 0 时在线程中渲染
+        """
+        self.max_workers = max_workers
+        self.font_size = font_size
+        self.width = width
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        """正在渲染的图片路径 -> 渲染任务"""
 
     async def render_custom_template(
         self, tmpl_str: str, tmpl_data: dict, return_url: bool = True
     ) -> str:
         raise NotImplementedError
 
-    async def render(self, text: str, return_url: bool = False) -> str:
-        # 创建渲染器
-        renderer = MarkdownRenderer(font_size=26, width=800)
-
-        # 渲染Markdown文本
-        image = await renderer.render(text)
+    def _cache_path(self, text: str) -> str:
+        key = hashlib.sha256(
+            f"{VERSION}\0{self.font_size}\0{self.width}\0{text}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(get_astrbot_data_path(), "temp", f"t2i_{key[:32]}.jpg")
 
-        # 保存图像并返回路径/URL
-        return save_temp_img(image)
+    async def render(self, text: str, return_url: bool = False) -> str:
+        path = self._cache_path(text)
+        if await asyncio.to_thread(_touch_cached, path):
+            return path
+
+        future = self._pending.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._render(text, path))
+            self._pending[path] = future
+            future.add_done_callback(lambda _: self._pending.pop(path, None))
+        # 等待者被取消时不取消渲染, 其他等待者仍然需要结果
+        return await asyncio.shield(future)
+
+    async def _render(self, text: str, path: str) -> str:
+        args = (text, self.font_size, self.width, path)
+        if self.max_workers > 0:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._pool, _render_to_file, *args
+                )
+            except BrokenProcessPool as e:
+                logger.warning(f"文本转图像渲染进程异常退出, 将重新创建进程池: {e!s}")
+                self._pool = None
+        return await asyncio.to_thread(_render_to_file, *args)
+
+    def terminate(self):
+        """关闭渲染进程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
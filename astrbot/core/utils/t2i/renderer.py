@@ -6,9 +6,9 @@ logger = LogManager.GetLogger(log_name="astrbot")
 
 
 class HtmlRenderer:
-    def __init__(self, endpoint_url: str = None):
+    def __init__(self, endpoint_url: str = None, local_workers: int = 2):
         self.network_strategy = NetworkRenderStrategy(endpoint_url)
-        self.local_strategy = LocalRenderStrategy()
+        self.local_strategy = LocalRenderStrategy(max_workers=local_workers)
 
     def set_network_endpoint(self, endpoint_url: str):
         """设置 t2i 的网络端点。"""
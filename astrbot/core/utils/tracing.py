@@ -0,0 +1,246 @@
+"""
+耗时追踪, 用于统计消息管道各阶段、插件处理函数和 LLM 请求的耗时分布
+
+默认关闭, 通过配置项 `latency_tracing` 开启。关闭时, 各个埋点只会多一次布尔判断。
+
+class:
+    Histogram: 固定分桶的耗时直方图, 支持估算分位数
+    Span: 一次耗时记录, 可以跨越多个 await 步骤累加。分别统计总耗时(wall)和等待耗时(await)
+    LatencyTracer: 按 (指标, 平台, 对象) 维护直方图, 提供 JSON 快照和 Prometheus 文本格式输出
+
+其中, 等待耗时是指协程被挂起、等待 IO 等外部事件的时间, 总耗时减去等待耗时即为在事件循环上实际执行的时间。
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Any, AsyncGenerator, Awaitable, Dict, List, Tuple
+
+# 直方图分桶上界, 单位为秒
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    math.inf,
+)
+
+METRIC_DESCRIPTIONS = {
+    "pipeline_stage": "消息管道各阶段的耗时。洋葱模型的阶段分为 :pre 和 :post 两部分",
+    "plugin_handler": "插件处理函数的耗时",
+    "llm_request": "LLM 提供商请求的耗时",
+    "tool_call": "LLM 函数调用(插件工具函数、MCP 工具)的耗时",
+}
+
+
+class Histogram:
+    """固定分桶的耗时直方图"""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """通过桶内线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if c and cumulative + c >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = min(BUCKETS[i], self.max)
+                return lower + (upper - lower) * ((rank - cumulative) / c)
+            cumulative += c
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class Span:
+    """一次耗时记录。通过 wrap() 包装的每个 await 步骤的耗时都会被累加, 调用 finish() 后写入直方图"""
+
+    __slots__ = ("tracer", "key", "wall", "busy")
+
+    def __init__(self, tracer: "LatencyTracer", key: Tuple[str, str, str]):
+        self.tracer = tracer
+        self.key = key
+        self.wall = 0.0
+        self.busy = 0.0
+
+    def wrap(self, awaitable: Awaitable) -> Awaitable:
+        return _TimedAwaitable(awaitable, self)
+
+    def finish(self):
+        self.tracer.observe(*self.key, self.wall, self.wall - self.busy)
+
+
+class _TimedAwaitable:
+    """驱动被包装的 awaitable, 记录其每一步实际执行(send/throw)的耗时"""
+
+    __slots__ = ("_awaitable", "_span")
+
+    def __init__(self, awaitable: Awaitable, span: Span):
+        self._awaitable = awaitable
+        self._span = span
+
+    def __await__(self):
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        busy = 0.0
+        it = self._awaitable.__await__()
+        value, exc = None, None
+        try:
+            while True:
+                t = perf_counter()
+                try:
+                    if exc is not None:
+                        yielded = it.throw(exc)
+                    else:
+                        yielded = it.send(value)
+                except StopIteration as e:
+                    return e.value
+                finally:
+                    busy += perf_counter() - t
+                value, exc = None, None
+                try:
+                    value = yield yielded
+                except GeneratorExit:
+                    it.close()
+                    raise
+                except BaseException as e:
+                    exc = e
+        finally:
+            self._span.wall += perf_counter() - start
+            self._span.busy += busy
+
+
+class LatencyTracer:
+    """按 (指标, 平台, 对象) 维护耗时直方图"""
+
+    def __init__(self):
+        self.enabled = False
+        self._histograms: Dict[Tuple[str, str, str], Tuple[Histogram, Histogram]] = {}
+        """(指标, 平台, 对象) -> (总耗时直方图, 等待耗时直方图)"""
+
+    def span(self, metric: str, platform: str, target: str) -> Span:
+        return Span(self, (metric, platform, target))
+
+    def observe(
+        self, metric: str, platform: str, target: str, wall: float, wait: float
+    ):
+        key = (metric, platform, target)
+        histograms = self._histograms.get(key)
+        if histograms is None:
+            histograms = self._histograms[key] = (Histogram(), Histogram())
+        histograms[0].observe(wall)
+        histograms[1].observe(wait)
+
+    async def timed(
+        self, awaitable: Awaitable, metric: str, platform: str, target: str
+    ) -> Any:
+        """等待 awaitable 完成, 并记录一次耗时"""
+        span = self.span(metric, platform, target)
+        try:
+            return await span.wrap(awaitable)
+        finally:
+            span.finish()
+
+    async def trace_agen(
+        self, agen: AsyncGenerator, metric: str, platform: str, target: str
+    ) -> AsyncGenerator:
+        """代理一个异步生成器, 将其每一步的耗时累加为一次耗时记录。不包括 yield 出去之后、被再次恢复之前的时间"""
+        span = self.span(metric, platform, target)
+        try:
+            while True:
+                try:
+                    item = await span.wrap(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            span.finish()
+
+    def reset(self):
+        self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        """获取所有直方图的分位数统计, 单位为秒"""
+        ret: Dict[str, List[dict]] = {}
+        for (metric, platform, target), (wall, wait) in sorted(
+            self._histograms.items()
+        ):
+            ret.setdefault(metric, []).append(
+                {
+                    "platform": platform,
+                    "target": target,
+                    "wall": wall.summary(),
+                    "await": wait.summary(),
+                }
+            )
+        return ret
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式输出所有直方图"""
+        series: Dict[str, List[str]] = {}
+        for (metric, platform, target), histograms in sorted(self._histograms.items()):
+            labels = f'platform="{_escape(platform)}",target="{_escape(target)}"'
+            for suffix, h in zip(("seconds", "await_seconds"), histograms):
+                name = f"astrbot_{metric}_{suffix}"
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, c in zip(BUCKETS, h.counts):
+                    cumulative += c
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        out = []
+        for name, lines in series.items():
+            metric = name.removeprefix("astrbot_").removesuffix("_seconds")
+            desc = METRIC_DESCRIPTIONS.get(metric.removesuffix("_await"), metric)
+            if metric.endswith("_await"):
+                desc += " (等待耗时)"
+            out.append(f"# HELP {name} {desc}")
+            out.append(f"# TYPE {name} histogram")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+tracer = LatencyTracer()
@@ -0,0 +1,60 @@
+"""
+有大小上限和有效期的 LRU 缓存
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 600):
+        """
+        Args:
+            max_entries: 最多缓存的条目数, 超出时淘汰最久未访问的条目
+            ttl: 有效期, 单位为秒。为 0 时不缓存
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        """key -> (过期时间, 值)"""
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存的值, 不存在或已过期时返回 None"""
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,57 @@
+import asyncio
+from asyncio import Queue
+from typing import Dict, List
+
+from astrbot.core.log import LogManager
+
+logger = LogManager.GetLogger(log_name="astrbot")
+
+
+class WebChatBroker:
+    """WebChat 输出的发布-订阅代理
+
+    按用户名分发消息, 每个长连接订阅自己用户的消息, 不会取走其他用户的消息。
+    同一个用户可以有多个长连接(例如多个标签页), 每个长连接都会收到一份。
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Args:
+            maxsize: 每个订阅者队列的最大长度
+        """
+        self.maxsize = maxsize
+        self.subscribers: Dict[str, List[Queue]] = {}
+        """用户名 -> 订阅者队列列表"""
+
+    def subscribe(self, username: str) -> Queue:
+        q = Queue(maxsize=self.maxsize)
+        self.subscribers.setdefault(username, []).append(q)
+        return q
+
+    def unsubscribe(self, username: str, q: Queue):
+        queues = self.subscribers.get(username)
+        if not queues or q not in queues:
+            return
+        queues.remove(q)
+        if not queues:
+            del self.subscribers[username]
+
+    def publish(self, username: str, result: dict):
+        """将消息投递给该用户的所有订阅者。非阻塞, 订阅者的队列已满时丢弃该消息
+
+        Args:
+            username: 用户名
+            result: 消息, 包含 type、cid、data、streaming 等字段
+        """
+        for q in self.subscribers.get(username, ()):
+            try:
+                q.put_nowait(result)
+            except asyncio.QueueFull:
+                logger.warning(f"WebChat 用户 {username} 的消息队列已满, 丢弃消息。")
+
+
+def parse_session_id(session_id: str):
+    """从 webchat 的 session_id(webchat!{username}!{cid}) 中解析出用户名和对话 ID"""
+    prefix, cid = session_id.rsplit("!", 1)
+    username = prefix.split("!", 1)[-1]
+    return username, cid
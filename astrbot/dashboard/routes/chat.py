@@ -2,7 +2,7 @@ import uuid
 import json
 import os
 from .route import Route, Response, RouteContext
-from astrbot.core import web_chat_queue, web_chat_back_queue
+from astrbot.core import web_chat_queue, web_chat_broker
 from quart import request, Response as QuartResponse, g, make_response
 from astrbot.core.db import BaseDatabase
 import asyncio
@@ -41,7 +41,6 @@ class ChatRoute(Route):
         self.supported_imgs = ["jpg", "jpeg", "png", "gif", "webp"]
 
         self.curr_user_cid = {}
-        self.curr_chat_sse = {}
 
     async def status(self):
         has_llm_enabled = (
@@ -135,6 +134,19 @@ class ChatRoute(Route):
 
         self.curr_user_cid[username] = conversation_id
 
+        # 持久化。先于处理消息写入, 保证用户的消息排在机器人的回复之前
+        new_his = {"type": "user", "message": message}
+        if image_url:
+            new_his["image_url"] = image_url
+        if audio_url:
+            new_his["audio_url"] = audio_url
+        await self.db.run(
+            self.db.append_conversation_messages,
+            username,
+            conversation_id,
+            [json.dumps(new_his)],
+        )
+
         await web_chat_queue.put(
             (
                 username,
@@ -147,85 +159,48 @@ class ChatRoute(Route):
             )
         )
 
-        # 持久化
-        conversation = self.db.get_conversation_by_user_id(username, conversation_id)
-        try:
-            history = json.loads(conversation.history)
-        except BaseException as e:
-            logger.error(f"Failed to parse conversation history: {e}")
-            history = []
-        new_his = {"type": "user", "message": message}
-        if image_url:
-            new_his["image_url"] = image_url
-        if audio_url:
-            new_his["audio_url"] = audio_url
-        history.append(new_his)
-        self.db.update_conversation(
-            username, conversation_id, history=json.dumps(history)
-        )
-
         return Response().ok().__dict__
 
     async def listener(self):
-        """一直保持长连接"""
-
-        username = g.get("username", "guest")
+        """一直保持长连接
 
-        if username in self.curr_chat_sse:
-            return Response().error("Already connected").__dict__
+        每个长连接只订阅当前用户的消息。机器人的回复在发送时已经持久化, 这里只负责推送。
+        """
 
-        self.curr_chat_sse[username] = None
+        username = g.get("username", "guest")
 
         heartbeat = json.dumps({"type": "heartbeat", "data": "ping"})
 
         async def stream():
+            queue = web_chat_broker.subscribe(username)
             try:
                 yield f"data: {heartbeat}\n\n"  # 心跳包
                 while True:
                     try:
-                        result = await asyncio.wait_for(
-                            web_chat_back_queue.get(), timeout=10
-                        )  # 设置超时时间为5秒
+                        result = await asyncio.wait_for(queue.get(), timeout=10)
                     except asyncio.TimeoutError:
                         yield f"data: {heartbeat}\n\n"  # 心跳包
                         continue
 
-                    if not result:
-                        continue
-
-                    result_text = result["data"]
-                    type = result.get("type")
-                    cid = result.get("cid")
-                    streaming = result.get("streaming", False)
-                    if cid != self.curr_user_cid.get(username):
-                        # 丢弃
-                        continue
-                    yield f"data: {json.dumps(result, ensure_ascii=False)}\n\n"
-                    await asyncio.sleep(0.05)
-
-                    if streaming and type != "end":
-                        continue
-
-                    if type == "update_title":
-                        continue
-
-                    if result_text:
-                        conversation = self.db.get_conversation_by_user_id(
-                            username, cid
-                        )
-                        try:
-                            history = json.loads(conversation.history)
-                        except BaseException as e:
-                            logger.error(f"Failed to parse conversation history: {e}")
-                            history = []
-                        history.append({"type": "bot", "message": result_text})
-                        self.db.update_conversation(
-                            username, cid, history=json.dumps(history)
-                        )
+                    # 将已经到达的消息合并为一次写入
+                    results = [result]
+                    while not queue.empty():
+                        results.append(queue.get_nowait())
+
+                    chunk = "".join(
+                        f"data: {json.dumps(result, ensure_ascii=False)}\n\n"
+                        for result in results
+                        # 只推送当前对话的消息, 其他对话的消息已经持久化
+                        if result
+                        and result.get("cid") == self.curr_user_cid.get(username)
+                    )
+                    if chunk:
+                        yield chunk
             except BaseException as _:
                 logger.debug(f"用户 {username} 断开聊天长连接。")
-                self.curr_chat_sse.pop(username)
                 return
+            finally:
+                web_chat_broker.unsubscribe(username, queue)
 
         response = await make_response(
             stream(),
@@ -245,13 +220,13 @@ class ChatRoute(Route):
         if not conversation_id:
             return Response().error("Missing key: conversation_id").__dict__
 
-        self.db.delete_conversation(username, conversation_id)
+        await self.db.run(self.db.delete_conversation, username, conversation_id)
         return Response().ok().__dict__
 
     async def new_conversation(self):
         username = g.get("username", "guest")
         conversation_id = str(uuid.uuid4())
-        self.db.new_conversation(username, conversation_id)
+        await self.db.run(self.db.new_conversation, username, conversation_id)
         return Response().ok(data={"conversation_id": conversation_id}).__dict__
 
     async def rename_conversation(self):
@@ -263,12 +238,14 @@ class ChatRoute(Route):
         conversation_id = post_data["conversation_id"]
         title = post_data["title"]
 
-        self.db.update_conversation_title(username, conversation_id, title=title)
+        await self.db.run(
+            self.db.update_conversation_title, username, conversation_id, title=title
+        )
         return Response().ok(message="重命名成功！").__dict__
 
     async def get_conversations(self):
         username = g.get("username", "guest")
-        conversations = self.db.get_conversations(username)
+        conversations = await self.db.run(self.db.get_conversations, username)
         return Response().ok(data=conversations).__dict__
 
     async def get_conversation(self):
@@ -277,7 +254,9 @@ class ChatRoute(Route):
         if not conversation_id:
             return Response().error("Missing key: conversation_id").__dict__
 
-        conversation = self.db.get_conversation_by_user_id(username, conversation_id)
+        conversation = await self.db.run(
+            self.db.get_conversation_by_user_id, username, conversation_id
+        )
 
         self.curr_user_cid[username] = conversation_id
 
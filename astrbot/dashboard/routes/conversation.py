@@ -29,6 +29,7 @@ class ConversationRoute(Route):
             ),
         }
         self.db_helper = db_helper
+        self.conv_mgr = core_lifecycle.conversation_manager
         self.register_routes()
 
     async def list_conversations(self):
@@ -38,6 +39,9 @@ class ConversationRoute(Route):
             page = request.args.get("page", 1, type=int)
             page_size = request.args.get("page_size", 20, type=int)
 
+            # 先写回缓存中的变更
+            await self.conv_mgr.flush()
+
             # 获取筛选参数
             platforms = request.args.get("platforms", "")
             message_types = request.args.get("message_types", "")
@@ -63,7 +67,8 @@ class ConversationRoute(Route):
 
             # 使用数据库的分页方法获取会话列表和总数，传入筛选条件
             try:
-                conversations, total_count = self.db_helper.get_filtered_conversations(
+                conversations, total_count = await self.db_helper.run(
+                    self.db_helper.get_filtered_conversations,
                     page=page,
                     page_size=page_size,
                     platforms=platform_list,
@@ -107,7 +112,10 @@ class ConversationRoute(Route):
             if not user_id or not cid:
                 return Response().error("缺少必要参数: user_id 和 cid").__dict__
 
-            conversation = self.db_helper.get_conversation_by_user_id(user_id, cid)
+            await self.conv_mgr.flush(user_id, cid)
+            conversation = await self.db_helper.run(
+                self.db_helper.get_conversation_by_user_id, user_id, cid
+            )
             if not conversation:
                 return Response().error("对话不存在").__dict__
 
@@ -142,13 +150,23 @@ class ConversationRoute(Route):
 
             if not user_id or not cid:
                 return Response().error("缺少必要参数: user_id 和 cid").__dict__
-            conversation = self.db_helper.get_conversation_by_user_id(user_id, cid)
+            conversation = await self.db_helper.run(
+                self.db_helper.get_conversation_by_user_id, user_id, cid
+            )
             if not conversation:
                 return Response().error("对话不存在").__dict__
             if title is not None:
-                self.db_helper.update_conversation_title(user_id, cid, title)
+                await self.db_helper.run(
+                    self.db_helper.update_conversation_title, user_id, cid, title
+                )
             if persona_id is not None:
-                self.db_helper.update_conversation_persona_id(user_id, cid, persona_id)
+                await self.db_helper.run(
+                    self.db_helper.update_conversation_persona_id,
+                    user_id,
+                    cid,
+                    persona_id,
+                )
+            await self.conv_mgr.invalidate(user_id, cid)
 
             return Response().ok({"message": "对话信息更新成功"}).__dict__
 
@@ -165,10 +183,13 @@ class ConversationRoute(Route):
 
             if not user_id or not cid:
                 return Response().error("缺少必要参数: user_id 和 cid").__dict__
-            conversation = self.db_helper.get_conversation_by_user_id(user_id, cid)
+            conversation = await self.db_helper.run(
+                self.db_helper.get_conversation_by_user_id, user_id, cid
+            )
             if not conversation:
                 return Response().error("对话不存在").__dict__
-            self.db_helper.delete_conversation(user_id, cid)
+            await self.conv_mgr.invalidate(user_id, cid, discard=True)
+            await self.db_helper.run(self.db_helper.delete_conversation, user_id, cid)
 
             return Response().ok({"message": "对话删除成功"}).__dict__
 
@@ -202,11 +223,16 @@ class ConversationRoute(Route):
                     Response().error("history 必须是有效的 JSON 字符串或数组").__dict__
                 )
 
-            conversation = self.db_helper.get_conversation_by_user_id(user_id, cid)
+            conversation = await self.db_helper.run(
+                self.db_helper.get_conversation_by_user_id, user_id, cid
+            )
             if not conversation:
                 return Response().error("对话不存在").__dict__
 
-            self.db_helper.update_conversation(user_id, cid, history)
+            await self.conv_mgr.invalidate(user_id, cid, discard=True)
+            await self.db_helper.run(
+                self.db_helper.update_conversation, user_id, cid, history
+            )
 
             return Response().ok({"message": "对话历史更新成功"}).__dict__
 
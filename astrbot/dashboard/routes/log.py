@@ -1,8 +1,51 @@
 import asyncio
 import json
-from quart import make_response
+import logging
+from typing import Callable, Optional
+from quart import make_response, request
 from astrbot.core import logger, LogBroker
-from .route import Route, RouteContext
+from .route import Route, Response, RouteContext
+
+# 每次发送之间的间隔, 期间到达的日志合并为一次发送
+LOG_FLUSH_INTERVAL = 0.07
+# 每次最多发送的日志数
+LOG_MAX_BATCH_SIZE = 500
+
+
+def make_log_filter(
+    level: Optional[str] = None, plugins: Optional[str] = None
+) -> Optional[Callable[[dict], bool]]:
+    """根据请求参数创建日志过滤函数
+
+    Args:
+        level: 最低日志级别, 如 INFO
+        plugins: 以逗号分隔的插件名称, 只保留这些插件输出的日志
+
+    Returns:
+        过滤函数。没有过滤条件时返回 None
+    """
+    min_level = None
+    if level:
+        min_level = logging.getLevelName(level.upper())
+        if not isinstance(min_level, int):
+            raise ValueError(f"未知的日志级别: {level}")
+    plugin_names = (
+        {p.strip() for p in plugins.split(",") if p.strip()} if plugins else None
+    )
+
+    if min_level is None and not plugin_names:
+        return None
+
+    def log_filter(entry: dict) -> bool:
+        if min_level is not None:
+            entry_level = logging.getLevelName(entry.get("level", ""))
+            if isinstance(entry_level, int) and entry_level < min_level:
+                return False
+        if plugin_names and entry.get("plugin") not in plugin_names:
+            return False
+        return True
+
+    return log_filter
 
 
 class LogRoute(Route):
@@ -12,18 +55,54 @@ class LogRoute(Route):
         self.app.add_url_rule("/api/live-log", view_func=self.log, methods=["GET"])
 
     async def log(self):
+        """实时日志
+
+        请求参数:
+            level: 最低日志级别, 如 INFO
+            plugin: 以逗号分隔的插件名称, 只推送这些插件输出的日志
+            batch: 为 1 时, 每次将到达的所有日志合并为一个 log_batch 事件发送;
+                否则每条日志为一个 log 事件, 但仍在同一次写入中发送
+        """
+        try:
+            log_filter = make_log_filter(
+                request.args.get("level"), request.args.get("plugin")
+            )
+        except ValueError as e:
+            return Response().error(str(e)).__dict__
+        batch = request.args.get("batch") == "1"
+
         async def stream():
             queue = None
+            reported_dropped = 0
             try:
-                queue = self.log_broker.register()
+                queue = self.log_broker.register(log_filter)
                 while True:
-                    message = await queue.get()
-                    payload = {
-                        "type": "log",
-                        **message,  # see astrbot/core/log.py
-                    }
-                    yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
-                    await asyncio.sleep(0.07)  # 控制发送频率，避免过快
+                    entries = [await queue.get()]
+                    while not queue.empty() and len(entries) < LOG_MAX_BATCH_SIZE:
+                        entries.append(queue.get_nowait())
+                    # 队列已满而丢弃的日志数
+                    dropped = self.log_broker.dropped.get(queue, 0)
+
+                    if batch:
+                        payload = {
+                            "type": "log_batch",
+                            "data": entries,  # see astrbot/core/log.py
+                            "dropped": dropped,
+                        }
+                        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                    else:
+                        events = [
+                            json.dumps({"type": "log", **entry}, ensure_ascii=False)
+                            for entry in entries
+                        ]
+                        chunk = "".join(f"data: {event}\n\n" for event in events)
+                        if dropped != reported_dropped:
+                            payload = {"type": "log_dropped", "dropped": dropped}
+                            chunk += f"data: {json.dumps(payload)}\n\n"
+                        yield chunk
+                    reported_dropped = dropped
+                    # 控制发送频率，期间到达的日志合并发送
+                    await asyncio.sleep(LOG_FLUSH_INTERVAL)
             except asyncio.CancelledError:
                 pass
             except BaseException as e:
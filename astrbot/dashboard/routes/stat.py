@@ -1,7 +1,5 @@
 import traceback
-import psutil
 import time
-import threading
 from .route import Route, Response, RouteContext
 from astrbot.core import logger
 from quart import request
@@ -10,6 +8,9 @@ from astrbot.core.db import BaseDatabase
 from astrbot.core.config import VERSION
 from astrbot.core.utils.io import get_dashboard_version
 from astrbot.core import DEMO_MODE
+from astrbot.core.utils.tracing import tracer
+from astrbot.core.utils.media_cache import media_cache
+from astrbot.core.stats_service import stats_service, BUCKET_SECONDS
 
 
 class StatRoute(Route):
@@ -22,6 +23,13 @@ class StatRoute(Route):
         super().__init__(context)
         self.routes = {
             "/stat/get": ("GET", self.get_stat),
+            "/stat/event-bus": ("GET", self.get_event_bus_stat),
+            "/stat/latency": ("GET", self.get_latency_stat),
+            "/stat/provider-keys": ("GET", self.get_provider_keys_stat),
+            "/stat/provider-cache": ("GET", self.get_provider_cache_stat),
+            "/stat/platform-cache": ("GET", self.get_platform_cache_stat),
+            "/stat/media-cache": ("GET", self.get_media_cache_stat),
+            "/stat/metrics": ("GET", self.get_metrics),
             "/stat/version": ("GET", self.get_version),
             "/stat/start-time": ("GET", self.get_start_time),
             "/stat/restart-core": ("POST", self.restart_core),
@@ -76,30 +84,98 @@ class StatRoute(Route):
     async def get_start_time(self):
         return Response().ok({"start_time": self.core_lifecycle.start_time}).__dict__
 
+    async def get_event_bus_stat(self):
+        return Response().ok(self.core_lifecycle.event_bus.get_stats()).__dict__
+
+    async def get_latency_stat(self):
+        return (
+            Response()
+            .ok({"enabled": tracer.enabled, "metrics": tracer.snapshot()})
+            .__dict__
+        )
+
+    async def get_provider_keys_stat(self):
+        """各个提供商的 API Key 的并发数、成功/失败/限流次数和平均耗时"""
+        ret = {}
+        for provider_id, inst in self.core_lifecycle.provider_manager.inst_map.items():
+            key_pool = getattr(inst, "key_pool", None)
+            if key_pool is not None:
+                ret[provider_id] = key_pool.stats()
+        return Response().ok(ret).__dict__
+
+    async def get_provider_cache_stat(self):
+        """提供商响应缓存的命中情况"""
+        cache = self.core_lifecycle.provider_manager.response_cache
+        return (
+            Response()
+            .ok({"enabled": cache is not None, **(cache.stats() if cache else {})})
+            .__dict__
+        )
+
+    async def get_platform_cache_stat(self):
+        """各个平台适配器的缓存(如 aiocqhttp 的群成员昵称、引用消息缓存)的命中情况"""
+        ret = {}
+        for inst in self.core_lifecycle.platform_manager.get_insts():
+            caches = getattr(inst, "caches", None)
+            if caches:
+                ret[inst.meta().id] = {
+                    name: cache.stats() for name, cache in caches.items()
+                }
+        return Response().ok(ret).__dict__
+
+    async def get_media_cache_stat(self):
+        """媒体缓存的大小和 URL 索引的命中情况"""
+        return Response().ok(media_cache.stats()).__dict__
+
+    async def get_metrics(self):
+        """Prometheus 文本格式的耗时直方图"""
+        return (
+            tracer.render_prometheus(),
+            200,
+            {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def _query_message_stat(self, offset_sec: int):
+        """从数据库查询消息统计数据, 用于超出内存中保存的时间范围的请求"""
+        stat = await self.db_helper.run(self.db_helper.get_base_stats, offset_sec)
+        now = int(time.time())
+        start_time = now - offset_sec
+        message_time_based_stats = []
+
+        idx = 0
+        for bucket_end in range(start_time, now, BUCKET_SECONDS):
+            cnt = 0
+            while (
+                idx < len(stat.platform) and stat.platform[idx].timestamp < bucket_end
+            ):
+                cnt += stat.platform[idx].count
+                idx += 1
+            message_time_based_stats.append([bucket_end, cnt])
+
+        grouped_stat = await self.db_helper.run(
+            self.db_helper.get_grouped_base_stats, offset_sec
+        )
+        message_count = await self.db_helper.run(self.db_helper.get_total_message_count)
+        return grouped_stat.platform, message_time_based_stats, message_count
+
     async def get_stat(self):
         offset_sec = request.args.get("offset_sec", 86400)
         offset_sec = int(offset_sec)
         try:
-            stat = self.db_helper.get_base_stats(offset_sec)
-            now = int(time.time())
-            start_time = now - offset_sec
-            message_time_based_stats = []
-
-            idx = 0
-            for bucket_end in range(start_time, now, 1800):
-                cnt = 0
-                while (
-                    idx < len(stat.platform)
-                    and stat.platform[idx].timestamp < bucket_end
-                ):
-                    cnt += stat.platform[idx].count
-                    idx += 1
-                message_time_based_stats.append([bucket_end, cnt])
-
-            stat_dict = stat.__dict__
-
-            cpu_percent = psutil.cpu_percent(interval=0.5)
-            thread_count = threading.active_count()
+            messages = stats_service.messages
+            if messages.covers(offset_sec):
+                platform = messages.by_platform(offset_sec)
+                message_time_based_stats = messages.time_series(offset_sec)
+                message_count = messages.total
+            else:
+                (
+                    platform,
+                    message_time_based_stats,
+                    message_count,
+                ) = await self._query_message_stat(offset_sec)
+
+            sampler = stats_service.sampler
+            _, cpu_percent, process_memory, thread_count = sampler.latest()
 
             # 获取插件信息
             plugins = self.core_lifecycle.star_context.get_all_stars()
@@ -117,12 +193,14 @@ class StatRoute(Route):
                 int(time.time()) - self.core_lifecycle.start_time
             )
 
+            stat_dict = {
+                "command": [],
+                "llm": [],
+            }
             stat_dict.update(
                 {
-                    "platform": self.db_helper.get_grouped_base_stats(
-                        offset_sec
-                    ).platform,
-                    "message_count": self.db_helper.get_total_message_count() or 0,
+                    "platform": platform,
+                    "message_count": message_count or 0,
                     "platform_count": len(
                         self.core_lifecycle.platform_manager.get_insts()
                     ),
@@ -131,11 +209,13 @@ class StatRoute(Route):
                     "message_time_series": message_time_based_stats,
                     "running": running_time,  # 现在返回时间组件而不是格式化的字符串
                     "memory": {
-                        "process": psutil.Process().memory_info().rss >> 20,
-                        "system": psutil.virtual_memory().total >> 20,
+                        "process": process_memory,
+                        "system": sampler.system_memory,
                     },
                     "cpu_percent": round(cpu_percent, 1),
                     "thread_count": thread_count,
+                    # (时间, CPU 使用率, 进程内存 MB, 线程数)
+                    "system_time_series": list(sampler.samples),
                     "start_time": self.core_lifecycle.start_time,
                 }
             )
@@ -10,6 +10,10 @@ export const useCommonStore = defineStore({
     sse_connected: false,
 
     log_cache_max_len: 1000,
+    // 累计收到的日志条数, 只增不减。log_cache 超出长度后会从头部删除, 用它判断哪些日志是新增的
+    log_seq: 0,
+    // 服务端因为推送队列已满而丢弃的日志数
+    log_dropped: 0,
     startTime: -1,
 
     pluginMarketData: [],
@@ -25,7 +29,7 @@ export const useCommonStore = defineStore({
         'Content-Type': 'multipart/form-data',
         'Authorization': 'Bearer ' + localStorage.getItem('token')
       };
-      fetch('/api/live-log', {
+      fetch('/api/live-log?batch=1', {
         method: 'GET',
         headers,
         signal,
@@ -36,9 +40,13 @@ export const useCommonStore = defineStore({
         }
         console.log('SSE stream opened');
         this.sse_connected = true;
+        // 丢弃计数按连接统计, 重新连接后从 0 开始
+        this.log_dropped = 0;
 
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        // 一个事件可能被拆分到多次读取中, 保留未完整的部分
+        let buffer = '';
 
         const processStream = ({ done, value }) => {
           if (done) {
@@ -50,8 +58,9 @@ export const useCommonStore = defineStore({
             return;
           }
 
-          const text = decoder.decode(value);
-          const lines = text.split('\n\n');
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n\n');
+          buffer = lines.pop();
           lines.forEach(line => {
             if (line.startsWith('data:')) {
               const data = line.substring(5).trim();
@@ -71,9 +80,19 @@ export const useCommonStore = defineStore({
               if (data_json.type === 'log') {
                 // let log = data_json.data
                 this.log_cache.push(data_json);
-                if (this.log_cache.length > this.log_cache_max_len) {
-                  this.log_cache.shift();
+                this.log_seq++;
+              } else if (data_json.type === 'log_batch') {
+                // {"type":"log_batch","data":[{"level":"INFO","time":"...","data":"..."}],"dropped":0}
+                for (const log of data_json.data) {
+                  this.log_cache.push({ type: 'log', ...log });
                 }
+                this.log_seq += data_json.data.length;
+                this.log_dropped = data_json.dropped;
+              } else if (data_json.type === 'log_dropped') {
+                this.log_dropped = data_json.dropped;
+              }
+              if (this.log_cache.length > this.log_cache_max_len) {
+                this.log_cache.splice(0, this.log_cache.length - this.log_cache_max_len);
               }
             }
           });
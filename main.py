@@ -4,7 +4,7 @@ import sys
 import mimetypes
 from astrbot.core.initial_loader import InitialLoader
 from astrbot.core import db_helper
-from astrbot.core import logger, LogManager, LogBroker
+from astrbot.core import logger, LogManager, LogBroker, astrbot_config
 from astrbot.core.config.default import VERSION
 from astrbot.core.utils.io import download_dashboard, get_dashboard_version
 
@@ -69,7 +69,11 @@ if __name__ == "__main__":
 
     # start log broker
     log_broker = LogBroker()
-    LogManager.set_queue_handler(logger, log_broker)
+    LogManager.set_queue_handler(
+        logger,
+        log_broker,
+        use_listener=astrbot_config.get("log_in_background", True),
+    )
 
     # check dashboard files
     asyncio.run(check_dashboard_files())
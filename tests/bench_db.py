@@ -0,0 +1,130 @@
+"""
+SQLiteDatabase 常用查询在大数据量下的基准测试。
+
+生成 N 个对话(默认 100000, 分布在 N / 10 个会话中)和 2N 条分布在过去 30 天的平台消息统计, 分别测量有索引和删除索引后各个查询的耗时。
+
+平台消息统计存储在按分钟、按小时聚合的表中, 这些表以主键查询, 不受删除索引的影响。
+
+运行: python -m tests.bench_db [对话数]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from astrbot.core.db.sqlite import SQLiteDatabase
+
+
+def populate(db: SQLiteDatabase, n: int):
+    now = int(time.time())
+    rng = random.Random(0)
+    users = [f"aiocqhttp:GroupMessage:{i}" for i in range(max(n // 10, 1))]
+    conversations = []
+    for i in range(n):
+        user_id = users[i % len(users)]
+        ts = now - rng.randint(0, 86400 * 30)
+        conversations.append((user_id, str(uuid.UUID(int=rng.getrandbits(128))), ts))
+
+    conn = db.conn
+    conn.executemany(
+        """
+        INSERT INTO webchat_conversation(user_id, cid, history, created_at, updated_at, context_offset)
+        VALUES (?, ?, NULL, ?, ?, 0)
+        """,
+        [(u, cid, ts, ts) for u, cid, ts in conversations],
+    )
+    conn.executemany(
+        """
+        INSERT INTO webchat_conversation_message(user_id, cid, seq, content) VALUES (?, ?, ?, ?)
+        """,
+        [
+            (u, cid, seq, f'{{"role": "user", "content": "message {seq}"}}')
+            for u, cid, _ in conversations
+            for seq in range(4)
+        ],
+    )
+    for _ in range(n * 2):
+        db._count_metrics(
+            "platform", {f"platform_{rng.randint(0, 9)}": 1}
+        )  # 计入当前分钟
+    # 将计数分散到过去 30 天
+    pending, db._metrics = db._metrics, {}
+    for (kind, name, _), count in pending.items():
+        for _ in range(count):
+            bucket = (now - rng.randint(0, 86400 * 30)) // 60 * 60
+            key = (kind, name, bucket)
+            db._metrics[key] = db._metrics.get(key, 0) + 1
+    conn.commit()
+    db.flush_metrics()
+    db._write(lambda c: db._compact_metrics(c, now))
+    return conversations
+
+
+def measure(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run_queries(db: SQLiteDatabase, conversations, repeat: int) -> dict:
+    rng = random.Random(1)
+    samples = [rng.choice(conversations) for _ in range(repeat)]
+    it = iter(samples * 2)
+
+    def by_user_id():
+        u, cid, _ = next(it)
+        db.get_conversation_by_user_id(u, cid)
+
+    def conversations_of_user():
+        u, _, _ = next(it)
+        db.get_conversations(u)
+
+    return {
+        "get_conversation_by_user_id": measure(by_user_id, repeat),
+        "get_conversations(user_id)": measure(conversations_of_user, repeat),
+        "get_grouped_base_stats(1d)": measure(
+            lambda: db.get_grouped_base_stats(86400), max(repeat // 10, 1)
+        ),
+        "get_base_stats(1d)": measure(
+            lambda: db.get_base_stats(86400), max(repeat // 10, 1)
+        ),
+        "get_all_conversations(page 1)": measure(
+            lambda: db.get_all_conversations(1, 20), max(repeat // 10, 1)
+        ),
+    }
+
+
+def drop_indexes(db: SQLiteDatabase):
+    rows = db.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    ).fetchall()
+    for (name,) in rows:
+        db.conn.execute(f"DROP INDEX {name}")
+    db.conn.commit()
+
+
+def bench(n: int, repeat: int = 200):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = SQLiteDatabase(path)
+    start = time.perf_counter()
+    conversations = populate(db, n)
+    print(f"conversations: {n}, populate: {time.perf_counter() - start:.1f}s")
+
+    indexed = run_queries(db, conversations, repeat)
+    drop_indexes(db)
+    plain = run_queries(db, conversations, max(repeat // 10, 1))
+
+    print(f"{'query':32}{'no index':>14}{'indexed':>14}{'speedup':>10}")
+    for name, cost in indexed.items():
+        print(
+            f"{name:32}{plain[name] * 1e3:11.3f} ms{cost * 1e3:11.3f} ms"
+            f"{plain[name] / cost:9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,72 @@
+"""
+日志开销的基准测试。
+
+日志级别为 INFO(不输出 DEBUG)时, 分别测量:
+    - 被过滤的 DEBUG 日志: f-string 与 % 风格参数的开销。参数为一个包含较长上下文的请求
+    - 输出的 INFO 日志: 处理器在调用方线程中执行, 与使用 QueueListener 在后台线程中执行时, 调用方的开销。
+      控制台输出到 /dev/null, 并有若干个管理面板订阅者
+
+运行: python -m tests.bench_logging [调用次数] [订阅者数]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from astrbot.core.log import LogBroker, LogManager
+from astrbot.core.provider.entities import ProviderRequest
+
+
+def make_request() -> ProviderRequest:
+    contexts = []
+    for i in range(50):
+        contexts.append({"role": "user", "content": f"第 {i} 条消息, " * 20})
+        contexts.append({"role": "assistant", "content": f"第 {i} 条回复, " * 40})
+    return ProviderRequest(prompt="你好", contexts=contexts, system_prompt="系统提示词")
+
+
+def per_call(n: int, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def make_logger(name: str, broker: LogBroker, use_listener: bool) -> logging.Logger:
+    logger = LogManager.GetLogger(log_name=name)
+    logger.propagate = False
+    logger.handlers[0].stream = open(os.devnull, "w")
+    LogManager.set_queue_handler(logger, broker, use_listener=use_listener)
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+async def main(n: int, subscribers: int):
+    broker = LogBroker()
+    for _ in range(subscribers):
+        broker.register()
+    req = make_request()
+
+    sync_logger = make_logger("bench_sync", broker, use_listener=False)
+    print(f"{'case':28}{'us/call':>10}")
+    cost = per_call(n, lambda: sync_logger.debug(f"提供商请求 Payload: {req}"))
+    print(f"{'debug f-string (filtered)':28}{cost:10.2f}")
+    cost = per_call(n, lambda: sync_logger.debug("提供商请求 Payload: %s", req))
+    print(f"{'debug %-style (filtered)':28}{cost:10.2f}")
+
+    cost = per_call(n, lambda: sync_logger.info("收到消息 %s", "hello"))
+    print(f"{'info, inline handlers':28}{cost:10.2f}")
+    async_logger = make_logger("bench_async", broker, use_listener=True)
+    cost = per_call(n, lambda: async_logger.info("收到消息 %s", "hello"))
+    print(f"{'info, QueueListener':28}{cost:10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+        )
+    )
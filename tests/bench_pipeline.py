@@ -0,0 +1,114 @@
+"""
+PipelineScheduler 调度开销的微基准测试。
+
+使用不做任何事情的阶段模拟默认的 9 个阶段(其中 3 个为洋葱模型阶段), 分别测量编译后的执行计划与旧的递归调度方式的单事件调度开销。
+
+运行: python -m tests.bench_pipeline [事件数]
+"""
+
+import asyncio
+import sys
+import time
+from typing import AsyncGenerator, List
+
+from astrbot.core.pipeline.scheduler import PipelineScheduler
+from astrbot.core.pipeline.stage import Stage
+from tests.test_pipeline import FakeAstrMessageEvent
+
+
+class NoopStage(Stage):
+    def __init__(self, name: str, trace: List[str] = None):
+        self.name = name
+        self.trace = trace
+
+    async def initialize(self, ctx) -> None:
+        pass
+
+    async def process(self, event):
+        if self.trace is not None:
+            self.trace.append(self.name)
+
+
+class NoopOnionStage(NoopStage):
+    def __init__(self, name: str, trace: List[str] = None, yields: int = 1):
+        super().__init__(name, trace)
+        self.yields = yields
+
+    async def process(self, event):
+        for _ in range(self.yields):
+            if self.trace is not None:
+                self.trace.append(f"{self.name}.pre")
+            yield
+        if self.trace is not None:
+            self.trace.append(f"{self.name}.post")
+
+
+def make_stages(trace: List[str] = None) -> List[Stage]:
+    return [
+        NoopStage("WakingCheck", trace),
+        NoopStage("WhitelistCheck", trace),
+        NoopStage("RateLimit", trace),
+        NoopOnionStage("ContentSafetyCheck", trace, yields=0),
+        NoopStage("PlatformCompatibility", trace),
+        NoopStage("PreProcess", trace),
+        NoopOnionStage("Process", trace, yields=2),
+        NoopOnionStage("ResultDecorate", trace),
+        NoopStage("Respond", trace),
+    ]
+
+
+async def legacy_process_stages(stages: List[Stage], event, from_stage=0):
+    """旧的递归调度方式, 作为对照"""
+    for i in range(from_stage, len(stages)):
+        stage = stages[i]
+        coroutine = stage.process(event)
+        if isinstance(coroutine, AsyncGenerator):
+            async for _ in coroutine:
+                if event.is_stopped():
+                    break
+                await legacy_process_stages(stages, event, i + 1)
+                if event.is_stopped():
+                    break
+        else:
+            await coroutine
+            if event.is_stopped():
+                break
+
+
+async def check_equivalence():
+    legacy_trace, trace = [], []
+    event = FakeAstrMessageEvent.create_fake_event("bench")
+    await legacy_process_stages(make_stages(legacy_trace), event)
+
+    scheduler = PipelineScheduler(None, make_stages(trace))
+    await scheduler.initialize()
+    await scheduler.execute(event)
+    assert trace == legacy_trace, (trace, legacy_trace)
+
+
+async def bench(n: int):
+    await check_equivalence()
+    events = [FakeAstrMessageEvent.create_fake_event("bench") for _ in range(n)]
+
+    stages = make_stages()
+    start = time.perf_counter()
+    for event in events:
+        await legacy_process_stages(stages, event)
+    legacy_cost = (time.perf_counter() - start) / n
+
+    scheduler = PipelineScheduler(None, make_stages())
+    await scheduler.initialize()
+    plan = scheduler.get_plan("test")
+    start = time.perf_counter()
+    for event in events:
+        await scheduler._process_stages(event, plan)
+    cost = (time.perf_counter() - start) / n
+
+    print(f"events: {n}")
+    print(f"recursive walk:     {legacy_cost * 1e6:8.2f} us/event")
+    print(f"compiled plan:      {cost * 1e6:8.2f} us/event")
+    print(f"speedup:            {legacy_cost / cost:8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
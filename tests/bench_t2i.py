@@ -0,0 +1,92 @@
+"""
+本地文转图渲染器的基准测试。
+
+生成一段约 N 个字符(默认 5000)的 Markdown 格式的 LLM 回答, 分别测量:
+    - 逐个缩短前缀的旧换行算法与当前换行算法的耗时
+    - MarkdownRenderer 完整渲染的耗时
+
+运行: python -m tests.bench_t2i [字符数]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from astrbot.core.utils.t2i.local_strategy import (
+    FontManager,
+    MarkdownRenderer,
+    TextMeasurer,
+)
+
+
+def naive_split(text: str, font, max_width: int) -> list[str]:
+    """旧的换行算法: 从最长的前缀开始逐个尝试"""
+    lines = []
+    while text:
+        for i in range(len(text), 0, -1):
+            if TextMeasurer.get_text_size(text[:i], font)[0] <= max_width:
+                lines.append(text[:i])
+                text = text[i:]
+                break
+        else:
+            lines.append(text[0])
+            text = text[1:]
+    return lines
+
+
+def make_answer(n: int) -> str:
+    rng = random.Random(0)
+    words = [
+        "渲染",
+        "文本",
+        "模型",
+        "回答",
+        "AstrBot",
+        "plugin",
+        "的",
+        "是",
+        "，",
+        "。",
+    ]
+    parts = ["# 回答\n\n"]
+    size = 0
+    while size < n:
+        kind = rng.random()
+        if kind < 0.1:
+            block = f"## 小节 {size}\n\n"
+        elif kind < 0.2:
+            block = "".join(f"- {rng.choice(words) * 3}\n" for _ in range(3)) + "\n"
+        else:
+            block = "".join(rng.choice(words) for _ in range(rng.randint(40, 200)))
+            block += "\n\n"
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+def bench_split(text: str, split) -> float:
+    font = FontManager.get_font(26)
+    start = time.perf_counter()
+    for line in text.split("\n"):
+        split(line, font, 760)
+    return time.perf_counter() - start
+
+
+async def main(n: int):
+    text = make_answer(n)
+    print(f"chars: {len(text)}")
+    print(f"{'method':16}{'cost':>12}")
+    naive = bench_split(text, naive_split)
+    print(f"{'naive split':16}{naive * 1000:10.1f}ms")
+    fast = bench_split(text, TextMeasurer.split_text_to_fit_width)
+    print(f"{'split':16}{fast * 1000:10.1f}ms")
+
+    start = time.perf_counter()
+    await MarkdownRenderer().render(text)
+    render = time.perf_counter() - start
+    print(f"{'render':16}{render * 1000:10.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
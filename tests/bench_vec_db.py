@@ -0,0 +1,80 @@
+"""
+FaissVecDB 导入文档的吞吐量基准测试。
+
+使用本地生成随机向量的嵌入提供商(每次请求模拟 5ms 网络延迟), 分别测量逐条 insert 和 insert_batch 导入 N 条文本的耗时。
+逐条 insert 每插入一条都会重写整个索引文件, 总耗时随数量平方增长, 因此只导入前 min(N, 2000) 条。
+
+运行: python -m tests.bench_vec_db [文本数] [向量维度]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from astrbot.core.db.vec_db.faiss_impl import FaissVecDB
+
+
+class RandomEmbeddingProvider:
+    def __init__(self, dim: int, latency: float = 0.005, batch_size: int = 256):
+        self.dim = dim
+        self.latency = latency
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(0)
+
+    async def get_embedding(self, text: str) -> list[float]:
+        return (await self.get_embeddings([text]))[0]
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.latency)
+        v = self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+        return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+    def get_dim(self) -> int:
+        return self.dim
+
+    def get_batch_size(self) -> int:
+        return self.batch_size
+
+
+async def ingest(n: int, dim: int, batch: bool) -> float:
+    path = tempfile.mkdtemp()
+    db = FaissVecDB(
+        os.path.join(path, "doc.db"),
+        os.path.join(path, "index.faiss"),
+        RandomEmbeddingProvider(dim),
+    )
+    await db.initialize()
+    texts = [f"知识库文本块 {i} " * 20 for i in range(n)]
+    start = time.perf_counter()
+    if batch:
+        await db.insert_batch(texts)
+    else:
+        for text in texts:
+            await db.insert(text)
+    cost = time.perf_counter() - start
+    assert await db.count_documents() == n
+    await db.close()
+    return cost
+
+
+async def main(n: int, dim: int):
+    single_n = min(n, 2000)
+    single = await ingest(single_n, dim, batch=False)
+    batch = await ingest(n, dim, batch=True)
+    print(f"dim: {dim}")
+    print(f"{'method':16}{'docs':>8}{'total':>12}{'docs/s':>12}")
+    print(f"{'insert':16}{single_n:8}{single:11.2f}s{single_n / single:12.0f}")
+    print(f"{'insert_batch':16}{n:8}{batch:11.2f}s{n / batch:12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 768,
+        )
+    )
@@ -0,0 +1,145 @@
+"""
+WebChat 多会话流式输出的压力测试。
+
+若干个用户同时在线, 每个用户的对话中已有一定数量的历史消息, 机器人同时向所有用户流式输出回复。分别测量:
+    - 全局队列: 所有长连接从同一个队列中取消息, 丢弃不属于自己的消息, 每推送一个片段等待 50ms;
+      回复结束后读取并重写整个对话历史
+    - 按用户分发: 每个长连接只订阅自己的消息; 回复结束后只追加一条消息
+以及单独测量保存一条回复的耗时: 重写整个对话历史与只追加一条消息
+
+运行: python -m tests.bench_webchat [用户数] [每个回复的片段数] [已有的历史消息数]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core.webchat_broker import WebChatBroker
+
+
+def make_db(path: str, users: int, history: int) -> SQLiteDatabase:
+    db = SQLiteDatabase(path)
+    messages = [json.dumps({"type": "bot", "message": "历史消息" * 50})] * history
+    for i in range(users):
+        db.new_conversation(f"user{i}", "cid")
+        db.append_conversation_messages(f"user{i}", "cid", messages)
+    return db
+
+
+async def global_queue(db: SQLiteDatabase, users: int, chunks: int):
+    queue = asyncio.Queue(maxsize=32)
+    received = [0] * users
+
+    async def listener(i: int):
+        while True:
+            result = await queue.get()
+            try:
+                if result["user"] != i:
+                    # 丢弃
+                    continue
+                received[i] += 1
+                await asyncio.sleep(0.05)
+                if result["type"] == "end":
+                    conversation = await db.run(
+                        db.get_conversation_by_user_id, f"user{i}", "cid"
+                    )
+                    history = json.loads(conversation.history)
+                    history.append({"type": "bot", "message": result["data"]})
+                    await db.run(
+                        db.update_conversation, f"user{i}", "cid", json.dumps(history)
+                    )
+            finally:
+                queue.task_done()
+
+    async def producer(i: int):
+        for _ in range(chunks):
+            await queue.put({"user": i, "type": "plain", "data": "片段"})
+        await queue.put({"user": i, "type": "end", "data": "片段" * chunks})
+
+    listeners = [asyncio.create_task(listener(i)) for i in range(users)]
+    await asyncio.gather(*[producer(i) for i in range(users)])
+    # 等待所有消息被取走并处理
+    await queue.join()
+    for task in listeners:
+        task.cancel()
+    return sum(received)
+
+
+async def broker_fanout(db: SQLiteDatabase, users: int, chunks: int):
+    broker = WebChatBroker()
+    received = [0] * users
+
+    async def listener(i: int, queue: asyncio.Queue):
+        while True:
+            result = await queue.get()
+            received[i] += 1
+            if result["type"] == "end":
+                return
+
+    async def producer(i: int):
+        for _ in range(chunks):
+            broker.publish(f"user{i}", {"type": "plain", "data": "片段"})
+            await asyncio.sleep(0)
+        broker.publish(f"user{i}", {"type": "end", "data": "片段" * chunks})
+        await db.run(
+            db.append_conversation_messages,
+            f"user{i}",
+            "cid",
+            [json.dumps({"type": "bot", "message": "片段" * chunks})],
+        )
+
+    listeners = [
+        asyncio.create_task(listener(i, broker.subscribe(f"user{i}")))
+        for i in range(users)
+    ]
+    await asyncio.gather(*[producer(i) for i in range(users)], *listeners)
+    return sum(received)
+
+
+def persist(db: SQLiteDatabase, users: int, append: bool) -> float:
+    message = {"type": "bot", "message": "回复"}
+    start = time.perf_counter()
+    for i in range(users):
+        if append:
+            db.append_conversation_messages(f"user{i}", "cid", [json.dumps(message)])
+        else:
+            conversation = db.get_conversation_by_user_id(f"user{i}", "cid")
+            history = json.loads(conversation.history)
+            history.append(message)
+            db.update_conversation(f"user{i}", "cid", json.dumps(history))
+    return (time.perf_counter() - start) / users * 1000
+
+
+async def main(users: int, chunks: int, history: int):
+    expected = users * (chunks + 1)
+    print(f"{'case':16}{'seconds':>10}{'delivered':>12}")
+    for name, fn in (
+        ("global queue", global_queue),
+        ("per-user broker", broker_fanout),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = make_db(os.path.join(tmp, "bench.db"), users, history)
+            start = time.perf_counter()
+            delivered = await fn(db, users, chunks)
+            cost = time.perf_counter() - start
+            print(f"{name:16}{cost:10.2f}{delivered:>6}/{expected}")
+
+    print(f"\n{'persist':16}{'ms/reply':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(os.path.join(tmp, "bench.db"), users, history)
+        print(f"{'rewrite history':16}{persist(db, users, append=False):10.2f}")
+        print(f"{'append':16}{persist(db, users, append=True):10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 40,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 500,
+        )
+    )
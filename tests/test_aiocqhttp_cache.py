@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from aiocqhttp import Event
+
+from astrbot.core.message.components import At, Reply
+from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_platform_adapter import (
+    AiocqhttpAdapter,
+)
+from astrbot.core.utils.ttl_cache import TTLCache
+
+
+def make_payload(message_id: int, user_id: int, nickname: str, message: list) -> dict:
+    return {
+        "post_type": "message",
+        "message_type": "group",
+        "self_id": 10000,
+        "group_id": 123,
+        "message_id": message_id,
+        "user_id": user_id,
+        "sender": {"user_id": user_id, "nickname": nickname},
+        "message": message,
+    }
+
+
+@pytest.fixture
+def adapter():
+    adapter = AiocqhttpAdapter(
+        {"ws_reverse_host": "", "ws_reverse_port": 0},
+        {"unique_session": False},
+        asyncio.Queue(),
+    )
+    adapter.actions = []
+    stored = {
+        1: make_payload(1, 222, "Bob", [{"type": "text", "data": {"text": "hi"}}])
+    }
+
+    async def call_action(action, **params):
+        adapter.actions.append(action)
+        if action == "get_stranger_info":
+            return {"nick": f"user{params['user_id']}"}
+        if action == "get_msg":
+            return stored[params["message_id"]]
+
+    adapter.bot.call_action = call_action
+    return adapter
+
+
+def test_ttl_cache(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    # b 最久未访问, 被淘汰
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_at_nickname_cache(adapter):
+    at = [{"type": "at", "data": {"qq": "333"}}]
+    for i in range(3):
+        abm = await adapter.convert_message(
+            Event.from_payload(make_payload(10 + i, 111, "Alice", at))
+        )
+        assert abm.message[0] == At(qq="333", name="user333")
+    assert adapter.actions == ["get_stranger_info"]
+
+    # 发送过消息的用户直接使用消息中的昵称
+    abm = await adapter.convert_message(
+        Event.from_payload(
+            make_payload(20, 111, "Alice", [{"type": "at", "data": {"qq": "111"}}])
+        )
+    )
+    assert abm.message[0].name == "Alice"
+    assert adapter.actions == ["get_stranger_info"]
+
+
+@pytest.mark.asyncio
+async def test_reply_cache(adapter):
+    reply = [{"type": "reply", "data": {"id": "1"}}]
+    for i in range(2):
+        abm = await adapter.convert_message(
+            Event.from_payload(make_payload(30 + i, 111, "Alice", reply))
+        )
+        assert isinstance(abm.message[0], Reply)
+        assert abm.message[0].message_str == "hi"
+    assert adapter.actions == ["get_msg"]
+
+    # 已经收到过的消息被引用时不需要查询
+    await adapter.convert_message(
+        Event.from_payload(
+            make_payload(40, 111, "Alice", [{"type": "text", "data": {"text": "yo"}}])
+        )
+    )
+    abm = await adapter.convert_message(
+        Event.from_payload(
+            make_payload(41, 222, "Bob", [{"type": "reply", "data": {"id": "40"}}])
+        )
+    )
+    assert abm.message[0].message_str == "yo"
+    assert abm.message[0].sender_nickname == "Alice"
+    assert adapter.actions == ["get_msg"]
+    assert adapter.reply_cache.stats()["hits"] == 2
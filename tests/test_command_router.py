@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from astrbot.core.pipeline.waking_check.command_router import CommandRouter
+from astrbot.core.platform.message_type import MessageType
+from astrbot.core.star.filter.command import CommandFilter
+from astrbot.core.star.filter.command_group import CommandGroupFilter
+from astrbot.core.star.filter.event_message_type import (
+    EventMessageTypeFilter,
+    EventMessageType,
+)
+from astrbot.core.star.filter.regex import RegexFilter
+from astrbot.core.star.star_handler import EventType, StarHandlerMetadata
+
+
+async def cmd_handler(self, event, arg: str = ""):
+    pass
+
+
+def make_handler(name: str, *filters):
+    md = StarHandlerMetadata(
+        event_type=EventType.AdapterMessageEvent,
+        handler_full_name=f"tests_{name}",
+        handler_name=name,
+        handler_module_path="tests",
+        handler=cmd_handler,
+        event_filters=list(filters),
+    )
+    for f in filters:
+        if isinstance(f, CommandFilter):
+            f.init_handler_md(md)
+    return md
+
+
+def make_event(message: str, wake: bool = True):
+    return SimpleNamespace(
+        message_str=message,
+        is_at_or_wake_command=wake,
+        get_message_str=lambda: message,
+        get_message_type=lambda: MessageType.FRIEND_MESSAGE,
+        get_extra=lambda *args: None,
+        set_extra=lambda *args: None,
+    )
+
+
+group = CommandGroupFilter("todo", alias={"td"})
+handlers = [
+    make_handler("help", CommandFilter("help", alias={"帮助"})),
+    make_handler(
+        "todo_add",
+        CommandFilter("add", parent_command_names=group.get_complete_command_names()),
+    ),
+    make_handler("todo", group),
+    make_handler("hello", RegexFilter(r"^hello\s*world")),
+    make_handler("repeat", RegexFilter(r"(\w)\1{3}")),
+    make_handler("ignore_case", RegexFilter(r"(?i)^ping")),
+    make_handler("all", EventMessageTypeFilter(EventMessageType.ALL)),
+    make_handler("empty"),
+]
+
+
+def candidates(message: str, wake: bool = True):
+    router = CommandRouter(handlers)
+    return [h.handler_name for h in router.candidates(make_event(message, wake))]
+
+
+def test_commands():
+    assert candidates("help") == ["help", "all"]
+    assert candidates("帮助  me") == ["help", "all"]
+    assert candidates("helpme") == ["all"]
+    assert candidates("help", wake=False) == ["all"]
+
+
+def test_command_groups():
+    assert candidates("todo") == ["todo", "all"]
+    assert candidates("td add buy milk") == ["todo_add", "all"]
+    # 指令组只在消息恰好为指令组名时匹配
+    assert candidates("todo list") == ["all"]
+
+
+def test_regex():
+    assert candidates("hello world", wake=False) == ["hello", "all"]
+    assert candidates("aaaa") == ["repeat", "all"]
+    assert candidates("PING") == ["ignore_case", "all"]
+    assert candidates("nothing here") == ["all"]
+
+
+def test_candidates_cover_passing_handlers():
+    router = CommandRouter(handlers)
+    messages = ["help", "help x", "td", "todo add a", "hello  world", "bbbb", "x"]
+    for message in messages:
+        for wake in (True, False):
+            event = make_event(message, wake)
+            selected = router.candidates(event)
+            for handler in handlers:
+                if not handler.event_filters:
+                    continue
+                try:
+                    passed = all(f.filter(event, {}) for f in handler.event_filters)
+                except ValueError:
+                    # 指令组参数不足
+                    passed = True
+                if passed:
+                    assert handler in selected, (message, wake, handler.handler_name)
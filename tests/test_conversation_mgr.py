@@ -0,0 +1,123 @@
+import pytest
+import json
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core import conversation_mgr
+from astrbot.core.conversation_mgr import ConversationManager
+from astrbot.core.utils.shared_preferences import SharedPreferences
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteDatabase(str(tmp_path / "test.db"))
+
+
+@pytest.fixture(autouse=True)
+def sp(tmp_path, monkeypatch):
+    """ConversationManager 会写入会话与对话的映射, 使用临时文件, 避免修改 data 目录中的数据"""
+    sp = SharedPreferences(str(tmp_path / "sp.json"), backend="sqlite")
+    sp.save_delay = 60
+    monkeypatch.setattr(conversation_mgr, "sp", sp)
+    return sp
+
+
+@pytest.mark.asyncio
+async def test_conversation_write_behind(db):
+    mgr = ConversationManager(db)
+    umo = "test:FriendMessage:123"
+    cid = await mgr.new_conversation(umo)
+
+    history = [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+    await mgr.update_conversation(umo, cid, history)
+    # 缓存中的数据立即可见, 数据库中的数据在写回后才更新
+    assert await mgr.get_conversation_history(umo, cid) == history
+    assert json.loads((await mgr.get_conversation(umo, cid)).history) == history
+    assert db.get_conversation_by_user_id(umo, cid).history == "[]"
+
+    await mgr.flush()
+    assert json.loads(db.get_conversation_by_user_id(umo, cid).history) == history
+
+    # 修改返回的副本不影响缓存
+    copied = await mgr.get_conversation_history(umo, cid)
+    copied[0]["content"] = "changed"
+    copied.append({"role": "user", "content": "x"})
+    assert await mgr.get_conversation_history(umo, cid) == history
+
+
+@pytest.mark.asyncio
+async def test_conversation_cache_eviction(db):
+    mgr = ConversationManager(db)
+    mgr.cache_size = 2
+    umo = "test:FriendMessage:123"
+    cids = [await mgr.new_conversation(umo) for _ in range(4)]
+    for i, cid in enumerate(cids):
+        await mgr.update_conversation(umo, cid, [{"role": "user", "content": str(i)}])
+    assert len(mgr._cache) == 2
+
+    # 被淘汰但未写回的对话仍然可以读到最新的数据
+    assert await mgr.get_conversation_history(umo, cids[0]) == [
+        {"role": "user", "content": "0"}
+    ]
+    await mgr.flush()
+    assert not mgr._evicted
+    for i, cid in enumerate(cids):
+        history = json.loads(db.get_conversation_by_user_id(umo, cid).history)
+        assert history == [{"role": "user", "content": str(i)}]
+
+    await mgr.delete_conversation(umo)
+    assert (umo, cids[-1]) not in mgr._cache
+
+
+@pytest.mark.asyncio
+async def test_conversation_append_only(db):
+    mgr = ConversationManager(db)
+    umo = "test:FriendMessage:123"
+    cid = await mgr.new_conversation(umo)
+    msgs = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": str(i)}
+        for i in range(6)
+    ]
+
+    await mgr.update_conversation(umo, cid, msgs[:4])
+    await mgr.flush()
+    # 截断前两条消息并追加两条消息, 只会写入新的消息
+    await mgr.update_conversation(umo, cid, msgs[2:6])
+    await mgr.flush()
+    stored = db.get_conversation_messages(umo, cid)
+    assert [json.loads(m) for m in stored] == msgs
+    conversation = db.get_conversation_by_user_id(umo, cid)
+    assert conversation.context_offset == 2
+    assert json.loads(conversation.history) == msgs[2:6]
+    assert [
+        json.loads(m) for m in db.get_conversation_messages(umo, cid, limit=2)
+    ] == msgs[4:]
+
+    # 整体改写上下文
+    edited = [{"role": "user", "content": "edited"}]
+    await mgr.update_conversation(umo, cid, edited)
+    await mgr.flush()
+    assert json.loads(db.get_conversation_by_user_id(umo, cid).history) == edited
+    assert len(db.get_conversation_messages(umo, cid)) == 3
+
+
+@pytest.mark.asyncio
+async def test_session_conversation_keys(db, sp, tmp_path, monkeypatch):
+    sp.put("session_conversation", {"a": "1", "b": "2"})
+
+    # 旧版本的映射拆分为每个会话一个键
+    mgr = ConversationManager(db)
+    assert mgr.session_conversations == {"a": "1", "b": "2"}
+    assert sp.get("session_conversation") is None
+    sp.flush()
+
+    # 切换对话只写入该会话的键
+    await mgr.switch_conversation("a", "3")
+    assert sp._dirty == {"session_conversation:a"}
+    await mgr.delete_conversation("b")
+    sp.flush()
+
+    reloaded = SharedPreferences(str(tmp_path / "sp.json"), backend="sqlite")
+    monkeypatch.setattr(conversation_mgr, "sp", reloaded)
+    assert ConversationManager(db).session_conversations == {"a": "3"}
@@ -0,0 +1,179 @@
+import pytest
+import asyncio
+from asyncio import Queue
+from astrbot.core.event_bus import EventBus
+from tests.test_pipeline import FakeAstrMessageEvent
+
+
+class FakeScheduler:
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.executed = []
+
+    async def execute(self, event):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.executed.append((event.unified_msg_origin, event.message_str))
+        self.running -= 1
+
+
+def make_bus(scheduler, **dispatcher):
+    config = {"platform_settings": {"dispatcher": dispatcher}}
+    return EventBus(Queue(), scheduler, config)
+
+
+async def run_bus(bus: EventBus, events, timeout: float = 2):
+    for event in events:
+        bus.event_queue.put_nowait(event)
+    task = asyncio.create_task(bus.dispatch())
+    for _ in range(int(timeout / 0.01)):
+        await asyncio.sleep(0.01)
+        stats = bus.get_stats()
+        if stats["processed"] + stats["dropped"] == len(events):
+            break
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_event_bus_max_concurrency():
+    scheduler = FakeScheduler()
+    bus = make_bus(scheduler, max_concurrency=3)
+    events = [
+        FakeAstrMessageEvent.create_fake_event(str(i), session_id=f"s{i}")
+        for i in range(10)
+    ]
+    await run_bus(bus, events)
+    assert len(scheduler.executed) == 10
+    assert scheduler.max_running == 3
+    assert bus.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_event_bus_session_ordering():
+    scheduler = FakeScheduler()
+    bus = make_bus(scheduler, max_concurrency=4, session_ordering=True)
+    events = [
+        FakeAstrMessageEvent.create_fake_event(str(i), session_id=f"s{i % 2}")
+        for i in range(8)
+    ]
+    await run_bus(bus, events)
+    assert scheduler.max_running == 2
+    for sid in ("s0", "s1"):
+        msgs = [int(m) for umo, m in scheduler.executed if umo.endswith(sid)]
+        assert msgs == sorted(msgs)
+
+
+@pytest.mark.asyncio
+async def test_event_bus_discard_new():
+    scheduler = FakeScheduler(delay=0.05)
+    bus = make_bus(
+        scheduler, max_concurrency=1, max_pending=2, overload_strategy="discard_new"
+    )
+    events = [
+        FakeAstrMessageEvent.create_fake_event(str(i), session_id=f"s{i}")
+        for i in range(6)
+    ]
+    await run_bus(bus, events)
+    stats = bus.get_stats()
+    assert stats["dropped"] > 0
+    assert stats["processed"] + stats["dropped"] == 6
+
+
+class GatedScheduler(FakeScheduler):
+    """事件在 gate 打开之前一直处于执行中"""
+
+    def __init__(self):
+        super().__init__(delay=0)
+        self.gate = asyncio.Event()
+        self.started = 0
+
+    async def execute(self, event):
+        self.started += 1
+        await self.gate.wait()
+        await super().execute(event)
+
+
+async def wait_until(predicate, timeout: float = 2):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timeout")
+
+
+@pytest.mark.asyncio
+async def test_event_bus_stall():
+    scheduler = GatedScheduler()
+    bus = make_bus(
+        scheduler, max_concurrency=1, max_pending=2, overload_strategy="stall"
+    )
+    events = [
+        FakeAstrMessageEvent.create_fake_event(str(i), session_id=f"s{i}")
+        for i in range(5)
+    ]
+    bus.event_queue.put_nowait(events[0])
+    task = asyncio.create_task(bus.dispatch())
+    try:
+        await wait_until(lambda: scheduler.started == 1)
+        for event in events[1:]:
+            bus.event_queue.put_nowait(event)
+        # 第 1 个事件执行中, 2 个事件等待, 第 4 个事件阻塞在入队处, 第 5 个事件仍在事件队列中
+        await wait_until(lambda: bus.stats.received == 4)
+        await asyncio.sleep(0.05)
+        stats = bus.get_stats()
+        assert stats["received"] == 4
+        assert stats["pending"] == 2
+        assert stats["event_queue_size"] == 1
+        assert stats["dropped"] == 0
+
+        scheduler.gate.set()
+        await wait_until(lambda: bus.stats.processed == 5)
+        assert [m for _, m in scheduler.executed] == ["0", "1", "2", "3", "4"]
+        assert bus.get_stats()["dropped"] == 0
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_event_bus_discard_oldest():
+    scheduler = GatedScheduler()
+    bus = make_bus(
+        scheduler, max_concurrency=1, max_pending=2, overload_strategy="discard_oldest"
+    )
+    events = [
+        FakeAstrMessageEvent.create_fake_event(str(i), session_id=f"s{i}")
+        for i in range(5)
+    ]
+    bus.event_queue.put_nowait(events[0])
+    task = asyncio.create_task(bus.dispatch())
+    try:
+        await wait_until(lambda: scheduler.started == 1)
+        for event in events[1:]:
+            bus.event_queue.put_nowait(event)
+        # 第 1 个事件执行中, 等待中的事件达到上限后, 每来一个新事件就丢弃最早的等待事件
+        await wait_until(lambda: bus.stats.received == 5)
+        stats = bus.get_stats()
+        assert stats["dropped"] == 2
+        assert stats["pending"] == 2
+
+        scheduler.gate.set()
+        await wait_until(lambda: bus.stats.processed == 3)
+        assert [m for _, m in scheduler.executed] == ["0", "3", "4"]
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_event_bus_failed_event():
+    class FailingScheduler(FakeScheduler):
+        async def execute(self, event):
+            raise ValueError("boom")
+
+    bus = make_bus(FailingScheduler(), max_concurrency=1)
+    await run_bus(bus, [FakeAstrMessageEvent.create_fake_event("x")])
+    stats = bus.get_stats()
+    assert stats["failed"] == 1
+    assert stats["processed"] == 1
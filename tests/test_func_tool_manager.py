@@ -0,0 +1,102 @@
+from astrbot.core.provider.func_tool_manager import FuncCall, FuncTool
+
+
+async def handler(event, **kwargs):
+    return "ok"
+
+
+def make_func_call(n: int = 3) -> FuncCall:
+    fc = FuncCall()
+    for i in range(n):
+        fc.add_func(
+            f"tool_{i}",
+            [{"type": "string", "name": "query", "description": "查询内容"}],
+            f"工具 {i}",
+            handler,
+        )
+    return fc
+
+
+def names(desc: list) -> list:
+    return [d["function"]["name"] for d in desc]
+
+
+def test_desc_is_cached():
+    fc = make_func_call()
+    first = fc.get_func_desc_openai_style()
+    second = fc.get_func_desc_openai_style()
+    assert names(first) == ["tool_0", "tool_1", "tool_2"]
+    assert first == second
+    assert all(a is b for a, b in zip(first, second))
+    # 不同的选项分别缓存
+    assert fc.get_func_desc_anthropic_style()[0]["name"] == "tool_0"
+    assert fc.get_func_desc_google_genai_style()["function_declarations"][1][
+        "name"
+    ] == ("tool_1")
+
+
+def test_cache_invalidation():
+    fc = make_func_call()
+    fc.get_func_desc_openai_style()
+
+    fc.remove_func("tool_1")
+    assert names(fc.get_func_desc_openai_style()) == ["tool_0", "tool_2"]
+
+    fc.add_func("tool_3", [], "工具 3", handler)
+    assert names(fc.get_func_desc_openai_style()) == ["tool_0", "tool_2", "tool_3"]
+
+    # 直接修改工具的激活状态
+    fc.get_func("tool_0").active = False
+    assert names(fc.get_func_desc_openai_style()) == ["tool_2", "tool_3"]
+    assert [t["name"] for t in fc.get_func_desc_anthropic_style()] == [
+        "tool_2",
+        "tool_3",
+    ]
+
+    # 整体替换工具列表(例如 MCP 服务被关闭)
+    fc.func_list = [f for f in fc.func_list if f.name != "tool_3"]
+    assert names(fc.get_func_desc_openai_style()) == ["tool_2"]
+
+
+def test_omit_empty_parameter_field():
+    fc = FuncCall()
+    fc.func_list.append(
+        FuncTool(name="empty", parameters={"type": "object"}, description="")
+    )
+    assert "parameters" in fc.get_func_desc_openai_style()[0]["function"]
+    assert (
+        "parameters"
+        not in (
+            fc.get_func_desc_openai_style(omit_empty_parameter_field=True)[0][
+                "function"
+            ]
+        )
+    )
+
+
+def test_select_subset():
+    fc = make_func_call(5)
+    subset = fc.select(["tool_1", "tool_3", "missing"])
+    assert names(subset.get_func_desc_openai_style()) == ["tool_1", "tool_3"]
+    assert subset.get_func("tool_3") is fc.get_func("tool_3")
+    assert subset.get_func("tool_0") is None
+    assert subset.mcp_client_dict is fc.mcp_client_dict
+    # 子集的工具描述缓存在原 FuncCall 中
+    assert any(subset.names in key for key in fc._desc_cache)
+    assert names(subset.select(["tool_3"]).get_func_desc_openai_style()) == ["tool_3"]
+
+    fc.get_func("tool_1").active = False
+    assert names(subset.get_func_desc_openai_style()) == ["tool_3"]
+    # 原 FuncCall 不受影响
+    assert len(fc.get_func_desc_openai_style()) == 4
+
+    # 子集是只读视图, 没有增删工具的接口, 修改 func_list 不影响原 FuncCall
+    assert not isinstance(subset, FuncCall)
+    assert not hasattr(subset, "add_func")
+    subset.func_list.clear()
+    assert [f.name for f in subset.func_list] == ["tool_1", "tool_3"]
+    # 原 FuncCall 上新增的工具在子集中可见
+    fc.remove_func("tool_3")
+    assert subset.get_func("tool_3") is None
+    fc.add_func("tool_3", [], "工具 3", handler)
+    assert names(subset.get_func_desc_openai_style()) == ["tool_3"]
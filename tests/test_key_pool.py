@@ -0,0 +1,65 @@
+import pytest
+import asyncio
+import time
+from astrbot.core.provider.key_pool import ApiKeyPool
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str = None):
+        super().__init__("Error code: 429")
+        self.response = type(
+            "Response",
+            (),
+            {"headers": {"retry-after": retry_after} if retry_after else {}},
+        )()
+
+
+def make_pool(keys, rpm=0):
+    return ApiKeyPool(keys, lambda k: f"client-{k}", rpm=rpm)
+
+
+@pytest.mark.asyncio
+async def test_least_loaded_and_client_per_key():
+    pool = make_pool(["a", "b", "c"])
+    leased = [await pool.acquire() for _ in range(3)]
+    # 并发请求分配到不同的 Key, 每个 Key 使用自己的客户端
+    assert sorted(k.key for k in leased) == ["a", "b", "c"]
+    assert all(k.client == f"client-{k.key}" for k in leased)
+    pool.release(leased[1], 0.1)
+    assert (await pool.acquire()).key == leased[1].key
+    assert (await pool.acquire(exclude=["a", "b"])).key == "c"
+    with pytest.raises(LookupError):
+        await pool.acquire(exclude=["a", "b", "c"])
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_cooldown():
+    pool = make_pool(["a", "b"])
+    with pytest.raises(RateLimitError):
+        async with pool.lease(exclude=["b"]):
+            raise RateLimitError(retry_after="30")
+    a = pool.get("a")
+    assert 29 < a.cooldown_until - time.monotonic() <= 30
+    # a 冷却中, 所有请求都使用 b
+    for _ in range(3):
+        async with pool.lease() as key:
+            assert key.key == "b"
+    stats = {s["key"]: s for s in pool.stats()}
+    assert stats["a..."]["rate_limited"] == 1
+    assert stats["b..."]["successes"] == 3
+
+    # 所有 Key 都在冷却时等待最早可用的 Key
+    pool.cooldown(pool.get("b"), 0.05)
+    start = time.monotonic()
+    key = await asyncio.wait_for(pool.acquire(exclude=["a"]), 1)
+    assert key.key == "b" and time.monotonic() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_token_bucket():
+    pool = make_pool(["a", "b"], rpm=2)
+    keys = [(await pool.acquire()).key for _ in range(4)]
+    assert sorted(keys) == ["a", "a", "b", "b"]
+    assert pool._pick(pool.keys, time.monotonic()) > 0  # 令牌耗尽
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+from astrbot.core.log import LogBroker, LogManager, LogQueueHandler, get_plugin_name
+from astrbot.dashboard.routes.log import make_log_filter
+
+
+@pytest.mark.asyncio
+async def test_publish_from_thread():
+    broker = LogBroker()
+    q = broker.register()
+    thread = threading.Thread(
+        target=broker.publish, args=({"level": "INFO", "data": "x", "time": ""},)
+    )
+    thread.start()
+    thread.join()
+    entry = await asyncio.wait_for(q.get(), 1)
+    assert entry["data"] == "x"
+
+
+@pytest.mark.asyncio
+async def test_listener():
+    logger = logging.getLogger("test_log_listener")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    broker = LogBroker()
+    q = broker.register()
+    handler = LogQueueHandler(broker)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(handler)
+    listener = LogManager.start_listener(logger)
+    try:
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+        logger.info("hello %s", "world")
+        entry = await asyncio.wait_for(q.get(), 1)
+        assert entry["level"] == "INFO"
+        assert "hello world" in entry["data"]
+    finally:
+        listener.stop()
+
+
+def entry(level: str, plugin: str = None) -> dict:
+    return {"level": level, "data": level, "time": "", "plugin": plugin}
+
+
+@pytest.mark.asyncio
+async def test_register_filter_and_dropped():
+    broker = LogBroker()
+    broker.publish(entry("DEBUG"))
+    broker.publish(entry("INFO"))
+    q = broker.register(make_log_filter("info"))
+    # 缓存中的日志同样经过过滤
+    assert q.qsize() == 1
+    for _ in range(q.maxsize + 5):
+        broker.publish(entry("DEBUG"))
+        broker.publish(entry("WARNING"))
+    assert q.full()
+    assert broker.dropped[q] == 6
+    broker.unregister(q)
+    assert q not in broker.dropped
+
+
+def test_make_log_filter():
+    assert make_log_filter() is None
+    with pytest.raises(ValueError):
+        make_log_filter("verbose")
+    log_filter = make_log_filter(plugins="a, b")
+    assert log_filter(entry("DEBUG", "a"))
+    assert not log_filter(entry("ERROR"))
+    log_filter = make_log_filter("WARNING", "a")
+    assert not log_filter(entry("INFO", "a"))
+    assert log_filter(entry("ERROR", "a"))
+
+
+def test_get_plugin_name():
+    assert get_plugin_name("/app/data/plugins/helloworld/main.py") == "helloworld"
+    assert get_plugin_name("/app/packages/astrbot/main.py") == "astrbot"
+    assert get_plugin_name("/app/astrbot/core/log.py") is None
+    assert get_plugin_name(None) is None
@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+
+from astrbot.core.utils.io import file_to_base64
+from astrbot.core.utils.media_cache import MediaCache
+
+
+async def start_server():
+    requests = []
+
+    async def handler(request: web.Request):
+        requests.append(request.path)
+        await asyncio.sleep(0.05)
+        if request.path == "/missing":
+            return web.Response(status=404)
+        name = request.path.rsplit("/", 1)[-1]
+        return web.Response(body=name.encode() * 1000)
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", requests
+
+
+@pytest.mark.asyncio
+async def test_fetch(tmp_path):
+    runner, base, requests = await start_server()
+    cache = MediaCache(root=str(tmp_path))
+    try:
+        # 同时请求同一个 URL 只下载一次
+        paths = await asyncio.gather(*[cache.fetch(f"{base}/a") for _ in range(3)])
+        assert len(set(paths)) == 1
+        assert await cache.fetch(f"{base}/a") == paths[0]
+        assert requests == ["/a"]
+        assert await asyncio.to_thread(read_bytes, paths[0]) == b"a" * 1000
+
+        # 内容相同的文件只保存一份
+        assert await cache.fetch(f"{base}/x/a") == paths[0]
+        assert len(os.listdir(tmp_path)) == 1
+
+        with pytest.raises(Exception):
+            await cache.fetch(f"{base}/missing")
+        assert len(os.listdir(tmp_path)) == 1
+    finally:
+        await cache.close()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_put_bytes_and_evict(tmp_path):
+    cache = MediaCache(root=str(tmp_path), max_bytes=2500)
+    first = await cache.put_bytes(b"1" * 1000)
+    assert await cache.put_bytes(b"1" * 1000) == first
+    await asyncio.to_thread(set_atime, first, 0)
+    await cache.put_bytes(b"2" * 1000)
+    # 超出上限, 删除最久未使用的文件
+    await cache.put_bytes(b"3" * 1000)
+    assert not await asyncio.to_thread(os.path.exists, first)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_private_copy(tmp_path):
+    runner, base, requests = await start_server()
+    cache = MediaCache(root=str(tmp_path / "cache"), temp_root=str(tmp_path / "temp"))
+    try:
+        shared = await cache.fetch(f"{base}/a")
+        private = await cache.fetch(f"{base}/a", private=True)
+        assert private != shared
+        assert requests == ["/a"]
+        # 原地改写私有副本不影响缓存文件的内容和修改时间
+        mtime = await asyncio.to_thread(os.path.getmtime, shared)
+        await asyncio.to_thread(write_bytes, private, b"changed")
+        assert await asyncio.to_thread(read_bytes, shared) == b"a" * 1000
+        assert await asyncio.to_thread(os.path.getmtime, shared) == mtime
+        # 删除私有副本不影响缓存
+        await asyncio.to_thread(os.remove, private)
+        assert await asyncio.to_thread(os.path.exists, shared)
+        assert await cache.fetch(f"{base}/a") == shared
+
+        private = await cache.put_bytes(b"b" * 10, private=True)
+        assert os.path.dirname(private) == str(tmp_path / "temp")
+        await asyncio.to_thread(os.remove, private)
+        assert await cache.put_bytes(b"b" * 10) in [
+            os.path.join(cache.root, name) for name in os.listdir(cache.root)
+        ]
+    finally:
+        await cache.close()
+        await runner.cleanup()
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_bytes(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def set_atime(path: str, atime: float):
+    os.utime(path, (atime, os.path.getmtime(path)))
+
+
+def test_file_to_base64(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"abc")
+    assert file_to_base64(str(path)) == "base64://YWJj"
+    assert file_to_base64(str(path)) is file_to_base64(str(path))
+    path.write_bytes(b"abcd")
+    assert file_to_base64(str(path)) == "base64://YWJjZA=="
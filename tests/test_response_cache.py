@@ -0,0 +1,144 @@
+import pytest
+from astrbot.core.db.po import Conversation
+from astrbot.core.provider.entities import LLMResponse, ProviderRequest
+from astrbot.core.provider.provider import ProviderMeta
+from astrbot.core.provider.response_cache import (
+    ResponseCache,
+    install_chat_cache,
+    install_embedding_cache,
+    supports_chat_cache,
+)
+
+
+class FakeProvider:
+    def __init__(self):
+        self.provider_config = {"id": "fake", "model_config": {"temperature": 0}}
+        self.calls = []
+
+    def meta(self):
+        return ProviderMeta(id="fake", model="m", type="fake")
+
+    def get_model(self):
+        return "m"
+
+    def get_dim(self):
+        return 2
+
+    async def text_chat(self, prompt=None, session_id=None, contexts=None, **kwargs):
+        self.calls.append(prompt)
+        if prompt == "error":
+            return LLMResponse("err", "failed")
+        return LLMResponse("assistant", f"answer to {prompt}")
+
+    async def get_embedding(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0]
+
+    async def get_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+@pytest.mark.asyncio
+async def test_chat_cache(tmp_path):
+    provider = FakeProvider()
+    cache = ResponseCache(max_entries=2, disk_path=str(tmp_path / "cache.db"))
+    install_chat_cache(provider, cache)
+
+    for _ in range(3):
+        resp = await provider.text_chat("hi", session_id="a", contexts=[])
+        assert resp.completion_text == "answer to hi"
+    # session_id 不影响缓存键, 上下文不同时不命中
+    await provider.text_chat("hi", session_id="b", contexts=[])
+    await provider.text_chat("hi", contexts=[{"role": "user", "content": "x"}])
+    assert provider.calls == ["hi", "hi"]
+
+    # 出错的响应不缓存
+    await provider.text_chat("error")
+    await provider.text_chat("error")
+    assert provider.calls.count("error") == 2
+
+    # 内存中被淘汰后从磁盘读取, 新的缓存实例也可以读取磁盘中的结果
+    await provider.text_chat("q1")
+    await provider.text_chat("q2")
+    cache2 = ResponseCache(disk_path=str(tmp_path / "cache.db"))
+    provider2 = FakeProvider()
+    install_chat_cache(provider2, cache2)
+    assert (
+        await provider2.text_chat("hi", contexts=[])
+    ).completion_text == "answer to hi"
+    assert provider2.calls == []
+    assert cache2.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_cache_pipeline_request():
+    provider = FakeProvider()
+    cache = ResponseCache()
+    install_chat_cache(provider, cache)
+    # 管道以 text_chat(**req.__dict__) 调用, conversation 等会话状态不参与计算缓存键
+    for umo in ("test:FriendMessage:a", "test:FriendMessage:b"):
+        req = ProviderRequest(
+            prompt="hi",
+            session_id=umo,
+            contexts=[],
+            conversation=Conversation(umo, f"cid-{umo}", "[]", 1, 2),
+        )
+        resp = await provider.text_chat(**req.__dict__)
+        assert resp.completion_text == "answer to hi"
+    assert provider.calls == ["hi"]
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_cache_deterministic_only():
+    provider = FakeProvider()
+    provider.provider_config["model_config"]["temperature"] = 0.7
+    install_chat_cache(provider, ResponseCache())
+    await provider.text_chat("hi")
+    await provider.text_chat("hi")
+    # 请求参数中指定 temperature 为 0 时缓存
+    await provider.text_chat("hi", temperature=0)
+    await provider.text_chat("hi", temperature=0)
+    assert provider.calls == ["hi", "hi", "hi"]
+
+    provider = FakeProvider()
+    provider.provider_config["model_config"]["temperature"] = 0.7
+    install_chat_cache(provider, ResponseCache(deterministic_only=False))
+    await provider.text_chat("hi")
+    await provider.text_chat("hi")
+    assert provider.calls == ["hi"]
+
+
+def test_supports_chat_cache():
+    assert supports_chat_cache({"type": "openai_chat_completion"})
+    assert not supports_chat_cache({"type": "dify"})
+    assert not supports_chat_cache({"type": "dashscope"})
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl():
+    provider = FakeProvider()
+    cache = ResponseCache(ttl=-1)  # 立即过期
+    install_chat_cache(provider, cache)
+    await provider.text_chat("hi")
+    await provider.text_chat("hi")
+    assert len(provider.calls) == 2
+    assert cache.stats()["hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache():
+    provider = FakeProvider()
+    install_embedding_cache(provider, ResponseCache())
+    assert await provider.get_embedding("abc") == [3.0, 1.0]
+    assert await provider.get_embeddings(["abc", "de", "de", "f"]) == [
+        [3.0, 1.0],
+        [2.0, 1.0],
+        [2.0, 1.0],
+        [1.0, 1.0],
+    ]
+    # 批量请求只请求未命中且去重后的文本
+    assert provider.calls == ["abc", ["de", "f"]]
+    assert await provider.get_embedding("f") == [1.0, 1.0]
+    assert len(provider.calls) == 2
@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+from astrbot.core.utils.shared_preferences import SharedPreferences
+
+
+def test_json_backend_debounced(tmp_path):
+    path = str(tmp_path / "sp.json")
+    sp = SharedPreferences(path)
+    sp.save_delay = 60
+    for i in range(100):
+        sp.put("session_conversation", {f"s{j}": str(j) for j in range(i)})
+    sp.put("alter_cmd", {"a": 1})
+    assert not os.path.exists(path)  # 修改被合并, 还未写入
+
+    sp.flush()
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert len(data["session_conversation"]) == 99
+    assert not os.path.exists(path + ".tmp")
+
+    sp.remove("alter_cmd")
+    sp.flush()
+    assert SharedPreferences(path).get("alter_cmd") is None
+
+
+def test_sqlite_backend(tmp_path):
+    path = str(tmp_path / "sp.json")
+    legacy = SharedPreferences(path)
+    legacy.put("inactivated_plugins", ["a"])
+    legacy.flush()
+
+    sp = SharedPreferences(path, backend="sqlite")
+    assert sp.get("inactivated_plugins") == ["a"]  # 首次使用时导入 JSON 文件
+    sp.put("curr_provider", "openai")
+    sp.remove("inactivated_plugins")
+    sp.flush()
+
+    conn = sqlite3.connect(str(tmp_path / "sp.db"))
+    assert conn.execute("SELECT key, value FROM preferences").fetchall() == [
+        ("curr_provider", '"openai"')
+    ]
+    conn.close()
+    assert SharedPreferences(path, backend="sqlite").get("curr_provider") == "openai"
+
+
+def test_flush_snapshot(tmp_path):
+    class Backend:
+        def __init__(self):
+            self.saved = []
+
+        def load(self):
+            return {}
+
+        def save(self, data, changed):
+            # 模拟写入期间其他线程原地修改值
+            sp.get("history").append("late")
+            self.saved.append((json.dumps(data), set(changed)))
+
+    backend = Backend()
+    sp = SharedPreferences(str(tmp_path / "sp.json"), backend=backend)
+    sp.save_delay = 60
+    sp.put("history", ["a"])
+    sp.flush()
+    # 写入的是 flush 时的快照, 不受写入期间修改的影响
+    assert backend.saved == [('{"history": ["a"]}', {"history"})]
+    assert sp.get("history") == ["a", "late"]
@@ -0,0 +1,115 @@
+import json
+import time
+import sqlite3
+
+import pytest
+
+from astrbot.core.db import sqlite_migrations
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core.db.sqlite_migrations import MIGRATIONS, get_version
+
+
+def test_migrate_legacy_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE webchat_conversation(user_id TEXT, cid TEXT, history TEXT, created_at INTEGER, updated_at INTEGER)"
+    )
+    history = [{"role": "user", "content": "hi"}]
+    for ts in (1, 2):  # 重复的 (user_id, cid)
+        conn.execute(
+            "INSERT INTO webchat_conversation VALUES ('u', 'c', ?, ?, ?)",
+            (json.dumps(history), ts, ts),
+        )
+    conn.execute(
+        "CREATE TABLE webchat_conversation_message(user_id TEXT NOT NULL, cid TEXT NOT NULL, seq INTEGER NOT NULL, content TEXT, PRIMARY KEY (user_id, cid, seq))"
+    )
+    # 对话已被删除, 但消息还留在表中
+    conn.execute(
+        "INSERT INTO webchat_conversation_message VALUES ('u', 'gone', 0, '{}')"
+    )
+    conn.commit()
+    conn.close()
+
+    db = SQLiteDatabase(path)
+    assert get_version(db.conn) == MIGRATIONS[-1][0]
+    conversation = db.get_conversation_by_user_id("u", "c")
+    assert json.loads(conversation.history) == history
+    assert conversation.updated_at == 2
+    assert len(db.get_conversations("u")) == 1
+    assert db.get_conversation_messages("u", "gone") == []
+
+    plan = db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM webchat_conversation WHERE user_id = ? AND cid = ?",
+        ("u", "c"),
+    ).fetchall()
+    assert "idx_webchat_conversation_user_cid" in str(plan)
+
+    # 再次打开时不会重复迁移
+    db = SQLiteDatabase(path)
+    assert len(db.get_conversation_messages("u", "c")) == 1
+
+
+def test_metric_rollups(tmp_path):
+    path = str(tmp_path / "metrics.db")
+    now = int(time.time())
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE platform(name VARCHAR(32), count INTEGER, timestamp INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO platform VALUES (?, 1, ?)",
+        [("qq", now - 100), ("qq", now - 5 * 86400), ("tg", now - 50)],
+    )
+    conn.commit()
+    conn.close()
+
+    db = SQLiteDatabase(path)
+    # 原始数据被聚合, 原始表被清空
+    assert db.conn.execute("SELECT COUNT(*) FROM platform").fetchone()[0] == 0
+    assert db.get_total_message_count() == 3
+    # 原始表上的索引已被删除
+    indexes = db.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ('platform', 'llm', 'command')"
+    ).fetchall()
+    assert indexes == []
+
+    db.insert_platform_metrics({"qq": 1})
+    db.insert_platform_metrics({"qq": 2})
+    # 还未写入数据库的计数也会被统计
+    assert db.get_total_message_count() == 6
+    db.flush_metrics()
+    assert db.get_total_message_count() == 6
+    grouped = {p.name: p.count for p in db.get_grouped_base_stats(86400).platform}
+    assert grouped == {"qq": 4, "tg": 1}
+    stats = db.get_base_stats(7 * 86400).platform
+    assert sum(p.count for p in stats) == 6
+    assert [p.timestamp for p in stats] == sorted(p.timestamp for p in stats)
+
+    # 过期的分钟数据合并到小时表
+    db._write(lambda c: db._compact_metrics(c, now + 3 * 86400))
+    assert db.conn.execute("SELECT COUNT(*) FROM metrics_minute").fetchone()[0] == 0
+    assert sum(p.count for p in db.get_base_stats(7 * 86400).platform) == 6
+
+
+def test_metric_rollups_mismatch(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE platform(name VARCHAR(32), count INTEGER, timestamp INTEGER)"
+    )
+    conn.execute("INSERT INTO platform VALUES ('qq', 1, ?)", (int(time.time()),))
+    conn.commit()
+    conn.close()
+
+    counts = iter([(0, 0), (0, 0)])
+    monkeypatch.setattr(
+        sqlite_migrations, "_rollup_counts", lambda c, kind: next(counts, (5, 5))
+    )
+    # 聚合后的计数与原始数据不一致时迁移回滚, 原始数据保留
+    with pytest.raises(Exception, match="计数不一致"):
+        SQLiteDatabase(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM platform").fetchone()[0] == 1
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-2][0]
+    conn.close()
@@ -0,0 +1,102 @@
+import pytest
+from astrbot.core.star.star import StarMetadata, star_map
+from astrbot.core.star.star_handler import (
+    EventType,
+    StarHandlerMetadata,
+    StarHandlerRegistry,
+)
+
+
+async def handler(event):
+    pass
+
+
+def make_handler(
+    module: str, name: str, event_type=EventType.OnLLMRequestEvent, priority=None
+):
+    extras = {} if priority is None else {"priority": priority}
+    return StarHandlerMetadata(
+        event_type=event_type,
+        handler_full_name=f"{module}_{name}",
+        handler_name=name,
+        handler_module_path=module,
+        handler=handler,
+        event_filters=[],
+        extras_configs=extras,
+    )
+
+
+@pytest.fixture
+def plugins():
+    modules = ["tests.plugin_a", "tests.plugin_b"]
+    for module in modules:
+        star_map[module] = StarMetadata(
+            name=module, author="", desc="", version="", module_path=module
+        )
+    yield [star_map[m] for m in modules]
+    for module in modules:
+        star_map.pop(module, None)
+
+
+def names(handlers):
+    return [h.handler_name for h in handlers]
+
+
+def test_priority_order(plugins):
+    registry = StarHandlerRegistry()
+    registry.append(make_handler("tests.plugin_a", "a"))
+    registry.append(make_handler("tests.plugin_a", "b", priority=10))
+    registry.append(make_handler("tests.plugin_b", "c"))
+    registry.append(make_handler("tests.plugin_b", "d", priority=10))
+    registry.append(make_handler("tests.plugin_b", "e", priority=-1))
+    assert names(registry) == ["b", "d", "a", "c", "e"]
+
+
+def test_index_invalidation(plugins):
+    registry = StarHandlerRegistry()
+    registry.append(make_handler("tests.plugin_a", "a"))
+    registry.append(make_handler("tests.plugin_b", "b"))
+    registry.append(
+        make_handler("tests.plugin_b", "other", event_type=EventType.OnLLMResponseEvent)
+    )
+
+    def get(platform_id=None):
+        return names(
+            registry.get_handlers_by_event_type(
+                EventType.OnLLMRequestEvent, platform_id=platform_id
+            )
+        )
+
+    assert get() == ["a", "b"]
+    # 返回的列表可以被调用方修改
+    registry.get_handlers_by_event_type(EventType.OnLLMRequestEvent).clear()
+    assert get() == ["a", "b"]
+
+    # 禁用插件
+    plugins[0].activated = False
+    assert get() == ["b"]
+    plugins[0].activated = True
+    assert get() == ["a", "b"]
+
+    # 平台兼容性配置
+    plugins[1].update_platform_compatibility(
+        {"qq": {"tests.plugin_b": False}, "tg": {}}
+    )
+    assert get("qq") == ["a"]
+    assert get("tg") == ["a", "b"]
+
+    # 增删 Handler
+    new = make_handler("tests.plugin_a", "c", priority=1)
+    registry.append(new)
+    assert get("tg") == ["c", "a", "b"]
+    registry.remove(new)
+    assert get("tg") == ["a", "b"]
+
+    # 卸载插件
+    del star_map["tests.plugin_a"]
+    assert get() == ["b"]
+    assert names(
+        registry.get_handlers_by_event_type(
+            EventType.OnLLMRequestEvent, only_activated=False
+        )
+    ) == ["a", "b"]
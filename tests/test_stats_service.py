@@ -0,0 +1,57 @@
+import time
+
+from astrbot.core.db.po import Platform
+from astrbot.core.stats_service import BUCKET_SECONDS, MessageStats, SystemSampler
+
+
+def test_message_stats():
+    now = int(time.time())
+    stats = MessageStats(retention=86400)
+    assert not stats.covers(3600)
+
+    # 加载数据库之前收到的消息不会丢失
+    stats.record("aiocqhttp")
+    stats.load(
+        [
+            Platform("aiocqhttp", 2, now - 3 * BUCKET_SECONDS),
+            Platform("telegram", 5, now - 3 * BUCKET_SECONDS),
+        ],
+        100,
+    )
+    stats.record("telegram", 2)
+    assert stats.covers(3600)
+    assert not stats.covers(86400 * 2)
+    assert stats.total == 103
+
+    series = stats.time_series(4 * BUCKET_SECONDS)
+    assert sum(count for _, count in series) == 10
+    assert series[-1][1] == 3
+    assert series[-1][0] > now
+    assert all(b[0] - a[0] == BUCKET_SECONDS for a, b in zip(series, series[1:]))
+
+    counts = {p.name: p.count for p in stats.by_platform(4 * BUCKET_SECONDS)}
+    assert counts == {"aiocqhttp": 3, "telegram": 7}
+    counts = {p.name: p.count for p in stats.by_platform(BUCKET_SECONDS // 2)}
+    assert counts == {"aiocqhttp": 1, "telegram": 2}
+
+
+def test_message_stats_expire():
+    now = int(time.time())
+    stats = MessageStats(retention=BUCKET_SECONDS)
+    stats.load([Platform("aiocqhttp", 1, now - 10 * BUCKET_SECONDS)], 1)
+    stats.buckets.pop(now // BUCKET_SECONDS, None)
+    stats.record("aiocqhttp")
+    assert list(stats.buckets) == [now // BUCKET_SECONDS]
+
+
+def test_system_sampler():
+    sampler = SystemSampler(interval=0.01, history=3)
+    ts, cpu, memory, threads = sampler.latest()
+    assert memory > 0 and threads >= 1
+    assert sampler.system_memory >= memory
+    sampler.start()
+    try:
+        time.sleep(0.2)
+    finally:
+        sampler.stop()
+    assert len(sampler.samples) == 3
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import random
+
+import pytest
+from PIL import Image
+
+from astrbot.core.utils.io import clean_temp_dir
+from astrbot.core.utils.t2i.local_strategy import (
+    FontManager,
+    LocalRenderStrategy,
+    MarkdownRenderer,
+    TextMeasurer,
+)
+
+
+@pytest.fixture
+def font():
+    return FontManager.get_font(26)
+
+
+@pytest.mark.parametrize("max_width", [10, 100, 333, 760])
+def test_split_text_to_fit_width(font, max_width):
+    rng = random.Random(max_width)
+    for _ in range(50):
+        text = "".join(
+            rng.choice("abc WWii.，中文字符") for _ in range(rng.randint(0, 300))
+        )
+        lines = TextMeasurer.split_text_to_fit_width(text, font, max_width)
+        assert "".join(lines) == text
+        pos = 0
+        for line in lines:
+            pos += len(line)
+            width = TextMeasurer.get_text_size(line, font)[0]
+            assert len(line) == 1 or width <= max_width
+            if pos < len(text):
+                # 每一行都尽可能地长
+                longer = text[pos - len(line) : pos + 1]
+                assert TextMeasurer.get_text_size(longer, font)[0] > max_width
+
+
+def test_font_cache():
+    assert FontManager.get_font(30) is FontManager.get_font(30)
+    assert FontManager.get_styled_font(30, "bold") is FontManager.get_styled_font(
+        30, "bold"
+    )
+
+
+@pytest.mark.asyncio
+async def test_render():
+    image = await MarkdownRenderer().render("# 标题\n\n**粗体** *斜体* 文本" * 20)
+    assert image.width == 800
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ASTRBOT_ROOT", str(tmp_path))
+    path = tmp_path / "data" / "temp"
+    path.mkdir(parents=True)
+    return path
+
+
+def set_back_mtime(path: str, seconds: float) -> float:
+    """将文件的修改时间提前 seconds 秒, 返回原来的修改时间"""
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime - seconds, mtime - seconds))
+    return mtime
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_workers", [0, 1])
+async def test_local_render_cache(temp_dir, max_workers):
+    strategy = LocalRenderStrategy(max_workers=max_workers)
+    try:
+        # 同时渲染的相同文本只渲染一次
+        paths = await asyncio.gather(*[strategy.render("# 缓存") for _ in range(3)])
+        assert len(set(paths)) == 1
+        assert os.listdir(temp_dir) == [os.path.basename(paths[0])]
+        assert Image.open(paths[0]).width == 800
+
+        mtime = await asyncio.to_thread(set_back_mtime, paths[0], 100)
+        assert await strategy.render("# 缓存") == paths[0]
+        assert await asyncio.to_thread(os.path.getmtime, paths[0]) > mtime - 100
+
+        assert await strategy.render("# 其他文本") != paths[0]
+        assert len(os.listdir(temp_dir)) == 2
+    finally:
+        strategy.terminate()
+
+
+def test_clean_temp_dir(temp_dir):
+    old = temp_dir / "old.jpg"
+    new = temp_dir / "new.jpg"
+    old.write_bytes(b"")
+    new.write_bytes(b"")
+    os.utime(old, (0, 0))
+    assert clean_temp_dir() == 1
+    assert os.listdir(temp_dir) == ["new.jpg"]
@@ -0,0 +1,104 @@
+import pytest
+
+from astrbot.core.provider.entities import ProviderRequest
+from astrbot.core.provider.token_budget import (
+    MESSAGE_OVERHEAD,
+    EstimateTokenizer,
+    TokenCounter,
+)
+
+
+def make_contexts(rounds: int, text: str):
+    contexts = [{"role": "system", "content": "persona"}]
+    for i in range(rounds):
+        contexts.append({"role": "user", "content": f"{i} {text}"})
+        contexts.append({"role": "assistant", "content": f"{i} {text}"})
+    return contexts
+
+
+def test_estimate_tokenizer():
+    tokenizer = EstimateTokenizer()
+    assert tokenizer.count("") == 0
+    assert tokenizer.count("abcdefgh") == 2
+    assert tokenizer.count("你好世界") == 4
+    assert tokenizer.count("你好 abcd") == 2 + 2
+
+
+def test_fit_keeps_request_within_budget():
+    counter = TokenCounter()
+    req = ProviderRequest(prompt="hello", contexts=make_contexts(10, "x" * 400))
+    dropped = counter.fit(req, "anthropic_chat_completion", "model", 1000)
+    tokenizer = counter.get_tokenizer("anthropic_chat_completion", "model")
+    total = counter.count_fixed(tokenizer, req) + sum(
+        counter.count_message(tokenizer, m) for m in req.contexts
+    )
+    assert dropped > 0
+    assert total <= 1000
+    # 系统提示词保留, 保留的第一条对话记录是用户的消息
+    assert req.contexts[0] == {"role": "system", "content": "persona"}
+    assert req.contexts[1]["role"] == "user"
+    assert req.contexts[-1]["content"].startswith("9 ")
+
+
+def test_fit_drops_orphan_tool_results():
+    counter = TokenCounter()
+    contexts = [
+        {"role": "user", "content": "a" * 400},
+        {
+            "role": "assistant",
+            "tool_calls": [{"id": "1", "function": {"name": "f", "arguments": "{}"}}],
+        },
+        {"role": "tool", "tool_call_id": "1", "content": "b" * 400},
+        {"role": "assistant", "content": "done"},
+        {"role": "user", "content": "next"},
+        {"role": "assistant", "content": "ok"},
+    ]
+    req = ProviderRequest(prompt="hi", contexts=contexts)
+    counter.fit(req, "openai_chat_completion", "unknown", 150)
+    assert [m["role"] for m in req.contexts] == ["user", "assistant"]
+
+
+def test_fit_noop_and_cache():
+    counter = TokenCounter()
+    contexts = make_contexts(2, "short")
+    req = ProviderRequest(prompt="hello", contexts=list(contexts))
+    assert counter.fit(req, "openai_chat_completion", "gpt-4o", 100000) == 0
+    assert req.contexts == contexts
+    assert len(counter._cache) == len(contexts)
+    tokenizer = counter.get_tokenizer("openai_chat_completion", "gpt-4o")
+    assert counter.count_message(tokenizer, {"role": "user", "content": ""}) == (
+        MESSAGE_OVERHEAD
+    )
+
+
+class CountingTokenizer(EstimateTokenizer):
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text: str) -> int:
+        self.calls += 1
+        return super().count(text)
+
+
+def test_count_message_cached_by_content():
+    counter = TokenCounter()
+    tokenizer = CountingTokenizer()
+    history = make_contexts(3, "hello")
+    counts = [counter.count_message(tokenizer, m) for m in history]
+    # 对话缓存返回的浅拷贝与原记录共享 content, 不会重新计算
+    copied = [dict(m) for m in history]
+    assert [counter.count_message(tokenizer, m) for m in copied] == counts
+    assert tokenizer.calls == len(history)
+    # content 被替换后重新计算
+    copied[1]["content"] = "changed"
+    assert counter.count_message(tokenizer, copied[1]) == (
+        MESSAGE_OVERHEAD + EstimateTokenizer().count("changed")
+    )
+    assert tokenizer.calls == len(history) + 1
+
+
+@pytest.mark.asyncio
+async def test_load_tokenizer():
+    counter = TokenCounter()
+    tokenizer = await counter.load_tokenizer("anthropic_chat_completion", "model")
+    assert tokenizer is counter.get_tokenizer("anthropic_chat_completion", "model")
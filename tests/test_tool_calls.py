@@ -0,0 +1,210 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from astrbot.core.message.message_event_result import MessageEventResult
+from astrbot.core.pipeline.process_stage.method.llm_request import LLMRequestSubStage
+from astrbot.core.provider.entities import LLMResponse, ProviderRequest
+
+
+class FakeEvent:
+    def __init__(self):
+        self.extras = {}
+        self.result = None
+        self._has_send_oper = False
+
+    def get_platform_id(self):
+        return "test"
+
+    def get_platform_name(self):
+        return "test"
+
+    def set_extra(self, key, value):
+        self.extras[key] = value
+
+    def get_result(self):
+        return self.result
+
+    def set_result(self, result):
+        self.result = result
+
+    def clear_result(self):
+        self.result = None
+
+
+class FakeToolManager:
+    def __init__(self, handlers):
+        self.handlers = handlers
+
+    def get_func(self, name):
+        if name not in self.handlers:
+            return None
+        return SimpleNamespace(
+            name=name,
+            origin="local",
+            handler=self.handlers[name],
+            handler_module_path="tests.fake",
+        )
+
+
+def make_stage(max_concurrency=4, timeout=60):
+    stage = LLMRequestSubStage()
+    stage.ctx = None
+    stage.tool_call_max_concurrency = max_concurrency
+    stage.tool_call_timeout = timeout
+    return stage
+
+
+def make_response(calls):
+    return LLMResponse(
+        "tool",
+        tools_call_name=[name for name, _ in calls],
+        tools_call_args=[args for _, args in calls],
+        tools_call_ids=[f"call_{i}" for i in range(len(calls))],
+    )
+
+
+async def run(stage, handlers, calls):
+    event = FakeEvent()
+    req = ProviderRequest(prompt="hi", func_tool=FakeToolManager(handlers))
+    yields = []
+    async for item in stage._handle_function_tools(event, req, make_response(calls)):
+        yields.append(item)
+    return event, req, yields
+
+
+async def sleep_tool(event, seconds: float, text: str):
+    await asyncio.sleep(seconds)
+    return text
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_and_keep_order():
+    calls = [
+        ("sleep", {"seconds": 0.3, "text": "a"}),
+        ("sleep", {"seconds": 0.1, "text": "b"}),
+        ("sleep", {"seconds": 0.2, "text": "c"}),
+    ]
+    start = time.perf_counter()
+    _, req, yields = await run(make_stage(), {"sleep": sleep_tool}, calls)
+    assert time.perf_counter() - start < 0.5
+    assert yields == [req]
+    results = req.tool_calls_result.tool_calls_result
+    assert [r.tool_call_id for r in results] == ["call_0", "call_1", "call_2"]
+    assert [r.content for r in results] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_tool_call_max_concurrency():
+    running = 0
+    peak = 0
+
+    async def tool(event):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return "ok"
+
+    await run(make_stage(max_concurrency=2), {"tool": tool}, [("tool", {})] * 5)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_tool_call_timeout_and_errors():
+    async def broken(event):
+        raise ValueError("boom")
+
+    calls = [
+        ("sleep", {"seconds": 1, "text": "slow"}),
+        ("broken", {}),
+        ("missing", {}),
+        ("sleep", {"seconds": 0, "text": "fast"}),
+    ]
+    _, req, _ = await run(
+        make_stage(timeout=0.2), {"sleep": sleep_tool, "broken": broken}, calls
+    )
+    contents = [r.content for r in req.tool_calls_result.tool_calls_result]
+    assert contents[0].startswith("error: 工具调用超时")
+    assert contents[1] == "error: boom"
+    assert contents[2].startswith("error:")
+    assert contents[3] == "fast"
+
+
+@pytest.mark.asyncio
+async def test_generator_tools_send_messages_in_pipeline():
+    async def notify(event):
+        yield MessageEventResult().message("working")
+
+    event, req, yields = await run(
+        make_stage(),
+        {"notify": notify, "sleep": sleep_tool},
+        [("notify", {}), ("sleep", {"seconds": 0, "text": "done"})],
+    )
+    # 异步生成器工具的消息经过管道发送, 最后再次请求 LLM
+    assert yields == [None, req]
+    assert event.extras["tool_call_result"].get_plain_text() == "working"
+    assert [r.content for r in req.tool_calls_result.tool_calls_result] == ["done"]
+
+
+@pytest.mark.asyncio
+async def test_generator_tool_timeout_excludes_send_time():
+    async def notify(event):
+        for _ in range(2):
+            await asyncio.sleep(0.05)
+            yield MessageEventResult().message("working")
+
+    async def slow_notify(event):
+        await asyncio.sleep(0.1)
+        yield MessageEventResult().message("working")
+        await asyncio.sleep(0.15)
+        yield MessageEventResult().message("working")
+
+    for handler, timed_out in [(notify, False), (slow_notify, True)]:
+        event = FakeEvent()
+        req = ProviderRequest(
+            prompt="hi",
+            func_tool=FakeToolManager({"notify": handler, "sleep": sleep_tool}),
+        )
+        calls = [("notify", {}), ("sleep", {"seconds": 0, "text": "done"})]
+        async for _ in make_stage(timeout=0.2)._handle_function_tools(
+            event, req, make_response(calls)
+        ):
+            # 下游发送消息的耗时不计入工具调用的超时
+            await asyncio.sleep(0.3)
+        contents = [r.content for r in req.tool_calls_result.tool_calls_result]
+        # 工具自身累计的执行时间仍然受超时限制
+        assert any(c.startswith("error: 工具调用超时") for c in contents) == timed_out
+        assert contents[-1] == "done"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tools_have_own_results():
+    async def setter(event, text: str, seconds: float):
+        event.set_result(MessageEventResult().message(text))
+        await asyncio.sleep(seconds)
+
+    async def clearer(event):
+        await asyncio.sleep(0.02)
+        event.clear_result()
+        event._has_send_oper = True
+
+    event = FakeEvent()
+    req = ProviderRequest(
+        prompt="hi", func_tool=FakeToolManager({"set": setter, "clear": clearer})
+    )
+    calls = [
+        ("set", {"text": "a", "seconds": 0.1}),
+        ("set", {"text": "b", "seconds": 0.05}),
+        ("clear", {}),
+    ]
+    sent = []
+    async for _ in make_stage()._handle_function_tools(
+        event, req, make_response(calls)
+    ):
+        result = event.get_result()
+        sent.append(result.get_plain_text() if result else None)
+    # 一个工具清除结果不影响其他工具, 结果按调用顺序发送
+    assert sent == ["a", "b", None]
+    assert event._has_send_oper
@@ -0,0 +1,63 @@
+import pytest
+import asyncio
+import time
+from astrbot.core.utils.tracing import Histogram, LatencyTracer
+
+
+def test_histogram_quantile():
+    h = Histogram()
+    for _ in range(90):
+        h.observe(0.003)
+    for _ in range(10):
+        h.observe(2)
+    assert 0.0025 <= h.quantile(0.5) <= 0.005
+    assert 1 <= h.quantile(0.95) <= 2
+    assert h.quantile(0.99) <= h.max == 2
+    assert h.summary()["count"] == 100
+
+
+def compute(seconds: float):
+    """在当前线程上计算一段时间, 模拟占用事件循环的同步代码"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_tracer_wall_and_await():
+    tracer = LatencyTracer()
+
+    async def work():
+        compute(0.02)  # 在事件循环上执行
+        await asyncio.sleep(0.05)  # 等待
+        return "ok"
+
+    assert await tracer.timed(work(), "pipeline_stage", "test", "work") == "ok"
+    summary = tracer.snapshot()["pipeline_stage"][0]
+    assert summary["target"] == "work"
+    assert summary["wall"]["max"] >= 0.07
+    assert 0.04 <= summary["await"]["max"] < summary["wall"]["max"] - 0.015
+
+
+@pytest.mark.asyncio
+async def test_tracer_agen_and_prometheus():
+    tracer = LatencyTracer()
+
+    async def handler():
+        yield 1
+        await asyncio.sleep(0.01)
+        yield 2
+
+    items = []
+    async for item in tracer.trace_agen(handler(), "plugin_handler", "test", "h"):
+        items.append(item)
+        await asyncio.sleep(0.05)  # 不应计入耗时
+    assert items == [1, 2]
+    wall = tracer.snapshot()["plugin_handler"][0]["wall"]
+    assert wall["count"] == 1
+    assert wall["max"] < 0.05
+
+    text = tracer.render_prometheus()
+    assert "# TYPE astrbot_plugin_handler_seconds histogram" in text
+    assert 'astrbot_plugin_handler_seconds_count{platform="test",target="h"} 1' in text
+    assert 'le="+Inf"' in text
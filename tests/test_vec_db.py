@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+import numpy as np
+from astrbot.core.db.vec_db.faiss_impl import FaissVecDB
+
+
+class FakeEmbeddingProvider:
+    """以文本的哈希值作为随机种子生成单位向量"""
+
+    def __init__(self, dim: int = 8, batch_size: int = 4):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.requests = 0
+
+    def _embed(self, text: str) -> list[float]:
+        v = np.random.default_rng(abs(hash(text))).standard_normal(self.dim)
+        return (v / np.linalg.norm(v)).tolist()
+
+    async def get_embedding(self, text: str) -> list[float]:
+        self.requests += 1
+        return self._embed(text)
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        assert len(texts) <= self.batch_size
+        return [self._embed(text) for text in texts]
+
+    def get_dim(self) -> int:
+        return self.dim
+
+    def get_batch_size(self) -> int:
+        return self.batch_size
+
+
+@pytest.mark.asyncio
+async def test_insert_batch(tmp_path):
+    provider = FakeEmbeddingProvider()
+    db = FaissVecDB(str(tmp_path / "doc.db"), str(tmp_path / "index.faiss"), provider)
+    await db.initialize()
+    first = await db.insert("single")
+    texts = [f"chunk {i}" for i in range(10)]
+    ids = await db.insert_batch(
+        texts, metadatas=[{"user_id": str(i)} for i in range(10)]
+    )
+
+    assert ids == list(range(first + 1, first + 11))
+    assert provider.requests == 1 + 3  # 10 条文本按 4 条一批请求
+    assert await db.count_documents() == 11
+    assert db.embedding_storage.index.ntotal == 11
+
+    results = await db.retrieve("chunk 7", k=1)
+    assert results[0].data["text"] == "chunk 7"
+    assert results[0].data["id"] == ids[7]
+    results = await db.retrieve("chunk 3", k=1, metadata_filters={"user_id": "3"})
+    assert results[0].data["text"] == "chunk 3"
+    await db.close()
+
+    # 索引只在批量插入完成后保存一次, 重新打开后可以读取到所有向量
+    db = FaissVecDB(str(tmp_path / "doc.db"), str(tmp_path / "index.faiss"), provider)
+    await db.initialize()
+    assert db.embedding_storage.index.ntotal == 11
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts(tmp_path):
+    provider = FakeEmbeddingProvider()
+    db = FaissVecDB(str(tmp_path / "doc.db"), str(tmp_path / "index.faiss"), provider)
+    await db.initialize()
+    batches = [[f"text {i} {j}" for j in range(6)] for i in range(4)]
+    results = await asyncio.gather(*[db.insert_batch(texts) for texts in batches])
+
+    # 每个批次得到的是自己插入的文档的 ID
+    for texts, ids in zip(batches, results):
+        for text, id in zip(texts, ids):
+            docs = await db.document_storage.get_documents({}, ids=[id])
+            assert docs[0]["text"] == text
+    assert db.embedding_storage.index.ntotal == 24
+    await db.close()
+
+    db = FaissVecDB(str(tmp_path / "doc.db"), str(tmp_path / "index.faiss"), provider)
+    await db.initialize()
+    assert db.embedding_storage.index.ntotal == 24
+    await db.close()
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from astrbot.api.event import MessageChain
+from astrbot.core import web_chat_broker
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core.platform.sources.webchat import webchat_event
+from astrbot.core.platform.sources.webchat.webchat_event import WebChatMessageEvent
+from astrbot.core.webchat_broker import WebChatBroker, parse_session_id
+
+
+def test_parse_session_id():
+    assert parse_session_id("webchat!alice!cid") == ("alice", "cid")
+    assert parse_session_id("webchat!a!b!cid") == ("a!b", "cid")
+
+
+@pytest.mark.asyncio
+async def test_broker_fanout():
+    broker = WebChatBroker()
+    alice_1 = broker.subscribe("alice")
+    alice_2 = broker.subscribe("alice")
+    bob = broker.subscribe("bob")
+
+    broker.publish("alice", {"cid": "1", "data": "hi"})
+    assert alice_1.get_nowait()["data"] == "hi"
+    assert alice_2.get_nowait()["data"] == "hi"
+    assert bob.empty()
+
+    broker.unsubscribe("alice", alice_1)
+    broker.unsubscribe("alice", alice_2)
+    broker.unsubscribe("alice", alice_2)
+    assert "alice" not in broker.subscribers
+    broker.publish("alice", {"cid": "1", "data": "hi"})
+
+
+def test_append_conversation_messages(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "test.db"))
+    db.new_conversation("u", "c")
+    db.append_conversation_messages("u", "c", [json.dumps({"type": "user"})])
+    db.append_conversation_messages(
+        "u", "c", [json.dumps({"type": "bot"}), json.dumps({"type": "bot"})]
+    )
+    history = json.loads(db.get_conversation_by_user_id("u", "c").history)
+    assert [m["type"] for m in history] == ["user", "bot", "bot"]
+
+    # 对话不存在时不写入
+    db.append_conversation_messages("u", "missing", [json.dumps({"type": "bot"})])
+    assert db.get_conversation_messages("u", "missing") == []
+
+
+@pytest.mark.asyncio
+async def test_send_publishes_and_persists(tmp_path, monkeypatch):
+    db = SQLiteDatabase(str(tmp_path / "test.db"))
+    db.new_conversation("alice", "cid")
+    monkeypatch.setattr(webchat_event, "db_helper", db)
+    queue = web_chat_broker.subscribe("alice")
+    other = web_chat_broker.subscribe("bob")
+    try:
+        chain = MessageChain().message("你好")
+        await WebChatMessageEvent._send(chain, "webchat!alice!cid")
+        assert queue.get_nowait() == {
+            "type": "plain",
+            "cid": "cid",
+            "data": "你好",
+            "streaming": False,
+        }
+        assert other.empty()
+        history = json.loads(db.get_conversation_by_user_id("alice", "cid").history)
+        assert history == [{"type": "bot", "message": "你好"}]
+
+        # 流式输出的片段不单独保存
+        await WebChatMessageEvent._send(chain, "webchat!alice!cid", streaming=True)
+        assert queue.get_nowait()["streaming"]
+        assert len(db.get_conversation_messages("alice", "cid")) == 1
+    finally:
+        web_chat_broker.unsubscribe("alice", queue)
+        web_chat_broker.unsubscribe("bob", other)